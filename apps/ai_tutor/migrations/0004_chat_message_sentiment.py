@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-19 08:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ai_tutor", "0003_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="chatmessage",
+            name="sentiment_label",
+            field=models.CharField(blank=True, max_length=20),
+        ),
+        migrations.AddField(
+            model_name="chatmessage",
+            name="sentiment_score",
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
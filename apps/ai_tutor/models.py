@@ -70,6 +70,10 @@ class ChatMessage(models.Model):
     is_helpful = models.BooleanField(null=True, blank=True)
     feedback_comment = models.TextField(blank=True)
     
+    # Sentiment analysis (populated in bulk by the sentiment backfill task)
+    sentiment_score = models.FloatField(null=True, blank=True)
+    sentiment_label = models.CharField(max_length=20, blank=True)
+    
     # Timestamp
     created_at = models.DateTimeField(auto_now_add=True)
     
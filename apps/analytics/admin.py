@@ -2,7 +2,7 @@
 Admin configuration for analytics models.
 """
 from django.contrib import admin
-from .models import UserActivity, LearningAnalytics, CourseAnalytics
+from .models import UserActivity, DailyActivityRollup, LearningAnalytics, CourseAnalytics
 
 
 @admin.register(UserActivity)
@@ -15,6 +15,15 @@ class UserActivityAdmin(admin.ModelAdmin):
     readonly_fields = ['created_at']
 
 
+@admin.register(DailyActivityRollup)
+class DailyActivityRollupAdmin(admin.ModelAdmin):
+    """Admin interface for Daily Activity Rollups."""
+    
+    list_display = ['user', 'day', 'activity_type', 'count']
+    list_filter = ['activity_type', 'day']
+    search_fields = ['user__email']
+
+
 @admin.register(LearningAnalytics)
 class LearningAnalyticsAdmin(admin.ModelAdmin):
     """Admin interface for Learning Analytics."""
@@ -4,4 +4,7 @@ from django.apps import AppConfig
 class AnalyticsConfig(AppConfig):
     default_auto_field: str = 'django.db.models.BigAutoField'  # type: ignore[assignment]
     name = 'apps.analytics'
-    verbose_name = 'Analytics & Progress Tracking'
\ No newline at end of file
+    verbose_name = 'Analytics & Progress Tracking'
+
+    def ready(self):
+        import apps.analytics.signals
\ No newline at end of file
@@ -0,0 +1,207 @@
+"""
+Course analytics engine.
+
+Enrollment statistics and the progress histogram for a course are computed
+in one conditional aggregation, and quiz statistics in one query grouped by
+quiz. The same grouped queries, keyed by course, materialise the figures
+stored on ``CourseAnalytics`` for every course in a single scheduled pass.
+"""
+from django.db.models import Avg, Count, Q
+from django.utils import timezone
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKET_SIZE = 25
+
+
+def get_progress_buckets(bucket_size=DEFAULT_BUCKET_SIZE):
+    """
+    Split the 0-100% progress range into buckets.
+
+    Args:
+        bucket_size: Width of each bucket in percent (1-100)
+
+    Returns:
+        list of ``(label, lower, upper)`` tuples; the last bucket is
+        clipped to 100
+    """
+    buckets = []
+    for lower in range(0, 100, bucket_size):
+        upper = min(lower + bucket_size, 100)
+        buckets.append((f'{lower}-{upper}%', lower, upper))
+    return buckets
+
+
+def _bucket_filter(index, lower, upper, count):
+    """Filter for a bucket; the outer buckets are open-ended."""
+    condition = Q()
+    if index > 0:
+        condition &= Q(progress_percentage__gte=lower)
+    if index < count - 1:
+        condition &= Q(progress_percentage__lt=upper)
+    return condition
+
+
+def get_enrollment_stats(enrollments, bucket_size=DEFAULT_BUCKET_SIZE):
+    """
+    Compute enrollment counts and the progress histogram in one query.
+
+    Args:
+        enrollments: Enrollment queryset to summarise
+        bucket_size: Width of each histogram bucket in percent
+
+    Returns:
+        dict with ``total``, ``active``, ``completed``, ``average_progress``
+        and ``progress_distribution``
+    """
+    buckets = get_progress_buckets(bucket_size)
+    aggregates = {
+        f'bucket_{index}': Count('id', filter=_bucket_filter(index, lower, upper, len(buckets)))
+        for index, (label, lower, upper) in enumerate(buckets)
+    }
+    row = enrollments.aggregate(
+        total=Count('id'),
+        active=Count('id', filter=Q(status='active')),
+        completed=Count('id', filter=Q(status='completed')),
+        average_progress=Avg('progress_percentage'),
+        **aggregates
+    )
+
+    return {
+        'total': row['total'],
+        'active': row['active'],
+        'completed': row['completed'],
+        'average_progress': row['average_progress'] or 0,
+        'progress_distribution': {
+            label: row[f'bucket_{index}']
+            for index, (label, lower, upper) in enumerate(buckets)
+        },
+    }
+
+
+def _quiz_aggregates():
+    return {
+        'total_attempts': Count('id'),
+        'average_score': Avg('score'),
+        'passed_attempts': Count('id', filter=Q(passed=True)),
+    }
+
+
+def _percentage(part, total):
+    return part / total * 100 if total > 0 else 0
+
+
+def get_quiz_stats(course):
+    """
+    Compute per-quiz attempt statistics with one grouped query.
+
+    Args:
+        course: Course instance
+
+    Returns:
+        list of dicts with ``quiz_title``, ``total_attempts``,
+        ``average_score`` and ``pass_rate``
+    """
+    from apps.assessments.models import Quiz, QuizAttempt
+
+    stats_by_quiz = {
+        row['quiz']: row
+        for row in QuizAttempt.objects.filter(
+            quiz__course=course,
+            status='completed'
+        ).order_by().values('quiz').annotate(**_quiz_aggregates())
+    }
+
+    quiz_stats = []
+    for quiz in Quiz.objects.filter(course=course).values('id', 'title'):
+        stats = stats_by_quiz.get(quiz['id'], {})
+        total = stats.get('total_attempts', 0)
+        quiz_stats.append({
+            'quiz_title': quiz['title'],
+            'total_attempts': total,
+            'average_score': stats.get('average_score') or 0,
+            'pass_rate': _percentage(stats.get('passed_attempts', 0), total),
+        })
+    return quiz_stats
+
+
+def materialize_course_analytics(courses=None):
+    """
+    Refresh the stored ``CourseAnalytics`` figures for many courses.
+
+    Enrollment and quiz figures for all courses come from two queries
+    grouped by course, and the rows are written with ``bulk_create`` and
+    ``bulk_update``. Ratings are left untouched.
+
+    Args:
+        courses: Optional Course queryset; defaults to every course
+
+    Returns:
+        int: Number of courses refreshed
+    """
+    from apps.courses.models import Course, Enrollment
+    from apps.assessments.models import QuizAttempt
+    from .models import CourseAnalytics
+
+    if courses is None:
+        courses = Course.objects.all()
+    course_ids = list(courses.values_list('id', flat=True))
+
+    enrollment_stats = {
+        row['course']: row
+        for row in Enrollment.objects.filter(
+            course_id__in=course_ids
+        ).order_by().values('course').annotate(
+            total=Count('id'),
+            active=Count('id', filter=Q(status='active')),
+            completed=Count('id', filter=Q(status='completed')),
+            average_progress=Avg('progress_percentage'),
+        )
+    }
+    quiz_stats = {
+        row['quiz__course']: row
+        for row in QuizAttempt.objects.filter(
+            quiz__course_id__in=course_ids,
+            status='completed'
+        ).order_by().values('quiz__course').annotate(**_quiz_aggregates())
+    }
+
+    existing = {
+        analytics.course_id: analytics
+        for analytics in CourseAnalytics.objects.filter(course_id__in=course_ids)
+    }
+    now = timezone.now()
+    to_create = []
+    for course_id in course_ids:
+        analytics = existing.get(course_id)
+        if analytics is None:
+            analytics = CourseAnalytics(course_id=course_id)
+            to_create.append(analytics)
+
+        enrollments = enrollment_stats.get(course_id, {})
+        total = enrollments.get('total', 0)
+        analytics.total_enrollments = total
+        analytics.active_students = enrollments.get('active', 0)
+        analytics.completion_rate = _percentage(enrollments.get('completed', 0), total)
+        analytics.average_progress = enrollments.get('average_progress') or 0
+
+        quizzes = quiz_stats.get(course_id, {})
+        analytics.average_quiz_score = quizzes.get('average_score') or 0
+        analytics.pass_rate = _percentage(
+            quizzes.get('passed_attempts', 0),
+            quizzes.get('total_attempts', 0)
+        )
+        analytics.last_updated = now
+
+    CourseAnalytics.objects.bulk_create(to_create)
+    CourseAnalytics.objects.bulk_update(
+        list(existing.values()),
+        [
+            'total_enrollments', 'active_students', 'completion_rate',
+            'average_progress', 'average_quiz_score', 'pass_rate',
+            'last_updated',
+        ]
+    )
+    logger.info(f"Materialised analytics for {len(course_ids)} courses")
+    return len(course_ids)
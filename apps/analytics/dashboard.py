@@ -0,0 +1,358 @@
+"""
+Materialised student and teacher dashboards.
+
+Each student's dashboard is compiled once and cached: its counters
+(enrollments, activity per day and type) under keys of their own, the
+analytics section under another, and the rest as one document. Domain
+events increment the counters with atomic ``cache.incr`` calls and replace
+the analytics section outright, so concurrent events never overwrite each
+other's changes, and the dashboard endpoint is two cache reads. Changes
+whose effect cannot be applied that way simply drop the document, and the
+dashboard is rebuilt on the next read.
+
+Teacher dashboards are compiled from a handful of grouped aggregates over
+all of the teacher's courses and cached until an enrollment or course
+change drops them.
+"""
+from django.core.cache import cache
+from django.db.models import Avg, Count, Q
+from django.utils import timezone
+from datetime import timedelta
+import logging
+
+from .rollups import get_daily_activity
+
+logger = logging.getLogger(__name__)
+
+DASHBOARD_TIMEOUT = 60 * 15  # 15 minutes
+RECENT_QUIZZES_LIMIT = 5
+WEEKLY_WINDOW_DAYS = 7
+
+ANALYTICS_FIELDS = [
+    'total_study_time', 'current_streak', 'courses_enrolled',
+    'courses_completed', 'average_quiz_score',
+]
+
+
+def get_dashboard_key(user_id):
+    """Cache key for a student's dashboard document."""
+    return f"student_dashboard:{user_id}"
+
+
+def get_analytics_key(user_id):
+    """Cache key for the analytics section of a student's dashboard."""
+    return f"student_dashboard:{user_id}:analytics"
+
+
+def get_enrollment_count_key(user_id, field):
+    """Cache key for one enrollment counter of a student's dashboard."""
+    return f"student_dashboard:{user_id}:enrollments:{field}"
+
+
+def get_activity_count_key(user_id, day, activity_type):
+    """Cache key for one day's count of an activity type."""
+    return f"student_dashboard:{user_id}:activity:{day}:{activity_type}"
+
+
+def _activity_types():
+    from .models import UserActivity
+
+    return [activity_type for activity_type, _ in UserActivity.ACTIVITY_TYPE_CHOICES]
+
+
+def _window_days(today=None):
+    """ISO days of the weekly activity window, oldest first."""
+    today = today or timezone.localdate()
+    return [
+        (today - timedelta(days=offset)).isoformat()
+        for offset in range(WEEKLY_WINDOW_DAYS - 1, -1, -1)
+    ]
+
+
+def serialize_quiz_attempt(attempt):
+    """Dashboard representation of a completed quiz attempt."""
+    return {
+        'quiz_title': attempt.quiz.title,
+        'score': attempt.score,
+        'passed': attempt.passed,
+        'completed_at': attempt.completed_at,
+    }
+
+
+def build_student_dashboard(user):
+    """
+    Compile the dashboard document for a student from the database.
+
+    Args:
+        user: Student user
+
+    Returns:
+        dict: Dashboard document (without the live ``user_info`` section)
+    """
+    from apps.courses.models import Enrollment
+    from apps.assessments.models import QuizAttempt
+    from .models import LearningAnalytics
+
+    analytics, created = LearningAnalytics.objects.get_or_create(user=user)
+
+    enrollments = Enrollment.objects.filter(student=user).aggregate(
+        total=Count('id'),
+        active=Count('id', filter=Q(status='active')),
+        completed=Count('id', filter=Q(status='completed')),
+    )
+
+    recent_quizzes = QuizAttempt.objects.filter(
+        student=user,
+        status='completed'
+    ).select_related('quiz').order_by('-completed_at')[:RECENT_QUIZZES_LIMIT]
+
+    # Weekly activity is kept as per-day buckets so it can be counted into
+    # and slid forward; the buckets are read from the daily rollups
+    window_start = timezone.localdate() - timedelta(days=WEEKLY_WINDOW_DAYS - 1)
+    daily_activity = get_daily_activity(user.id, window_start)
+
+    return {
+        'analytics': {field: getattr(analytics, field) for field in ANALYTICS_FIELDS},
+        'enrollments': enrollments,
+        'recent_quizzes': [serialize_quiz_attempt(attempt) for attempt in recent_quizzes],
+        'daily_activity': daily_activity,
+    }
+
+
+def cache_student_dashboard(user_id, document):
+    """
+    Cache a compiled dashboard.
+
+    Counters are stored under keys of their own so events can increment
+    them atomically; the document itself holds the sections that are only
+    ever replaced, and is written last, since its presence marks the
+    whole dashboard as cached.
+    """
+    today = timezone.localdate()
+    values = {get_analytics_key(user_id): document['analytics']}
+    for field, count in document['enrollments'].items():
+        values[get_enrollment_count_key(user_id, field)] = count
+    for day in _window_days(today):
+        counts = document['daily_activity'].get(day, {})
+        for activity_type in _activity_types():
+            key = get_activity_count_key(user_id, day, activity_type)
+            values[key] = counts.get(activity_type, 0)
+    cache.set_many(values, DASHBOARD_TIMEOUT)
+    cache.set(get_dashboard_key(user_id), {
+        'recent_quizzes': document['recent_quizzes'],
+        'built_on': today.isoformat(),
+    }, DASHBOARD_TIMEOUT)
+
+
+def read_student_dashboard(user_id):
+    """
+    Assemble a cached dashboard.
+
+    Returns:
+        dict: Dashboard document, or None if it is not (fully) cached
+    """
+    document = cache.get(get_dashboard_key(user_id))
+    if document is None:
+        return None
+
+    analytics_key = get_analytics_key(user_id)
+    enrollment_keys = {
+        field: get_enrollment_count_key(user_id, field)
+        for field in ('total', 'active', 'completed')
+    }
+    activity_keys = {
+        (day, activity_type): get_activity_count_key(user_id, day, activity_type)
+        for day in _window_days()
+        for activity_type in _activity_types()
+    }
+    values = cache.get_many([analytics_key, *enrollment_keys.values(), *activity_keys.values()])
+
+    # Buckets for days after the build start at zero; anything else missing
+    # was evicted, so the dashboard has to be rebuilt
+    if analytics_key not in values or any(key not in values for key in enrollment_keys.values()):
+        return None
+    daily_activity = {}
+    for (day, activity_type), key in activity_keys.items():
+        if key not in values and day <= document['built_on']:
+            return None
+        count = values.get(key, 0)
+        if count:
+            daily_activity.setdefault(day, {})[activity_type] = count
+
+    return {
+        'analytics': values[analytics_key],
+        'enrollments': {field: values[key] for field, key in enrollment_keys.items()},
+        'recent_quizzes': document['recent_quizzes'],
+        'daily_activity': daily_activity,
+    }
+
+
+def get_student_dashboard(user):
+    """
+    Return the dashboard payload for a student, compiling it on a miss.
+
+    Args:
+        user: Student user
+
+    Returns:
+        dict: Dashboard data in the shape served by the dashboard endpoint
+    """
+    document = read_student_dashboard(user.id)
+    if document is None:
+        logger.info(f"Dashboard cache miss: {user.id}")
+        document = build_student_dashboard(user)
+        cache_student_dashboard(user.id, document)
+
+    window_start = _window_days()[0]
+    weekly_activity = {}
+    for day, counts in sorted(document['daily_activity'].items()):
+        if day >= window_start:
+            for activity_type, count in counts.items():
+                weekly_activity[activity_type] = weekly_activity.get(activity_type, 0) + count
+
+    return {
+        'user_info': {
+            'name': user.full_name,
+            'email': user.email,
+            'learning_style': user.learning_style,
+        },
+        'analytics': document['analytics'],
+        'enrollments': document['enrollments'],
+        'recent_quizzes': document['recent_quizzes'],
+        'weekly_activity': [
+            {'activity_type': activity_type, 'count': count}
+            for activity_type, count in weekly_activity.items()
+        ],
+    }
+
+
+def invalidate_student_dashboard(user_id):
+    """Drop a dashboard document so it is rebuilt on the next read."""
+    cache.delete(get_dashboard_key(user_id))
+
+
+def record_enrollment(enrollment):
+    """Count a new enrollment."""
+    fields = ['total']
+    if enrollment.status in ('active', 'completed'):
+        fields.append(enrollment.status)
+    for field in fields:
+        try:
+            cache.incr(get_enrollment_count_key(enrollment.student_id, field))
+        except ValueError:
+            # Not cached (or evicted); the rebuild will count it
+            invalidate_student_dashboard(enrollment.student_id)
+            return
+
+
+def record_quiz_completed(attempt):
+    """Recent quizzes are a list that cannot be patched atomically; rebuild."""
+    invalidate_student_dashboard(attempt.student_id)
+
+
+def record_activities(user_id, activities):
+    """Count logged activities into the daily activity buckets."""
+    if cache.get(get_dashboard_key(user_id)) is None:
+        return
+    counts = {}
+    for activity in activities:
+        key = get_activity_count_key(
+            user_id, timezone.localdate(activity.created_at).isoformat(), activity.activity_type
+        )
+        counts[key] = counts.get(key, 0) + 1
+    for key, count in counts.items():
+        # Buckets for days after the build do not exist yet
+        cache.add(key, 0, DASHBOARD_TIMEOUT)
+        try:
+            cache.incr(key, count)
+        except ValueError:
+            invalidate_student_dashboard(user_id)
+            return
+
+
+def record_analytics(analytics):
+    """Replace the analytics section with an updated LearningAnalytics row."""
+    cache.set(
+        get_analytics_key(analytics.user_id),
+        {field: getattr(analytics, field) for field in ANALYTICS_FIELDS},
+        DASHBOARD_TIMEOUT
+    )
+
+
+def get_teacher_dashboard_key(user_id):
+    """Cache key for a teacher's dashboard document."""
+    return f"teacher_dashboard:{user_id}"
+
+
+def build_teacher_dashboard(user):
+    """
+    Compile the dashboard for a teacher with grouped aggregates.
+
+    The query count is constant regardless of how many courses the teacher
+    owns: one for the courses, one grouped aggregate over enrollments keyed
+    by course, one for the distinct student count and one bulk fetch of
+    course ratings.
+
+    Args:
+        user: Teacher user
+
+    Returns:
+        dict: Dashboard data in the shape served by the dashboard endpoint
+    """
+    from apps.courses.models import Course, Enrollment
+    from .models import CourseAnalytics
+
+    courses = list(Course.objects.filter(instructor=user).values('id', 'title'))
+    enrollments = Enrollment.objects.filter(course__instructor=user)
+
+    stats_by_course = {
+        row['course']: row
+        for row in enrollments.order_by().values('course').annotate(
+            total=Count('id'),
+            active=Count('id', filter=Q(status='active')),
+            average_progress=Avg('progress_percentage'),
+        )
+    }
+    ratings = dict(
+        CourseAnalytics.objects.filter(course__instructor=user).values_list(
+            'course_id', 'average_rating'
+        )
+    )
+    total_students = enrollments.values('student').distinct().count()
+
+    course_stats = []
+    for course in courses:
+        stats = stats_by_course.get(course['id'], {})
+        course_stats.append({
+            'course_id': str(course['id']),
+            'title': course['title'],
+            'total_students': stats.get('total', 0),
+            'active_students': stats.get('active', 0),
+            'average_progress': stats.get('average_progress') or 0,
+            'average_rating': ratings.get(course['id'], 0.0),
+        })
+
+    return {
+        'summary': {
+            'total_courses': len(courses),
+            'total_students': total_students,
+            'total_enrollments': sum(stats['total_students'] for stats in course_stats),
+        },
+        'courses': course_stats,
+    }
+
+
+def get_teacher_dashboard(user):
+    """Return the cached dashboard for a teacher, compiling it on a miss."""
+    cache_key = get_teacher_dashboard_key(user.id)
+    data = cache.get(cache_key)
+    if data is None:
+        logger.info(f"Teacher dashboard cache miss: {user.id}")
+        data = build_teacher_dashboard(user)
+        cache.set(cache_key, data, DASHBOARD_TIMEOUT)
+    return data
+
+
+def invalidate_teacher_dashboard(user_id):
+    """Drop a teacher's dashboard so it is rebuilt on the next read."""
+    cache.delete(get_teacher_dashboard_key(user_id))
@@ -0,0 +1,214 @@
+"""
+Columnar export of analytics tables for offline reporting.
+
+Each dataset is streamed out of the database with ``iterator()`` in fixed
+size chunks and written as Parquet files partitioned by day, so memory use
+is bounded by the chunk size rather than the table size. Exports are
+incremental: a watermark on each dataset's modification timestamp records
+how far the previous run got, and only rows changed since are exported.
+
+Rows that change after being exported are exported again, so a dataset
+holds several versions of a row. Every row carries a ``modified_at``
+column; consumers upsert on ``id`` keeping the latest ``modified_at``.
+Runs stop ``ANALYTICS_EXPORT_LAG`` seconds before now, so rows saved by
+transactions that commit shortly after a run are not skipped.
+
+Layout::
+
+    <output_dir>/<dataset>/date=YYYY-MM-DD/part-<run>-<chunk>.parquet
+    <output_dir>/_watermarks.json
+"""
+from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from pathlib import Path
+from datetime import timedelta
+import json
+import logging
+import uuid
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 50000
+WATERMARKS_FILE = '_watermarks.json'
+
+MODIFIED_COLUMN = 'modified_at'
+
+# dataset name -> (model label, timestamps of the last modification; the
+# first one set on a row is its modification time and watermark)
+EXPORT_DATASETS = {
+    'user_activities': ('analytics.UserActivity', ('created_at',)),
+    'quiz_attempts': ('assessments.QuizAttempt', ('completed_at', 'started_at')),
+    'lesson_progress': ('courses.LessonProgress', ('last_accessed',)),
+    'enrollments': ('courses.Enrollment', ('last_accessed',)),
+}
+
+
+def get_export_dir():
+    """Default directory for analytics exports."""
+    return Path(getattr(settings, 'ANALYTICS_EXPORT_DIR', settings.BASE_DIR / 'exports'))
+
+
+def get_export_lag():
+    """How far behind now exports stop."""
+    return timedelta(seconds=getattr(settings, 'ANALYTICS_EXPORT_LAG', 300))
+
+
+def load_watermarks(output_dir):
+    """Read the per-dataset watermarks left by previous exports."""
+    path = Path(output_dir) / WATERMARKS_FILE
+    if not path.exists():
+        return {}
+    return {
+        dataset: parse_datetime(value)
+        for dataset, value in json.loads(path.read_text()).items()
+    }
+
+
+def save_watermarks(output_dir, watermarks):
+    """Persist watermarks atomically next to the exported files."""
+    path = Path(output_dir) / WATERMARKS_FILE
+    tmp_path = path.with_suffix('.tmp')
+    tmp_path.write_text(json.dumps(
+        {dataset: value.isoformat() for dataset, value in watermarks.items()},
+        indent=2
+    ))
+    tmp_path.replace(path)
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        raise ImproperlyConfigured("pyarrow is required for Parquet exports")
+
+
+def _clean_value(value):
+    """Convert values Parquet cannot store natively."""
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return value
+
+
+def _modified_filter(timestamp_fields, lookup, value):
+    """Q matching rows whose modification time satisfies ``lookup``."""
+    condition = Q()
+    unset = {}
+    for field in timestamp_fields:
+        condition |= Q(**unset, **{f'{field}__{lookup}': value})
+        unset[f'{field}__isnull'] = True
+    return condition
+
+
+def _write_chunk(rows, dataset_dir, run_id, chunk_number):
+    """Write one chunk of rows as Parquet files, one per modification day."""
+    import pandas as pd
+
+    frame = pd.DataFrame.from_records(rows)
+    days = pd.to_datetime(frame[MODIFIED_COLUMN], utc=True).dt.strftime('%Y-%m-%d')
+    for day, day_frame in frame.groupby(days):
+        partition_dir = dataset_dir / f'date={day}'
+        partition_dir.mkdir(parents=True, exist_ok=True)
+        day_frame.to_parquet(
+            partition_dir / f'part-{run_id}-{chunk_number:05d}.parquet',
+            engine='pyarrow',
+            index=False
+        )
+
+
+def export_dataset(dataset, output_dir=None, since=None, until=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Export rows of one dataset modified after ``since`` up to ``until``.
+
+    Args:
+        dataset: Key of ``EXPORT_DATASETS``
+        output_dir: Root directory for the export
+        since: Exclusive lower bound on the modification timestamp
+        until: Inclusive upper bound; defaults to now minus the export lag
+        chunk_size: Rows held in memory per chunk
+
+    Returns:
+        tuple: (rows exported, latest timestamp exported or None)
+    """
+    _require_pyarrow()
+
+    model_label, timestamp_fields = EXPORT_DATASETS[dataset]
+    model = apps.get_model(model_label)
+    output_dir = Path(output_dir or get_export_dir())
+    dataset_dir = output_dir / dataset
+    until = until or timezone.now() - get_export_lag()
+
+    columns = [field.attname for field in model._meta.concrete_fields]
+    queryset = model.objects.filter(_modified_filter(timestamp_fields, 'lte', until))
+    if since is not None:
+        queryset = queryset.filter(_modified_filter(timestamp_fields, 'gt', since))
+    rows_iter = queryset.order_by('pk').values_list(*columns).iterator(chunk_size=chunk_size)
+
+    # Unique per run, so runs within the same second never overwrite each other
+    run_id = f"{timezone.now():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+    exported = 0
+    latest = None
+    chunk = []
+    chunk_number = 0
+    timestamp_indexes = [columns.index(field) for field in timestamp_fields]
+
+    for row in rows_iter:
+        record = {column: _clean_value(value) for column, value in zip(columns, row)}
+        modified_at = next(row[index] for index in timestamp_indexes if row[index] is not None)
+        record[MODIFIED_COLUMN] = modified_at
+        chunk.append(record)
+        latest = modified_at if latest is None else max(latest, modified_at)
+        if len(chunk) >= chunk_size:
+            _write_chunk(chunk, dataset_dir, run_id, chunk_number)
+            exported += len(chunk)
+            chunk_number += 1
+            chunk = []
+
+    if chunk:
+        _write_chunk(chunk, dataset_dir, run_id, chunk_number)
+        exported += len(chunk)
+
+    logger.info(f"Exported {exported} rows from {dataset}")
+    return exported, latest
+
+
+def export_analytics(datasets=None, output_dir=None, full=False, chunk_size=DEFAULT_CHUNK_SIZE,
+                     lag=None):
+    """
+    Incrementally export analytics datasets to Parquet.
+
+    Args:
+        datasets: Dataset names to export; defaults to all
+        output_dir: Root directory for the export
+        full: Ignore watermarks and export everything
+        chunk_size: Rows held in memory per chunk
+        lag: How far behind now to stop; defaults to ``ANALYTICS_EXPORT_LAG``
+
+    Returns:
+        dict: Rows exported per dataset
+    """
+    output_dir = Path(output_dir or get_export_dir())
+    output_dir.mkdir(parents=True, exist_ok=True)
+    watermarks = {} if full else load_watermarks(output_dir)
+    until = timezone.now() - (get_export_lag() if lag is None else lag)
+
+    results = {}
+    for dataset in datasets or EXPORT_DATASETS:
+        exported, latest = export_dataset(
+            dataset,
+            output_dir=output_dir,
+            since=watermarks.get(dataset),
+            until=until,
+            chunk_size=chunk_size
+        )
+        if latest is not None:
+            watermarks[dataset] = latest
+            save_watermarks(output_dir, watermarks)
+        results[dataset] = exported
+
+    return results
@@ -0,0 +1,229 @@
+"""
+Buffered ingestion for client activity events.
+
+``log_activity`` is the chattiest write path in the API, so events are not
+inserted one row at a time. The endpoint assigns each event its ID and
+appends it to a Redis list; a Celery task drains the list and writes the
+rows with ``bulk_create`` in batches of thousands. ``bulk_create`` skips
+``post_save``, so the rollups, dashboard and analytics pipeline are fed
+explicitly.
+
+A bad record never blocks its batch: records of deleted users are
+dead-lettered before the insert, and a failing insert is bisected down to
+the offending records. Batches claimed by a worker that died are requeued
+at the start of the next drain, and analytics events whose fold failed are
+handed to the event buffer to be retried.
+
+When ``ANALYTICS_EVENTS_EAGER`` is set, or Redis is unavailable, events are
+written inline with the same bulk path.
+"""
+from django.conf import settings
+from django.db import DataError, IntegrityError, transaction
+import logging
+import redis
+import uuid
+
+from .pipeline import (
+    EVENTS_KEY, ack_events, claim_events, dead_letter_events, push_events,
+    requeue_stale_batches, retry_events,
+)
+
+logger = logging.getLogger(__name__)
+
+ACTIVITIES_KEY = 'analytics:activities'
+DEFAULT_BATCH_SIZE = 5000
+
+
+def enqueue_activities(user_id, events):
+    """
+    Buffer activity events for a user.
+
+    Args:
+        user_id: ID of the user the events belong to
+        events: Validated events with ``activity_type``, ``description``
+            and ``metadata``
+
+    Returns:
+        list: IDs assigned to the activities, in input order
+    """
+    records = [
+        {
+            'id': str(uuid.uuid4()),
+            'user_id': str(user_id),
+            'activity_type': event['activity_type'],
+            'description': event.get('description', ''),
+            'metadata': event.get('metadata') or {},
+        }
+        for event in events
+    ]
+
+    if getattr(settings, 'ANALYTICS_EVENTS_EAGER', False):
+        store_activities(records)
+    else:
+        try:
+            push_events(ACTIVITIES_KEY, records)
+        except redis.RedisError as e:
+            logger.warning(f"Activity buffer unavailable, writing inline: {str(e)}")
+            store_activities(records)
+
+    return [record['id'] for record in records]
+
+
+def store_activities(records):
+    """
+    Write activity records and fan them out to the read models.
+
+    Records that cannot be written are logged and skipped.
+
+    Returns:
+        int: Number of activities written
+    """
+    activities, orphaned, rejected = insert_activities(records)
+    if orphaned or rejected:
+        logger.error(f"Skipped {len(orphaned) + len(rejected)} activity records that could not be written")
+    fan_out_activities(activities)
+    return len(activities)
+
+
+def insert_activities(records):
+    """
+    Insert activity records and their rollups, isolating bad records.
+
+    Records of users that no longer exist are set aside, and records
+    already written by an earlier attempt are skipped. If the insert still
+    fails on a record (e.g. a duplicate ID), the batch is bisected so only
+    the offending records are rejected. Any other database error is
+    raised, and nothing from the batch is committed.
+
+    Returns:
+        tuple: (inserted activities, orphaned records, rejected records)
+    """
+    from apps.users.models import User
+    from .models import UserActivity
+
+    user_ids = {record['user_id'] for record in records}
+    existing_users = {
+        str(user_id) for user_id in User.objects.filter(id__in=user_ids).values_list('id', flat=True)
+    }
+    written = {
+        str(activity_id) for activity_id in UserActivity.objects.filter(
+            id__in=[record['id'] for record in records]
+        ).values_list('id', flat=True)
+    }
+
+    orphaned = [record for record in records if record['user_id'] not in existing_users]
+    pending = [
+        record for record in records
+        if record['user_id'] in existing_users and record['id'] not in written
+    ]
+    activities, rejected = _insert_bisecting(pending)
+    return activities, orphaned, rejected
+
+
+def _insert_bisecting(records):
+    """Insert records in one transaction, splitting the batch on bad records."""
+    from . import rollups
+    from .models import UserActivity
+
+    if not records:
+        return [], []
+
+    activities = [
+        UserActivity(
+            id=record['id'],
+            user_id=record['user_id'],
+            activity_type=record['activity_type'],
+            description=record['description'],
+            metadata=record['metadata'],
+        )
+        for record in records
+    ]
+    try:
+        with transaction.atomic():
+            UserActivity.objects.bulk_create(activities, batch_size=1000)
+            rollups.increment_rollups(activities)
+        return activities, []
+    except (IntegrityError, DataError):
+        if len(records) == 1:
+            return [], records
+
+    middle = len(records) // 2
+    left, left_rejected = _insert_bisecting(records[:middle])
+    right, right_rejected = _insert_bisecting(records[middle:])
+    return left + right, left_rejected + right_rejected
+
+
+def fan_out_activities(activities):
+    """Feed written activities to the dashboards and analytics pipeline."""
+    from . import dashboard, pipeline
+
+    activities_by_user = {}
+    for activity in activities:
+        activities_by_user.setdefault(str(activity.user_id), []).append(activity)
+
+    for user_id, user_activities in activities_by_user.items():
+        dashboard.record_activities(user_id, user_activities)
+
+    failed = pipeline.fold_events([
+        {
+            'id': str(activity.id),
+            'user_id': str(activity.user_id),
+            'type': 'activity',
+            'timestamp': activity.created_at.isoformat(),
+            'activity_type': activity.activity_type,
+        }
+        for activity in activities
+    ])
+    if failed:
+        _retry_failed_events(failed)
+
+
+def _retry_failed_events(events):
+    """Hand events whose fold failed to the event buffer to be retried."""
+    if getattr(settings, 'ANALYTICS_EVENTS_EAGER', False):
+        logger.error(f"Dropped {len(events)} analytics events whose fold failed")
+        return
+    try:
+        retry_events(EVENTS_KEY, None, events)
+    except redis.RedisError as e:
+        logger.error(f"Dropped {len(events)} analytics events whose fold failed: {str(e)}")
+
+
+def drain_activity_buffer(batch_size=DEFAULT_BATCH_SIZE, max_batches=20):
+    """
+    Drain buffered activities into the database in bulk.
+
+    A batch is handed back to the buffer only if its insert rolled back;
+    once the rows are committed the batch is acknowledged, even if fanning
+    it out fails, so committed rows are never replayed. Records of deleted
+    users go straight to the dead-letter list, and rejected records are
+    retried until they reach ``MAX_EVENT_ATTEMPTS``. Batches left behind by
+    a worker that died are requeued first.
+
+    Returns:
+        int: Number of activities written
+    """
+    requeue_stale_batches(ACTIVITIES_KEY)
+    written = 0
+    for _ in range(max_batches):
+        batch_key, records = claim_events(ACTIVITIES_KEY, batch_size)
+        if not records:
+            break
+        try:
+            activities, orphaned, rejected = insert_activities(records)
+        except Exception:
+            retry_events(ACTIVITIES_KEY, batch_key, records)
+            raise
+
+        dead_letter_events(ACTIVITIES_KEY, orphaned)
+        if rejected:
+            retry_events(ACTIVITIES_KEY, batch_key, rejected)
+        else:
+            ack_events(ACTIVITIES_KEY, batch_key)
+
+        try:
+            fan_out_activities(activities)
+        except Exception as e:
+            logger.error(f"Failed to fan out {len(activities)} activities: {str(e)}")
+        written += len(activities)
+    return written
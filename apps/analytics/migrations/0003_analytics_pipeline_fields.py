@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-19 08:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("analytics", "0002_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="learninganalytics",
+            name="active_days",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="learninganalytics",
+            name="last_activity_date",
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="learninganalytics",
+            name="total_study_seconds",
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,84 @@
+# Generated by Django 4.2.7 on 2026-10-19 08:22
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+def backfill_rollups(apps, schema_editor):
+    """Roll up the raw activity that already exists."""
+    from django.db.models import Count
+    from django.db.models.functions import TruncDate
+
+    UserActivity = apps.get_model("analytics", "UserActivity")
+    DailyActivityRollup = apps.get_model("analytics", "DailyActivityRollup")
+
+    rows = (
+        UserActivity.objects.annotate(day=TruncDate("created_at"))
+        .order_by()
+        .values("user_id", "day", "activity_type")
+        .annotate(count=Count("id"))
+    )
+    DailyActivityRollup.objects.bulk_create(
+        [DailyActivityRollup(**row) for row in rows.iterator()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("analytics", "0003_analytics_pipeline_fields"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DailyActivityRollup",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("day", models.DateField()),
+                (
+                    "activity_type",
+                    models.CharField(
+                        choices=[
+                            ("login", "Login"),
+                            ("course_view", "Course View"),
+                            ("lesson_view", "Lesson View"),
+                            ("quiz_attempt", "Quiz Attempt"),
+                            ("chat_message", "Chat Message"),
+                            ("content_generation", "Content Generation"),
+                        ],
+                        max_length=30,
+                    ),
+                ),
+                ("count", models.IntegerField(default=0)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="activity_rollups",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "daily_activity_rollups",
+                "ordering": ["-day"],
+                "indexes": [
+                    models.Index(fields=["day"], name="daily_activ_day_04986e_idx")
+                ],
+                "unique_together": {("user", "day", "activity_type")},
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:19
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("analytics", "0004_daily_activity_rollups"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="FoldedEvent",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(editable=False, primary_key=True, serialize=False),
+                ),
+                ("folded_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="folded_events",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "folded_analytics_events",
+                "indexes": [
+                    models.Index(
+                        fields=["folded_at"], name="folded_anal_folded__87668a_idx"
+                    )
+                ],
+            },
+        ),
+    ]
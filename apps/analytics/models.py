@@ -42,6 +42,44 @@ class UserActivity(models.Model):
         return f"{self.user.email} - {self.activity_type}"
 
 
+class DailyActivityRollup(models.Model):
+    """Daily per-user, per-type activity counts kept after raw rows expire."""
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='activity_rollups')
+    day = models.DateField()
+    activity_type = models.CharField(max_length=30, choices=UserActivity.ACTIVITY_TYPE_CHOICES)
+    count = models.IntegerField(default=0)
+    
+    class Meta:
+        db_table = 'daily_activity_rollups'
+        ordering = ['-day']
+        unique_together = ['user', 'day', 'activity_type']
+        indexes = [
+            models.Index(fields=['day']),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.email} - {self.activity_type} on {self.day}: {self.count}"
+
+
+class FoldedEvent(models.Model):
+    """ID of an analytics event already folded into LearningAnalytics."""
+    
+    id = models.UUIDField(primary_key=True, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='folded_events')
+    folded_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'folded_analytics_events'
+        indexes = [
+            models.Index(fields=['folded_at']),
+        ]
+    
+    def __str__(self):
+        return f"Event {self.id} folded at {self.folded_at}"
+
+
 class LearningAnalytics(models.Model):
     """Aggregated learning analytics for students."""
     
@@ -50,9 +88,12 @@ class LearningAnalytics(models.Model):
     
     # Time metrics
     total_study_time = models.IntegerField(default=0, help_text="Total study time in minutes")
+    total_study_seconds = models.IntegerField(default=0)
     average_daily_time = models.FloatField(default=0.0)
     current_streak = models.IntegerField(default=0, help_text="Current daily streak")
     longest_streak = models.IntegerField(default=0)
+    active_days = models.IntegerField(default=0)
+    last_activity_date = models.DateField(null=True, blank=True)
     
     # Course metrics
     courses_enrolled = models.IntegerField(default=0)
@@ -0,0 +1,373 @@
+"""
+Event-driven aggregation pipeline for LearningAnalytics.
+
+Producers (lesson progress, quiz completion, chat messages, logged activity
+and enrollments) record small events that are buffered in a Redis list.
+A Celery task drains the buffer in micro-batches and folds each user's
+events into their LearningAnalytics row with constant work per event:
+counters are incremented, the quiz average is a running mean and streaks
+are advanced from the last active date. No table is ever rescanned.
+
+Buffered events are never removed before they are folded: a batch is moved
+into its own processing list and only deleted once folded. Events of users
+whose fold fails are put back on the buffer, and batches left behind by a
+worker that died are requeued after ``PROCESSING_TIMEOUT``. Events that
+keep failing are moved to a dead-letter list after ``MAX_EVENT_ATTEMPTS``.
+Every event carries an ID that is recorded in the same transaction as its
+fold, so an event requeued after it was folded is skipped, not counted
+twice.
+
+When ``ANALYTICS_EVENTS_EAGER`` is set (tests and local runs without Redis)
+events are folded inline instead of being buffered.
+
+Once a user's events are folded, ``events_folded`` is sent so other apps can
+react to the same events without reading them again.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.dispatch import Signal
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from datetime import timedelta
+import json
+import logging
+import redis
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+EVENTS_KEY = 'analytics:events'
+DEFAULT_BATCH_SIZE = 1000
+PROCESSING_TIMEOUT = 60 * 10  # 10 minutes
+MAX_EVENT_ATTEMPTS = 5
+# Folded event IDs are kept far longer than an event can wait to be retried
+FOLDED_EVENT_RETENTION_DAYS = 7
+
+# LearningAnalytics fields written by ``apply_event``
+FOLDED_FIELDS = [
+    'total_study_seconds', 'total_study_time', 'lessons_completed',
+    'quizzes_taken', 'average_quiz_score', 'quizzes_passed',
+    'chat_messages_sent', 'ai_content_generated', 'courses_enrolled',
+    'courses_completed', 'current_streak', 'longest_streak', 'active_days', 'last_activity_date',
+    'average_daily_time', 'last_updated',
+]
+
+# Sent with ``analytics`` (the saved LearningAnalytics row) and ``events``
+# (that user's events, oldest first) after each user's batch is folded
+events_folded = Signal()
+
+_redis_client = None
+
+
+def get_redis_client():
+    """Shared Redis client for analytics buffers."""
+    global _redis_client
+    if _redis_client is None:
+        _redis_client = redis.from_url(settings.CELERY_BROKER_URL)
+    return _redis_client
+
+
+def push_events(key, events):
+    """Append JSON-encoded events to a Redis list buffer."""
+    get_redis_client().rpush(key, *[json.dumps(event, default=str) for event in events])
+
+
+def get_inflight_key(key):
+    """Sorted set of a buffer's processing lists, scored by claim time."""
+    return f"{key}:inflight"
+
+
+def get_dead_letter_key(key):
+    """List of a buffer's events that failed ``MAX_EVENT_ATTEMPTS`` times."""
+    return f"{key}:dead"
+
+
+def claim_events(key, limit):
+    """
+    Move up to ``limit`` events from a buffer into a new processing list.
+
+    The events stay in Redis until the batch is acknowledged with
+    ``ack_events`` or handed back with ``retry_events``, so a worker that
+    dies mid-batch loses nothing.
+
+    Returns:
+        tuple: (processing list key, events)
+    """
+    client = get_redis_client()
+    batch_key = f"{key}:processing:{uuid.uuid4()}"
+    pipe = client.pipeline(transaction=True)
+    pipe.zadd(get_inflight_key(key), {batch_key: time.time()})
+    for _ in range(limit):
+        pipe.lmove(key, batch_key, 'LEFT', 'RIGHT')
+    raw_events = [raw for raw in pipe.execute()[1:] if raw is not None]
+    if not raw_events:
+        client.zrem(get_inflight_key(key), batch_key)
+    return batch_key, [json.loads(raw) for raw in raw_events]
+
+
+def ack_events(key, batch_key):
+    """Drop a processed batch."""
+    pipe = get_redis_client().pipeline(transaction=True)
+    pipe.delete(batch_key)
+    pipe.zrem(get_inflight_key(key), batch_key)
+    pipe.execute()
+
+
+def retry_events(key, batch_key, events):
+    """
+    Put failed events back on a buffer and drop their batch.
+
+    Each event's ``attempts`` is incremented; events that reach
+    ``MAX_EVENT_ATTEMPTS`` go to the dead-letter list instead.
+
+    Returns:
+        int: Number of events dead-lettered
+    """
+    retried, dead = [], []
+    for event in events:
+        event = {**event, 'attempts': event.get('attempts', 0) + 1}
+        (dead if event['attempts'] >= MAX_EVENT_ATTEMPTS else retried).append(event)
+
+    pipe = get_redis_client().pipeline(transaction=True)
+    if retried:
+        pipe.rpush(key, *[json.dumps(event, default=str) for event in retried])
+    if dead:
+        _dead_letter(pipe, key, dead)
+    if batch_key:
+        pipe.delete(batch_key)
+        pipe.zrem(get_inflight_key(key), batch_key)
+    pipe.execute()
+    return len(dead)
+
+
+def dead_letter_events(key, events):
+    """Move events that can never be processed to the dead-letter list."""
+    if events:
+        pipe = get_redis_client().pipeline(transaction=True)
+        _dead_letter(pipe, key, events)
+        pipe.execute()
+
+
+def _dead_letter(pipe, key, events):
+    pipe.rpush(get_dead_letter_key(key), *[json.dumps(event, default=str) for event in events])
+    logger.error(f"Moved {len(events)} events from {key} to the dead-letter list")
+
+
+def requeue_stale_batches(key, timeout=PROCESSING_TIMEOUT):
+    """
+    Return batches claimed more than ``timeout`` seconds ago to the buffer.
+
+    Returns:
+        int: Number of events requeued or dead-lettered
+    """
+    client = get_redis_client()
+    requeued = 0
+    for batch_key in client.zrangebyscore(get_inflight_key(key), 0, time.time() - timeout):
+        # Whoever removes the batch from the in-flight set requeues it
+        if not client.zrem(get_inflight_key(key), batch_key):
+            continue
+        batch_key = batch_key.decode() if isinstance(batch_key, bytes) else batch_key
+        events = [json.loads(raw) for raw in client.lrange(batch_key, 0, -1)]
+        logger.warning(f"Requeuing {len(events)} events of stale batch {batch_key}")
+        retry_events(key, batch_key, events)
+        requeued += len(events)
+    return requeued
+
+
+def record_event(user_id, event_type, **payload):
+    """
+    Record an analytics event for a user.
+
+    Args:
+        user_id: ID of the user the event belongs to
+        event_type: One of the types handled by ``apply_event``
+        **payload: Event specific values
+    """
+    event = {
+        'id': str(uuid.uuid4()),
+        'user_id': str(user_id),
+        'type': event_type,
+        'timestamp': timezone.now().isoformat(),
+        **payload,
+    }
+
+    if getattr(settings, 'ANALYTICS_EVENTS_EAGER', False):
+        fold_events([event])
+        return
+
+    try:
+        push_events(EVENTS_KEY, [event])
+    except redis.RedisError as e:
+        # Never lose the event; fold it inline if the buffer is unavailable
+        logger.warning(f"Analytics buffer unavailable, folding inline: {str(e)}")
+        fold_events([event])
+
+
+def advance_streak(analytics, day):
+    """Update streak and active-day counters for activity on ``day``."""
+    last_day = analytics.last_activity_date
+    if last_day is not None and day <= last_day:
+        return
+
+    if last_day is not None and day == last_day + timedelta(days=1):
+        analytics.current_streak += 1
+    else:
+        analytics.current_streak = 1
+    analytics.longest_streak = max(analytics.longest_streak, analytics.current_streak)
+    analytics.active_days += 1
+    analytics.last_activity_date = day
+
+
+def apply_event(analytics, event):
+    """Fold a single event into a LearningAnalytics instance in memory."""
+    event_type = event['type']
+
+    if event_type == 'lesson_progress':
+        analytics.total_study_seconds += event.get('time_spent', 0)
+        analytics.total_study_time = analytics.total_study_seconds // 60
+        analytics.lessons_completed += event.get('lessons_completed', 0)
+
+    elif event_type == 'quiz_completed':
+        # Running mean: avg_n = avg_(n-1) + (x - avg_(n-1)) / n
+        analytics.quizzes_taken += 1
+        analytics.average_quiz_score += (
+            (event.get('score') or 0) - analytics.average_quiz_score
+        ) / analytics.quizzes_taken
+        if event.get('passed'):
+            analytics.quizzes_passed += 1
+
+    elif event_type == 'chat_message':
+        analytics.chat_messages_sent += 1
+
+    elif event_type == 'activity':
+        if event.get('activity_type') == 'content_generation':
+            analytics.ai_content_generated += 1
+
+    elif event_type == 'enrollment':
+        analytics.courses_enrolled += 1
+
+    elif event_type == 'course_completed':
+        analytics.courses_completed += 1
+
+    elif event_type in ('enrollment_removed', 'course_reopened'):
+        # Corrections rather than activity; the streak is left alone
+        if event_type == 'enrollment_removed':
+            analytics.courses_enrolled = max(analytics.courses_enrolled - 1, 0)
+        if event_type == 'course_reopened' or event.get('completed'):
+            analytics.courses_completed = max(analytics.courses_completed - 1, 0)
+        return
+
+    else:
+        logger.warning(f"Unknown analytics event type: {event_type}")
+        return
+
+    timestamp = parse_datetime(event['timestamp'])
+    advance_streak(analytics, timezone.localdate(timestamp))
+    if analytics.active_days:
+        analytics.average_daily_time = analytics.total_study_time / analytics.active_days
+
+
+def fold_events(events):
+    """
+    Fold a batch of events into per-user analytics rows.
+
+    Events are grouped by user and applied in timestamp order, so each
+    affected row is read and written once per batch. Only the folded
+    fields are written, so figures maintained elsewhere on the row (e.g.
+    risk scores) are never overwritten. Events whose ID was already folded
+    are skipped.
+
+    Returns:
+        list: Events of the users whose fold failed, to be retried
+    """
+    from .models import FoldedEvent, LearningAnalytics
+
+    events_by_user = {}
+    for event in sorted(events, key=lambda e: e['timestamp']):
+        events_by_user.setdefault(event['user_id'], []).append(event)
+
+    failed = []
+    for user_id, user_events in events_by_user.items():
+        try:
+            with transaction.atomic():
+                analytics, created = LearningAnalytics.objects.select_for_update().get_or_create(
+                    user_id=user_id
+                )
+                new_events = _unfolded(user_events)
+                if not new_events:
+                    continue
+                for event in new_events:
+                    apply_event(analytics, event)
+                FoldedEvent.objects.bulk_create([
+                    FoldedEvent(id=event['id'], user_id=user_id)
+                    for event in new_events if event.get('id')
+                ])
+                analytics.save(update_fields=FOLDED_FIELDS)
+        except Exception as e:
+            logger.error(f"Failed to fold analytics events for user {user_id}: {str(e)}")
+            failed.extend(user_events)
+            continue
+
+        events_folded.send(sender=LearningAnalytics, analytics=analytics, events=new_events)
+
+    return failed
+
+
+def _unfolded(events):
+    """The events whose ID has not been folded yet, each at most once."""
+    from .models import FoldedEvent
+
+    folded = {
+        str(event_id) for event_id in FoldedEvent.objects.filter(
+            id__in=[event['id'] for event in events if event.get('id')]
+        ).values_list('id', flat=True)
+    }
+    unfolded = []
+    for event in events:
+        event_id = event.get('id')
+        if event_id in folded:
+            continue
+        if event_id:
+            folded.add(event_id)
+        unfolded.append(event)
+    return unfolded
+
+
+def purge_folded_events(retention_days=FOLDED_EVENT_RETENTION_DAYS):
+    """
+    Forget the IDs of events folded more than ``retention_days`` ago.
+
+    Returns:
+        int: Number of IDs deleted
+    """
+    from .models import FoldedEvent
+
+    cutoff = timezone.now() - timedelta(days=retention_days)
+    deleted, _ = FoldedEvent.objects.filter(folded_at__lt=cutoff).delete()
+    return deleted
+
+
+def process_buffered_events(batch_size=DEFAULT_BATCH_SIZE, max_batches=100):
+    """
+    Drain the event buffer in micro-batches.
+
+    Each batch is acknowledged once folded; the events of users whose fold
+    failed are retried on a later run.
+
+    Returns:
+        int: Number of events folded
+    """
+    requeue_stale_batches(EVENTS_KEY)
+    processed = 0
+    for _ in range(max_batches):
+        batch_key, events = claim_events(EVENTS_KEY, batch_size)
+        if not events:
+            break
+        failed = fold_events(events)
+        if failed:
+            retry_events(EVENTS_KEY, batch_key, failed)
+        else:
+            ack_events(EVENTS_KEY, batch_key)
+        processed += len(events) - len(failed)
+    return processed
@@ -0,0 +1,114 @@
+"""
+Daily activity rollups and raw activity retention.
+
+Every logged activity increments a per-user, per-type counter for its day.
+Dashboards and reports read these rollups, so their cost depends on the
+window being shown rather than on how much raw activity has accumulated.
+Raw ``UserActivity`` rows are only kept for a retention window and are
+purged in chunks by a scheduled task.
+"""
+from collections import Counter
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from datetime import timedelta
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RETENTION_DAYS = 90
+PURGE_CHUNK_SIZE = 5000
+
+
+def increment_rollups(activities):
+    """
+    Add activities to their daily rollup counters.
+
+    Activities are first counted in memory. Missing counters are inserted
+    in one ``bulk_create`` (ignoring counters created concurrently), every
+    counter of the batch is then locked and read in one query, and the new
+    totals are written with one ``bulk_update``, so the number of queries
+    does not depend on the size of the batch.
+
+    Args:
+        activities: Saved UserActivity instances
+    """
+    from .models import DailyActivityRollup
+
+    counts = Counter(
+        (activity.user_id, timezone.localdate(activity.created_at), activity.activity_type)
+        for activity in activities
+    )
+    if not counts:
+        return
+
+    with transaction.atomic():
+        DailyActivityRollup.objects.bulk_create(
+            [
+                DailyActivityRollup(user_id=user_id, day=day, activity_type=activity_type)
+                for user_id, day, activity_type in counts
+            ],
+            ignore_conflicts=True
+        )
+        rollups = DailyActivityRollup.objects.select_for_update().filter(
+            user_id__in={user_id for user_id, _, _ in counts},
+            day__in={day for _, day, _ in counts},
+            activity_type__in={activity_type for _, _, activity_type in counts}
+        ).order_by('user_id', 'day', 'activity_type')
+
+        changed = []
+        for rollup in rollups:
+            count = counts.get((rollup.user_id, rollup.day, rollup.activity_type))
+            if count:
+                rollup.count += count
+                changed.append(rollup)
+        DailyActivityRollup.objects.bulk_update(changed, ['count'])
+
+
+def get_daily_activity(user_id, since):
+    """
+    Read a user's activity counts per day and type from the rollups.
+
+    Returns:
+        dict: ``{iso_day: {activity_type: count}}``
+    """
+    from .models import DailyActivityRollup
+
+    daily_activity = {}
+    rows = DailyActivityRollup.objects.filter(
+        user_id=user_id, day__gte=since
+    ).values_list('day', 'activity_type', 'count')
+    for day, activity_type, count in rows:
+        daily_activity.setdefault(day.isoformat(), {})[activity_type] = count
+    return daily_activity
+
+
+def purge_expired_activities(retention_days=None, chunk_size=PURGE_CHUNK_SIZE):
+    """
+    Delete raw activity rows older than the retention window.
+
+    Rows are deleted in bounded chunks so no single statement locks or
+    scans the whole table. Rollups are kept.
+
+    Returns:
+        int: Number of rows deleted
+    """
+    from .models import UserActivity
+
+    if retention_days is None:
+        retention_days = getattr(settings, 'ACTIVITY_RETENTION_DAYS', DEFAULT_RETENTION_DAYS)
+    cutoff = timezone.now() - timedelta(days=retention_days)
+
+    deleted = 0
+    while True:
+        ids = list(
+            UserActivity.objects.filter(created_at__lt=cutoff).values_list('id', flat=True)[:chunk_size]
+        )
+        if not ids:
+            break
+        UserActivity.objects.filter(id__in=ids).delete()
+        deleted += len(ids)
+
+    if deleted:
+        logger.info(f"Purged {deleted} activities older than {retention_days} days")
+    return deleted
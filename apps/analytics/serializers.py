@@ -17,6 +17,14 @@ class UserActivitySerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at']
 
 
+class ActivityEventSerializer(serializers.Serializer):
+    """Validates a single client activity event before it is buffered."""
+    
+    activity_type = serializers.ChoiceField(choices=UserActivity.ACTIVITY_TYPE_CHOICES)
+    description = serializers.CharField(required=False, allow_blank=True, default='')
+    metadata = serializers.JSONField(required=False, default=dict)
+
+
 class LearningAnalyticsSerializer(serializers.ModelSerializer):
     """Serializer for learning analytics."""
     
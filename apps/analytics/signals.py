@@ -0,0 +1,145 @@
+"""
+Signal handlers that keep materialised analytics in step with domain events.
+"""
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.dispatch import receiver
+from apps.courses.models import Course, Enrollment
+from apps.courses.signals import lesson_progress_recorded
+from apps.assessments.signals import quiz_attempt_completed
+from apps.ai_tutor.models import ChatMessage, ChatSession
+from apps.users.models import User
+from .models import UserActivity, LearningAnalytics, CourseAnalytics
+from . import dashboard, pipeline, rollups
+
+
+def invalidate_teacher_dashboard_for(instance):
+    """Drop the dashboard of the instructor of ``instance.course``."""
+    # Use the loaded course if there is one; otherwise fetch only its instructor
+    if type(instance)._meta.get_field('course').is_cached(instance):
+        instructor_id = instance.course.instructor_id
+    else:
+        instructor_id = Course.objects.filter(pk=instance.course_id).values_list(
+            'instructor_id', flat=True
+        ).first()
+    if instructor_id is not None:
+        dashboard.invalidate_teacher_dashboard(instructor_id)
+
+
+@receiver(pre_save, sender=Enrollment)
+def remember_enrollment_status(sender, instance, update_fields=None, **kwargs):
+    """Keep the stored status so completions can be told apart on save."""
+    if instance._state.adding or (update_fields is not None and 'status' not in update_fields):
+        instance._previous_status = None
+        return
+    instance._previous_status = Enrollment.objects.filter(pk=instance.pk).values_list(
+        'status', flat=True
+    ).first()
+
+
+@receiver(post_save, sender=Enrollment)
+def update_dashboard_for_enrollment(sender, instance, created, **kwargs):
+    """Count new enrollments and completions; status changes force a rebuild."""
+    if created:
+        dashboard.record_enrollment(instance)
+        pipeline.record_event(instance.student_id, 'enrollment')
+        if instance.status == 'completed':
+            pipeline.record_event(instance.student_id, 'course_completed')
+    else:
+        dashboard.invalidate_student_dashboard(instance.student_id)
+        previous_status = getattr(instance, '_previous_status', None)
+        if previous_status is not None and previous_status != instance.status:
+            if instance.status == 'completed':
+                pipeline.record_event(instance.student_id, 'course_completed')
+            elif previous_status == 'completed':
+                pipeline.record_event(instance.student_id, 'course_reopened')
+    invalidate_teacher_dashboard_for(instance)
+
+
+@receiver(post_delete, sender=Enrollment)
+def invalidate_dashboards_for_enrollment(sender, instance, origin=None, **kwargs):
+    """Uncount the enrollment and rebuild both dashboards after it is removed."""
+    # The analytics of a deleted user go with them
+    if getattr(origin, 'model', type(origin)) is not User:
+        pipeline.record_event(
+            instance.student_id,
+            'enrollment_removed',
+            completed=instance.status == 'completed'
+        )
+    dashboard.invalidate_student_dashboard(instance.student_id)
+    invalidate_teacher_dashboard_for(instance)
+
+
+@receiver([post_save, post_delete], sender=Course)
+def invalidate_teacher_dashboard_for_course(sender, instance, **kwargs):
+    """Courses added, renamed or removed change the teacher's dashboard."""
+    dashboard.invalidate_teacher_dashboard(instance.instructor_id)
+
+
+@receiver(post_save, sender=CourseAnalytics)
+def invalidate_teacher_dashboard_for_ratings(sender, instance, **kwargs):
+    """Course ratings are shown on the teacher's dashboard."""
+    invalidate_teacher_dashboard_for(instance)
+
+
+@receiver(lesson_progress_recorded)
+def record_lesson_progress(sender, user, time_spent, lessons_completed, courses=(), **kwargs):
+    """
+    Feed study time and completed lessons into the analytics pipeline.
+
+    Completions are applied with queryset updates that send no Enrollment
+    signals, so the average progress on the instructors' dashboards is
+    dropped here.
+    """
+    pipeline.record_event(
+        user.id,
+        'lesson_progress',
+        time_spent=time_spent,
+        lessons_completed=lessons_completed
+    )
+    for instructor_id in {course.instructor_id for course in courses}:
+        dashboard.invalidate_teacher_dashboard(instructor_id)
+
+
+@receiver(quiz_attempt_completed)
+def update_dashboard_for_quiz(sender, attempt, **kwargs):
+    """Add completed quiz attempts to the dashboard and analytics."""
+    dashboard.record_quiz_completed(attempt)
+    pipeline.record_event(
+        attempt.student_id,
+        'quiz_completed',
+        score=attempt.score,
+        passed=attempt.passed
+    )
+
+
+@receiver(post_save, sender=ChatMessage)
+def record_chat_message(sender, instance, created, **kwargs):
+    """Count messages sent by students to the AI tutor."""
+    if created and instance.role == 'user':
+        # Messages are created with their session loaded; avoid refetching it
+        if ChatMessage._meta.get_field('session').is_cached(instance):
+            user_id = instance.session.user_id
+        else:
+            user_id = ChatSession.objects.values_list('user_id', flat=True).get(
+                pk=instance.session_id
+            )
+        pipeline.record_event(user_id, 'chat_message')
+
+
+@receiver(post_save, sender=UserActivity)
+def update_dashboard_for_activity(sender, instance, created, **kwargs):
+    """Add logged activity to the rollups, dashboard and analytics."""
+    if created:
+        rollups.increment_rollups([instance])
+        dashboard.record_activities(instance.user_id, [instance])
+        pipeline.record_event(
+            instance.user_id,
+            'activity',
+            activity_type=instance.activity_type
+        )
+
+
+@receiver(post_save, sender=LearningAnalytics)
+def update_dashboard_for_analytics(sender, instance, **kwargs):
+    """Refresh the analytics figures shown on the dashboard."""
+    dashboard.record_analytics(instance)
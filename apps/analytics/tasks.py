@@ -0,0 +1,78 @@
+"""
+Celery tasks for analytics aggregation.
+"""
+try:
+    from celery import shared_task
+except ImportError:
+    # Celery not installed, create dummy decorator
+    def shared_task(func):
+        return func
+
+from .pipeline import process_buffered_events, purge_folded_events
+from .course_analytics import materialize_course_analytics
+from .ingestion import drain_activity_buffer
+from .rollups import purge_expired_activities
+from .export import export_analytics
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def process_analytics_events(batch_size=1000):
+    """Fold buffered analytics events into LearningAnalytics."""
+    try:
+        processed = process_buffered_events(batch_size=batch_size)
+        if processed:
+            logger.info(f"Folded {processed} analytics events")
+        return {'success': True, 'processed': processed}
+    except Exception as e:
+        logger.error(f"Analytics event processing failed: {str(e)}")
+        return {'success': False, 'error': str(e)}
+
+
+@shared_task
+def ingest_activities(batch_size=5000):
+    """Bulk insert buffered user activity events."""
+    try:
+        written = drain_activity_buffer(batch_size=batch_size)
+        if written:
+            logger.info(f"Ingested {written} user activities")
+        return {'success': True, 'written': written}
+    except Exception as e:
+        logger.error(f"Activity ingestion failed: {str(e)}")
+        return {'success': False, 'error': str(e)}
+
+
+@shared_task
+def refresh_course_analytics():
+    """Materialise enrollment and quiz figures into CourseAnalytics."""
+    try:
+        refreshed = materialize_course_analytics()
+        return {'success': True, 'courses': refreshed}
+    except Exception as e:
+        logger.error(f"Course analytics refresh failed: {str(e)}")
+        return {'success': False, 'error': str(e)}
+
+
+@shared_task
+def purge_activities():
+    """Delete raw activity rows and folded event IDs past their retention."""
+    try:
+        deleted = purge_expired_activities()
+        folded = purge_folded_events()
+        return {'success': True, 'deleted': deleted, 'folded_events': folded}
+    except Exception as e:
+        logger.error(f"Activity purge failed: {str(e)}")
+        return {'success': False, 'error': str(e)}
+
+
+@shared_task
+def export_analytics_parquet():
+    """Incrementally export analytics tables to Parquet."""
+    try:
+        results = export_analytics()
+        return {'success': True, 'exported': results}
+    except Exception as e:
+        logger.error(f"Analytics export failed: {str(e)}")
+        return {'success': False, 'error': str(e)}
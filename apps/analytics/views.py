@@ -1,15 +1,22 @@
 """
 Views for analytics and progress tracking.
 """
-from rest_framework import permissions
+from rest_framework import permissions, status
 from rest_framework.decorators import api_view, permission_classes
-from django.db.models import Avg, Count, Sum
-from django.utils import timezone
-from datetime import timedelta
-from backend.utils import success_response
-from .models import UserActivity, LearningAnalytics, CourseAnalytics
+from django.shortcuts import get_object_or_404
+from backend.utils import success_response, error_response
+from .models import CourseAnalytics
+from .course_analytics import DEFAULT_BUCKET_SIZE, get_enrollment_stats, get_quiz_stats
+from .ingestion import enqueue_activities
+from .serializers import ActivityEventSerializer
+from .dashboard import (
+    get_student_dashboard as get_student_dashboard_data,
+    get_teacher_dashboard as get_teacher_dashboard_data
+)
 from apps.courses.models import Enrollment
-from apps.assessments.models import QuizAttempt
+
+# Upper bound on events accepted by a single batched activity request
+MAX_ACTIVITY_BATCH_SIZE = 1000
 
 
 @api_view(['GET'])
@@ -17,59 +24,7 @@ from apps.assessments.models import QuizAttempt
 def get_student_dashboard(request):
     """Get comprehensive dashboard data for students."""
     
-    user = request.user
-    
-    # Get or create learning analytics
-    analytics, created = LearningAnalytics.objects.get_or_create(user=user)
-    
-    # Get enrollments
-    enrollments = Enrollment.objects.filter(student=user)
-    
-    # Recent activity
-    recent_activities = UserActivity.objects.filter(user=user)[:10]
-    
-    # Quiz performance
-    recent_quizzes = QuizAttempt.objects.filter(
-        student=user,
-        status='completed'
-    ).order_by('-completed_at')[:5]
-    
-    # Calculate weekly progress
-    week_ago = timezone.now() - timedelta(days=7)
-    weekly_activities = UserActivity.objects.filter(
-        user=user,
-        created_at__gte=week_ago
-    ).values('activity_type').annotate(count=Count('id'))
-    
-    dashboard_data = {
-        'user_info': {
-            'name': user.full_name,
-            'email': user.email,
-            'learning_style': user.learning_style,
-        },
-        'analytics': {
-            'total_study_time': analytics.total_study_time,
-            'current_streak': analytics.current_streak,
-            'courses_enrolled': analytics.courses_enrolled,
-            'courses_completed': analytics.courses_completed,
-            'average_quiz_score': analytics.average_quiz_score,
-        },
-        'enrollments': {
-            'total': enrollments.count(),
-            'active': enrollments.filter(status='active').count(),
-            'completed': enrollments.filter(status='completed').count(),
-        },
-        'recent_quizzes': [
-            {
-                'quiz_title': attempt.quiz.title,
-                'score': attempt.score,
-                'passed': attempt.passed,
-                'completed_at': attempt.completed_at,
-            }
-            for attempt in recent_quizzes
-        ],
-        'weekly_activity': list(weekly_activities),
-    }
+    dashboard_data = get_student_dashboard_data(request.user)
     
     return success_response(data=dashboard_data)
 
@@ -85,43 +40,7 @@ def get_teacher_dashboard(request):
             status_code=403
         )
     
-    from apps.courses.models import Course
-    
-    # Get teacher's courses
-    courses = Course.objects.filter(instructor=request.user)
-    
-    # Aggregate statistics
-    total_students = Enrollment.objects.filter(
-        course__in=courses
-    ).values('student').distinct().count()
-    
-    total_enrollments = Enrollment.objects.filter(course__in=courses).count()
-    
-    # Course performance
-    course_stats = []
-    for course in courses:
-        enrollments = Enrollment.objects.filter(course=course)
-        analytics, _ = CourseAnalytics.objects.get_or_create(course=course)
-        
-        course_stats.append({
-            'course_id': str(course.id),
-            'title': course.title,
-            'total_students': enrollments.count(),
-            'active_students': enrollments.filter(status='active').count(),
-            'average_progress': enrollments.aggregate(
-                avg=Avg('progress_percentage')
-            )['avg'] or 0,
-            'average_rating': analytics.average_rating,
-        })
-    
-    dashboard_data = {
-        'summary': {
-            'total_courses': courses.count(),
-            'total_students': total_students,
-            'total_enrollments': total_enrollments,
-        },
-        'courses': course_stats,
-    }
+    dashboard_data = get_teacher_dashboard_data(request.user)
     
     return success_response(data=dashboard_data)
 
@@ -133,7 +52,7 @@ def get_course_analytics(request, course_id):
     
     from apps.courses.models import Course
     
-    course = Course.objects.get(id=course_id)
+    course = get_object_or_404(Course, id=course_id)
     
     # Check permission
     if not (request.user.is_teacher and course.instructor == request.user):
@@ -142,41 +61,24 @@ def get_course_analytics(request, course_id):
             status_code=403
         )
     
-    analytics, _ = CourseAnalytics.objects.get_or_create(course=course)
+    try:
+        bucket_size = int(request.query_params.get('bucket_size', DEFAULT_BUCKET_SIZE))
+    except ValueError:
+        bucket_size = 0
+    if not 1 <= bucket_size <= 100:
+        return error_response(
+            message="bucket_size must be an integer between 1 and 100",
+            status_code=status.HTTP_400_BAD_REQUEST
+        )
     
-    # Get detailed enrollment data
-    enrollments = Enrollment.objects.filter(course=course)
-    
-    # Student progress distribution
-    progress_distribution = {
-        '0-25%': enrollments.filter(progress_percentage__lt=25).count(),
-        '25-50%': enrollments.filter(
-            progress_percentage__gte=25,
-            progress_percentage__lt=50
-        ).count(),
-        '50-75%': enrollments.filter(
-            progress_percentage__gte=50,
-            progress_percentage__lt=75
-        ).count(),
-        '75-100%': enrollments.filter(progress_percentage__gte=75).count(),
-    }
+    analytics, _ = CourseAnalytics.objects.get_or_create(course=course)
     
-    # Quiz performance
-    from apps.assessments.models import Quiz, QuizAttempt
-    quizzes = Quiz.objects.filter(course=course)
-    quiz_stats = []
-    
-    for quiz in quizzes:
-        attempts = QuizAttempt.objects.filter(quiz=quiz, status='completed')
-        quiz_stats.append({
-            'quiz_title': quiz.title,
-            'total_attempts': attempts.count(),
-            'average_score': attempts.aggregate(avg=Avg('score'))['avg'] or 0,
-            'pass_rate': (
-                attempts.filter(passed=True).count() / attempts.count() * 100
-                if attempts.count() > 0 else 0
-            ),
-        })
+    # Counts and the progress histogram in a single aggregate query
+    enrollment_stats = get_enrollment_stats(
+        Enrollment.objects.filter(course=course),
+        bucket_size=bucket_size
+    )
+    total = enrollment_stats['total']
     
     analytics_data = {
         'course_info': {
@@ -184,13 +86,15 @@ def get_course_analytics(request, course_id):
             'total_lessons': course.total_lessons,
         },
         'enrollment_stats': {
-            'total': enrollments.count(),
-            'active': enrollments.filter(status='active').count(),
-            'completed': enrollments.filter(status='completed').count(),
-            'completion_rate': analytics.completion_rate,
+            'total': total,
+            'active': enrollment_stats['active'],
+            'completed': enrollment_stats['completed'],
+            'completion_rate': (
+                enrollment_stats['completed'] / total * 100 if total > 0 else 0
+            ),
         },
-        'progress_distribution': progress_distribution,
-        'quiz_performance': quiz_stats,
+        'progress_distribution': enrollment_stats['progress_distribution'],
+        'quiz_performance': get_quiz_stats(course),
         'ratings': {
             'average_rating': analytics.average_rating,
             'total_reviews': analytics.total_reviews,
@@ -203,20 +107,43 @@ def get_course_analytics(request, course_id):
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
 def log_activity(request):
-    """Log user activity."""
+    """
+    Log user activity.
     
-    activity_type = request.data.get('activity_type')
-    description = request.data.get('description', '')
-    metadata = request.data.get('metadata', {})
+    Accepts a single event or ``{"events": [...]}``. Events are buffered
+    and written in bulk by a background task.
+    """
     
-    activity = UserActivity.objects.create(
-        user=request.user,
-        activity_type=activity_type,
-        description=description,
-        metadata=metadata
-    )
+    batched = 'events' in request.data
+    events = request.data.get('events') if batched else [request.data]
     
+    if not isinstance(events, list) or not events:
+        return error_response(
+            message="A non-empty list of events is required",
+            status_code=status.HTTP_400_BAD_REQUEST
+        )
+    if len(events) > MAX_ACTIVITY_BATCH_SIZE:
+        return error_response(
+            message=f"At most {MAX_ACTIVITY_BATCH_SIZE} events can be sent per batch",
+            status_code=status.HTTP_400_BAD_REQUEST
+        )
+    
+    serializer = ActivityEventSerializer(data=events, many=True)
+    if not serializer.is_valid():
+        return error_response(
+            message="Invalid activity events",
+            details=serializer.errors,
+            status_code=status.HTTP_400_BAD_REQUEST
+        )
+    
+    activity_ids = enqueue_activities(request.user.id, serializer.validated_data)
+    
+    if batched:
+        return success_response(
+            data={'activity_ids': activity_ids},
+            message=f"{len(activity_ids)} activities logged"
+        )
     return success_response(
-        data={'activity_id': str(activity.id)},
+        data={'activity_id': activity_ids[0]},
         message="Activity logged"
-    )
\ No newline at end of file
+    )
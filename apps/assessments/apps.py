@@ -4,4 +4,7 @@ from django.apps import AppConfig
 class AssessmentsConfig(AppConfig):
     default_auto_field: str = 'django.db.models.BigAutoField'  # type: ignore[assignment]
     name = 'apps.assessments'
-    verbose_name = 'Assessments & Quizzes'
\ No newline at end of file
+    verbose_name = 'Assessments & Quizzes'
+
+    def ready(self):
+        import apps.assessments.signals
\ No newline at end of file
@@ -1,8 +1,10 @@
 """
 Models for assessments, quizzes, and tests.
 """
-from django.db import models
+from django.db import models, IntegrityError, transaction
+from django.db.models import F, Max, Sum
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.utils import timezone
 from apps.users.models import User
 from apps.courses.models import Course, Lesson
 import uuid
@@ -60,6 +62,10 @@ class Quiz(models.Model):
     
     @property
     def total_questions(self):
+        # Avoid a COUNT when the questions have already been prefetched
+        prefetched = getattr(self, '_prefetched_objects_cache', {})
+        if 'questions' in prefetched:
+            return len(prefetched['questions'])
         return self.questions.count()
 
 
@@ -156,17 +162,84 @@ class QuizAttempt(models.Model):
     def __str__(self):
         return f"{self.student.email} - {self.quiz.title} (Attempt {self.attempt_number})"
     
-    def calculate_score(self):
-        """Calculate the score for this attempt."""
-        responses = self.responses.all()
-        total_points = sum(r.question.points for r in responses)
-        earned_points = sum(r.points_earned for r in responses)
-        
+    def set_score(self, total_points, earned_points):
+        """Set points, score and pass status from precomputed totals."""
         self.total_points = total_points
         self.earned_points = earned_points
         self.score = (earned_points / total_points * 100) if total_points > 0 else 0
         self.passed = self.score >= self.quiz.passing_score
-        self.save()
+    
+    def calculate_score(self, save=True):
+        """Calculate the score for this attempt in a single aggregate query."""
+        totals = self.responses.aggregate(
+            total_points=Sum('question__points'),
+            earned_points=Sum('points_earned')
+        )
+        self.set_score(totals['total_points'] or 0, totals['earned_points'] or 0)
+        if save:
+            self.save()
+    
+    def mark_completed(self):
+        """Set completion status and timing (the caller saves)."""
+        self.status = 'completed'
+        self.completed_at = timezone.now()
+        self.time_taken = int((self.completed_at - self.started_at).total_seconds())
+
+
+class QuizAttemptCounter(models.Model):
+    """Per-(quiz, student) counter used to allocate attempt numbers atomically."""
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE, related_name='attempt_counters')
+    student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='quiz_attempt_counters')
+    attempts_started = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'quiz_attempt_counters'
+        unique_together = ['quiz', 'student']
+    
+    def __str__(self):
+        return f"{self.student.email} - {self.quiz.title} ({self.attempts_started} started)"
+    
+    @classmethod
+    def get_for(cls, quiz, student):
+        """Fetch the counter, seeding it from existing attempts on first use."""
+        try:
+            return cls.objects.get(quiz=quiz, student=student)
+        except cls.DoesNotExist:
+            started = QuizAttempt.objects.filter(
+                quiz=quiz, student=student
+            ).aggregate(last=Max('attempt_number'))['last'] or 0
+            try:
+                with transaction.atomic():
+                    return cls.objects.create(
+                        quiz=quiz, student=student, attempts_started=started
+                    )
+            except IntegrityError:
+                return cls.objects.get(quiz=quiz, student=student)
+    
+    @classmethod
+    def allocate(cls, quiz, student):
+        """
+        Reserve the next attempt number for a student.
+        
+        A single conditional increment both checks the limit and takes the
+        row lock, so concurrent requests queue on the counter, never
+        receive the same number and cannot exceed the limit. Returns None
+        once ``quiz.max_attempts`` is reached.
+        """
+        counter = cls.get_for(quiz, student)
+        
+        with transaction.atomic():
+            allocated = cls.objects.filter(
+                pk=counter.pk,
+                attempts_started__lt=quiz.max_attempts
+            ).update(attempts_started=F('attempts_started') + 1)
+            if not allocated:
+                return None
+            # The row is locked by the update, so this reads our own increment
+            return cls.objects.values_list('attempts_started', flat=True).get(pk=counter.pk)
 
 
 class QuestionResponse(models.Model):
@@ -72,6 +72,14 @@ class QuestionResponseSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'is_correct', 'points_earned', 'ai_feedback', 'answered_at']
 
 
+class AnswerSubmissionSerializer(serializers.Serializer):
+    """Serializer for one answer in a whole-attempt submission."""
+    
+    question_id = serializers.UUIDField()
+    selected_answer_id = serializers.UUIDField(required=False, allow_null=True)
+    text_answer = serializers.CharField(required=False, allow_blank=True)
+
+
 class QuizAttemptSerializer(serializers.ModelSerializer):
     """Serializer for quiz attempts."""
     
@@ -0,0 +1,32 @@
+"""
+Signal handlers for assessment-related events.
+"""
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver, Signal
+from django.utils import timezone
+from .models import Quiz, Question, Answer
+from .snapshots import get_quiz_snapshot
+
+# Sent with ``attempt`` once a quiz attempt has been graded and completed
+quiz_attempt_completed = Signal()
+
+
+@receiver(post_save, sender=Quiz)
+def compile_published_quiz(sender, instance, **kwargs):
+    """Compile the quiz snapshot as soon as a quiz is published."""
+    if instance.is_published:
+        get_quiz_snapshot(instance)
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def touch_quiz_for_question(sender, instance, **kwargs):
+    """Bump the quiz version so its snapshot is recompiled."""
+    Quiz.objects.filter(pk=instance.quiz_id).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Answer)
+@receiver(post_delete, sender=Answer)
+def touch_quiz_for_answer(sender, instance, **kwargs):
+    """Bump the quiz version so its snapshot is recompiled."""
+    Quiz.objects.filter(questions=instance.question_id).update(updated_at=timezone.now())
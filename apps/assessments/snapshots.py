@@ -0,0 +1,64 @@
+"""
+Compiled quiz snapshots.
+
+Published quizzes are effectively immutable, so the full payload served by
+``QuizDetailView`` (questions and answers) and the answer key used for
+grading are compiled once and kept in the cache. Snapshots are versioned by
+``Quiz.updated_at``, which question and answer signals bump on every edit,
+so a stale snapshot is never served.
+"""
+from django.core.cache import cache
+import logging
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_TIMEOUT = 60 * 60 * 24  # 24 hours
+
+
+def get_snapshot_key(quiz):
+    """Cache key for the snapshot of a quiz at its current version."""
+    version = int(quiz.updated_at.timestamp() * 1_000_000)
+    return f"quiz_snapshot:{quiz.id}:{version}"
+
+
+def build_quiz_snapshot(quiz):
+    """
+    Compile the serialized payload and answer key for a quiz.
+
+    Args:
+        quiz: Quiz instance
+
+    Returns:
+        dict with ``quiz`` (serialized payload) and ``answer_key``
+    """
+    from .models import Quiz
+    from .serializers import QuizSerializer
+
+    quiz = Quiz.objects.prefetch_related('questions__answers').get(pk=quiz.pk)
+
+    answer_key = {}
+    for question in quiz.questions.all():
+        answer_key[str(question.id)] = {
+            'points': question.points,
+            'answers': {
+                str(answer.id): answer.is_correct
+                for answer in question.answers.all()
+            },
+        }
+
+    return {
+        'quiz': QuizSerializer(quiz).data,
+        'answer_key': answer_key,
+        'total_points': sum(entry['points'] for entry in answer_key.values()),
+    }
+
+
+def get_quiz_snapshot(quiz):
+    """Return the cached snapshot for a quiz, compiling it on a miss."""
+    cache_key = get_snapshot_key(quiz)
+    snapshot = cache.get(cache_key)
+    if snapshot is None:
+        logger.info(f"Quiz snapshot cache miss: {quiz.id}")
+        snapshot = build_quiz_snapshot(quiz)
+        cache.set(cache_key, snapshot, SNAPSHOT_TIMEOUT)
+    return snapshot
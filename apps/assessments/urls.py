@@ -15,5 +15,6 @@ urlpatterns = [
     path('quizzes/<uuid:quiz_id>/start/', views.start_quiz_attempt, name='start-attempt'),
     path('attempts/<uuid:attempt_id>/answer/', views.submit_answer, name='submit-answer'),
     path('attempts/<uuid:attempt_id>/complete/', views.complete_quiz_attempt, name='complete-attempt'),
+    path('attempts/<uuid:attempt_id>/submit/', views.submit_quiz_attempt, name='submit-attempt'),
     path('my-attempts/', views.my_quiz_attempts, name='my-attempts'),
 ]
\ No newline at end of file
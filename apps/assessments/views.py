@@ -3,14 +3,18 @@ Views for assessments and quizzes.
 """
 from rest_framework import generics, permissions, status
 from rest_framework.decorators import api_view, permission_classes
+from rest_framework.response import Response
+from django.db import transaction
 from django.shortcuts import get_object_or_404
-from django.utils import timezone
 from backend.utils import success_response, error_response
-from .models import Quiz, Question, QuizAttempt, QuestionResponse
+from .models import Quiz, QuizAttempt, QuizAttemptCounter, QuestionResponse
 from .serializers import (
     QuizSerializer, QuizListSerializer, QuizAttemptSerializer,
-    QuestionResponseSerializer
+    QuestionResponseSerializer, AnswerSubmissionSerializer
 )
+from .signals import quiz_attempt_completed
+from .snapshots import get_quiz_snapshot
+import uuid
 
 
 class QuizListView(generics.ListAPIView):
@@ -30,11 +34,23 @@ class QuizListView(generics.ListAPIView):
 
 
 class QuizDetailView(generics.RetrieveAPIView):
-    """Get quiz details."""
+    """Get quiz details from the compiled quiz snapshot."""
     
     serializer_class = QuizSerializer
     permission_classes = [permissions.IsAuthenticated]
     queryset = Quiz.objects.filter(is_published=True)
+    
+    def retrieve(self, request, *args, **kwargs):
+        quiz = self.get_object()
+        return Response(get_quiz_snapshot(quiz)['quiz'])
+
+
+def _normalize_id(value):
+    """Normalise a client-supplied UUID to the form used in answer keys."""
+    try:
+        return str(uuid.UUID(str(value)))
+    except ValueError:
+        return None
 
 
 @api_view(['POST'])
@@ -44,25 +60,23 @@ def start_quiz_attempt(request, quiz_id):
     
     quiz = get_object_or_404(Quiz, id=quiz_id, is_published=True)
     
-    # Check attempt limit
-    attempts_count = QuizAttempt.objects.filter(
-        quiz=quiz,
-        student=request.user
-    ).count()
-    
-    if attempts_count >= quiz.max_attempts:
-        return error_response(
-            message=f"Maximum attempts ({quiz.max_attempts}) reached",
-            status_code=status.HTTP_400_BAD_REQUEST
+    # Allocate the attempt number and create the attempt together, so a
+    # failed insert releases the reserved number
+    with transaction.atomic():
+        attempt_number = QuizAttemptCounter.allocate(quiz, request.user)
+        
+        if attempt_number is None:
+            return error_response(
+                message=f"Maximum attempts ({quiz.max_attempts}) reached",
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
+        
+        attempt = QuizAttempt.objects.create(
+            quiz=quiz,
+            student=request.user,
+            attempt_number=attempt_number
         )
     
-    # Create new attempt
-    attempt = QuizAttempt.objects.create(
-        quiz=quiz,
-        student=request.user,
-        attempt_number=attempts_count + 1
-    )
-    
     return success_response(
         data=QuizAttemptSerializer(attempt).data,
         message="Quiz attempt started",
@@ -76,7 +90,7 @@ def submit_answer(request, attempt_id):
     """Submit an answer for a question."""
     
     attempt = get_object_or_404(
-        QuizAttempt,
+        QuizAttempt.objects.select_related('quiz'),
         id=attempt_id,
         student=request.user,
         status='in_progress'
@@ -86,20 +100,34 @@ def submit_answer(request, attempt_id):
     selected_answer_id = request.data.get('selected_answer_id')
     text_answer = request.data.get('text_answer', '')
     
-    question = get_object_or_404(Question, id=question_id, quiz=attempt.quiz)
+    # Grade against the compiled answer key rather than the database
+    answer_key = get_quiz_snapshot(attempt.quiz)['answer_key']
+    question_id = _normalize_id(question_id)
+    question_key = answer_key.get(question_id)
+    if question_key is None:
+        return error_response(
+            message="Question not found in this quiz",
+            status_code=status.HTTP_404_NOT_FOUND
+        )
+    
+    answer_id = _normalize_id(selected_answer_id) if selected_answer_id else None
+    if selected_answer_id and answer_id not in question_key['answers']:
+        return error_response(
+            message="Answer not found for this question",
+            status_code=status.HTTP_404_NOT_FOUND
+        )
     
     # Create or update response
     response, created = QuestionResponse.objects.get_or_create(
         attempt=attempt,
-        question=question
+        question_id=question_id
     )
     
-    if selected_answer_id:
-        from .models import Answer
-        selected_answer = get_object_or_404(Answer, id=selected_answer_id)
-        response.selected_answer = selected_answer
-        response.is_correct = selected_answer.is_correct
-        response.points_earned = question.points if selected_answer.is_correct else 0
+    if answer_id:
+        is_correct = question_key['answers'][answer_id]
+        response.selected_answer_id = answer_id
+        response.is_correct = is_correct
+        response.points_earned = question_key['points'] if is_correct else 0
     
     if text_answer:
         response.text_answer = text_answer
@@ -124,12 +152,11 @@ def complete_quiz_attempt(request, attempt_id):
         status='in_progress'
     )
     
-    # Calculate score
-    attempt.calculate_score()
-    attempt.status = 'completed'
-    attempt.completed_at = timezone.now()
-    attempt.time_taken = (attempt.completed_at - attempt.started_at).seconds
+    # Calculate score and complete with a single save
+    attempt.calculate_score(save=False)
+    attempt.mark_completed()
     attempt.save()
+    quiz_attempt_completed.send(sender=QuizAttempt, attempt=attempt)
     
     return success_response(
         data=QuizAttemptSerializer(attempt).data,
@@ -137,6 +164,119 @@ def complete_quiz_attempt(request, attempt_id):
     )
 
 
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def submit_quiz_attempt(request, attempt_id):
+    """
+    Submit every answer for an attempt at once and complete it.
+    
+    Expects ``{"answers": [{"question_id", "selected_answer_id",
+    "text_answer"}, ...]}``. Answers are graded against the compiled answer
+    key, responses are written with ``bulk_create``/``bulk_update`` and the
+    score is computed in one pass before a single save of the attempt.
+    """
+    attempt = get_object_or_404(
+        QuizAttempt.objects.select_related('quiz'),
+        id=attempt_id,
+        student=request.user,
+        status='in_progress'
+    )
+    
+    serializer = AnswerSubmissionSerializer(data=request.data.get('answers'), many=True)
+    if not serializer.is_valid():
+        return error_response(
+            message="Invalid answers",
+            details=serializer.errors,
+            status_code=status.HTTP_400_BAD_REQUEST
+        )
+    
+    answer_key = get_quiz_snapshot(attempt.quiz)['answer_key']
+    
+    # Validate every answer against the key before writing anything
+    submitted = {}
+    invalid = []
+    for answer in serializer.validated_data:
+        question_id = str(answer['question_id'])
+        answer_id = answer.get('selected_answer_id')
+        answer_id = str(answer_id) if answer_id else None
+        question_key = answer_key.get(question_id)
+        if question_key is None or (answer_id and answer_id not in question_key['answers']):
+            invalid.append(question_id)
+            continue
+        submitted[question_id] = (answer_id, answer.get('text_answer', ''))
+    
+    if invalid:
+        return error_response(
+            message="Some answers do not belong to this quiz",
+            details={'question_ids': invalid},
+            status_code=status.HTTP_400_BAD_REQUEST
+        )
+    
+    with transaction.atomic():
+        # Lock the attempt so concurrent submits complete it only once
+        attempt_status = QuizAttempt.objects.select_for_update().values_list(
+            'status', flat=True
+        ).get(pk=attempt.pk)
+        if attempt_status != 'in_progress':
+            return error_response(
+                message="Quiz attempt has already been submitted",
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
+        
+        responses = {
+            str(response.question_id): response
+            for response in QuestionResponse.objects.filter(attempt=attempt)
+        }
+        to_create = []
+        to_update = []
+        
+        for question_id, (answer_id, text_answer) in submitted.items():
+            response = responses.get(question_id)
+            if response is None:
+                response = QuestionResponse(attempt=attempt, question_id=question_id)
+                responses[question_id] = response
+                to_create.append(response)
+            else:
+                to_update.append(response)
+            
+            if answer_id:
+                is_correct = answer_key[question_id]['answers'][answer_id]
+                response.selected_answer_id = answer_id
+                response.is_correct = is_correct
+                response.points_earned = answer_key[question_id]['points'] if is_correct else 0
+            if text_answer:
+                response.text_answer = text_answer
+        
+        QuestionResponse.objects.bulk_create(to_create)
+        QuestionResponse.objects.bulk_update(
+            to_update,
+            ['selected_answer', 'text_answer', 'is_correct', 'points_earned']
+        )
+        
+        # Score every response for the attempt in one pass
+        total_points = 0
+        earned_points = 0
+        for question_id, response in responses.items():
+            if question_id in answer_key:
+                total_points += answer_key[question_id]['points']
+                earned_points += response.points_earned
+        
+        attempt.set_score(total_points, earned_points)
+        attempt.mark_completed()
+        attempt.save()
+    
+    quiz_attempt_completed.send(sender=QuizAttempt, attempt=attempt)
+    
+    attempt = QuizAttempt.objects.select_related('quiz').prefetch_related(
+        'responses__question__answers'
+    ).get(pk=attempt.pk)
+    
+    return success_response(
+        data=QuizAttemptSerializer(attempt).data,
+        message="Quiz submitted"
+    )
+
+
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def my_quiz_attempts(request):
@@ -4,4 +4,7 @@ from django.apps import AppConfig
 class CoursesConfig(AppConfig):
     default_auto_field: str = 'django.db.models.BigAutoField'  # type: ignore[assignment]
     name = 'apps.courses'
-    verbose_name = 'Course Management'
\ No newline at end of file
+    verbose_name = 'Course Management'
+
+    def ready(self):
+        import apps.courses.signals
\ No newline at end of file
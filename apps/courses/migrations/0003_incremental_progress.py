@@ -0,0 +1,44 @@
+# Generated by Django 4.2.7 on 2026-10-19 08:03
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def backfill_progress_counters(apps, schema_editor):
+    Course = apps.get_model("courses", "Course")
+    Enrollment = apps.get_model("courses", "Enrollment")
+
+    for course in Course.objects.annotate(total=Count("lessons")):
+        Course.objects.filter(pk=course.pk).update(lessons_count=course.total)
+
+    for enrollment in Enrollment.objects.annotate(
+        completed=Count("lesson_progress", filter=Q(lesson_progress__is_completed=True))
+    ):
+        Enrollment.objects.filter(pk=enrollment.pk).update(
+            completed_lessons_count=enrollment.completed
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("courses", "0002_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="course",
+            name="lessons_count",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="enrollment",
+            name="completed_lessons_count",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_progress_counters, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name="enrollment",
+            name="completed_lessons",
+        ),
+    ]
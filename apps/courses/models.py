@@ -2,7 +2,10 @@
 Models for course and lesson management.
 """
 from django.db import models
+from django.db.models import F, Value
+from django.db.models.functions import Least
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.utils import timezone
 from apps.users.models import User
 import uuid
 
@@ -46,6 +49,9 @@ class Course(models.Model):
     prerequisites = models.TextField(blank=True)
     learning_objectives = models.JSONField(default=list, blank=True)
     
+    # Denormalised lesson total, maintained by lesson signals
+    lessons_count = models.IntegerField(default=0)
+    
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -71,7 +77,7 @@ class Course(models.Model):
     
     @property
     def total_lessons(self):
-        return self.lessons.count()
+        return self.lessons_count
     
     @property
     def total_students(self):
@@ -145,7 +151,7 @@ class Enrollment(models.Model):
         default=0.0,
         validators=[MinValueValidator(0.0), MaxValueValidator(100.0)]
     )
-    completed_lessons = models.JSONField(default=list, blank=True)
+    completed_lessons_count = models.IntegerField(default=0)
     
     # Timestamps
     enrolled_at = models.DateTimeField(auto_now_add=True)
@@ -160,12 +166,46 @@ class Enrollment(models.Model):
     def __str__(self):
         return f"{self.student.email} - {self.course.title}"
     
+    def complete_lessons(self, lesson_ids):
+        """
+        Mark lessons as completed and advance progress incrementally.
+        
+        The completion flag is flipped with a conditional update, so a lesson
+        completed from several tabs at once is only counted by the request
+        that wins the transition. Returns the number of newly completed lessons.
+        """
+        completed = LessonProgress.objects.filter(
+            enrollment=self,
+            lesson_id__in=lesson_ids,
+            is_completed=False
+        ).update(is_completed=True, completed_at=timezone.now())
+        
+        if completed:
+            completed_count = F('completed_lessons_count') + completed
+            # Queryset updates skip auto_now; exports watermark on last_accessed
+            updates = {'completed_lessons_count': completed_count, 'last_accessed': timezone.now()}
+            total_lessons = self.course.total_lessons
+            if total_lessons > 0:
+                updates['progress_percentage'] = Least(
+                    completed_count * 100.0 / total_lessons,
+                    Value(100.0)
+                )
+            Enrollment.objects.filter(pk=self.pk).update(**updates)
+            self.refresh_from_db(
+                fields=['completed_lessons_count', 'progress_percentage', 'last_accessed']
+            )
+        
+        return completed
+    
     def update_progress(self):
-        """Calculate and update progress percentage."""
+        """Recalculate progress from scratch (used to reconcile counters)."""
+        self.completed_lessons_count = self.lesson_progress.filter(is_completed=True).count()
         total_lessons = self.course.total_lessons
         if total_lessons > 0:
-            self.progress_percentage = (len(self.completed_lessons) / total_lessons) * 100
-            self.save()
+            self.progress_percentage = min(
+                (self.completed_lessons_count / total_lessons) * 100, 100.0
+            )
+        self.save(update_fields=['completed_lessons_count', 'progress_percentage', 'last_accessed'])
 
 
 class LessonProgress(models.Model):
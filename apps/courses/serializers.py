@@ -60,14 +60,23 @@ class EnrollmentSerializer(serializers.ModelSerializer):
     
     course = CourseListSerializer(read_only=True)
     student = UserListSerializer(read_only=True)
+    completed_lessons = serializers.SerializerMethodField()
     
     class Meta:
         model = Enrollment
         fields = [
             'id', 'student', 'course', 'status', 'progress_percentage',
-            'completed_lessons', 'enrolled_at', 'completed_at', 'last_accessed'
+            'completed_lessons', 'completed_lessons_count', 'enrolled_at',
+            'completed_at', 'last_accessed'
         ]
-        read_only_fields = ['id', 'enrolled_at', 'last_accessed']
+        read_only_fields = ['id', 'completed_lessons_count', 'enrolled_at', 'last_accessed']
+    
+    def get_completed_lessons(self, obj):
+        # Use the prefetched completed rows when the view provides them
+        completed = getattr(obj, 'completed_progress', None)
+        if completed is None:
+            completed = obj.lesson_progress.filter(is_completed=True).only('lesson_id')
+        return [str(progress.lesson_id) for progress in completed]
 
 
 class LessonProgressSerializer(serializers.ModelSerializer):
@@ -85,6 +94,17 @@ class LessonProgressSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'started_at', 'last_accessed']
 
 
+class LessonProgressEventSerializer(serializers.Serializer):
+    """Serializer for a single event in a batched progress update."""
+    
+    lesson_id = serializers.UUIDField()
+    time_spent = serializers.IntegerField(min_value=0, required=False)
+    completion_percentage = serializers.FloatField(
+        min_value=0.0, max_value=100.0, required=False
+    )
+    notes = serializers.CharField(required=False, allow_blank=True)
+
+
 class CourseReviewSerializer(serializers.ModelSerializer):
     """Serializer for course reviews."""
     
@@ -0,0 +1,29 @@
+"""
+Signal handlers for course-related events.
+"""
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver, Signal
+from .models import Course, Lesson
+
+# Sent with ``user``, ``time_spent`` (seconds added), ``lessons_completed``
+# and ``courses`` (the courses lessons were completed in) whenever a
+# progress update has been applied
+lesson_progress_recorded = Signal()
+
+
+@receiver(post_save, sender=Lesson)
+def increment_lessons_count(sender, instance, created, **kwargs):
+    """Keep the cached lesson total in step when a lesson is added."""
+    if created:
+        Course.objects.filter(pk=instance.course_id).update(
+            lessons_count=F('lessons_count') + 1
+        )
+
+
+@receiver(post_delete, sender=Lesson)
+def decrement_lessons_count(sender, instance, **kwargs):
+    """Keep the cached lesson total in step when a lesson is removed."""
+    Course.objects.filter(pk=instance.course_id).update(
+        lessons_count=F('lessons_count') - 1
+    )
@@ -17,6 +17,7 @@ urlpatterns = [
     
     # Lesson Progress
     path('lessons/<uuid:lesson_id>/progress/', views.update_lesson_progress, name='lesson-progress'),
+    path('lessons/progress/batch/', views.bulk_update_lesson_progress, name='lesson-progress-batch'),
     
     # Reviews
     path('<uuid:course_id>/reviews/', views.CourseReviewListCreateView.as_view(), name='course-reviews'),
@@ -3,15 +3,22 @@ Views for course management.
 """
 from rest_framework import generics, permissions, status, serializers
 from rest_framework.decorators import api_view, permission_classes
+from django.db import transaction
+from django.db.models import Prefetch
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
 from backend.utils import success_response, error_response
 from .models import Course, Lesson, Enrollment, LessonProgress, CourseReview
 from .serializers import (
     CourseSerializer, CourseListSerializer, LessonSerializer,
-    EnrollmentSerializer, LessonProgressSerializer, CourseReviewSerializer
+    EnrollmentSerializer, LessonProgressSerializer, CourseReviewSerializer,
+    LessonProgressEventSerializer
 )
 from .permissions import IsTeacherOrReadOnly, IsEnrolledStudent
+from .signals import lesson_progress_recorded
+
+# Upper bound on events accepted by a single batched progress request
+MAX_PROGRESS_BATCH_SIZE = 500
 
 
 class CourseListCreateView(generics.ListCreateAPIView):
@@ -95,7 +102,15 @@ def enroll_course(request, course_id):
 @permission_classes([permissions.IsAuthenticated])
 def my_enrollments(request):
     """Get current user's enrollments."""
-    enrollments = Enrollment.objects.filter(student=request.user)
+    enrollments = Enrollment.objects.filter(student=request.user).prefetch_related(
+        Prefetch(
+            'lesson_progress',
+            queryset=LessonProgress.objects.filter(is_completed=True).only(
+                'id', 'enrollment_id', 'lesson_id'
+            ),
+            to_attr='completed_progress'
+        )
+    )
     serializer = EnrollmentSerializer(enrollments, many=True)
     return success_response(data=serializer.data)
 
@@ -108,9 +123,9 @@ def update_lesson_progress(request, lesson_id):
     
     # Get enrollment
     enrollment = get_object_or_404(
-        Enrollment,
+        Enrollment.objects.select_related('course'),
         student=request.user,
-        course=lesson.course
+        course_id=lesson.course_id
     )
     
     # Get or create lesson progress
@@ -120,6 +135,7 @@ def update_lesson_progress(request, lesson_id):
     )
     
     # Update progress
+    previous_time_spent = progress.time_spent
     progress.time_spent = int(request.data.get('time_spent', progress.time_spent) or 0)
     progress.completion_percentage = int(request.data.get(
         'completion_percentage',
@@ -127,17 +143,24 @@ def update_lesson_progress(request, lesson_id):
     ) or 0)
     progress.notes = request.data.get('notes', progress.notes)
     
+    # Completion is flipped separately so concurrent requests cannot undo it
+    progress.save(update_fields=[
+        'time_spent', 'completion_percentage', 'notes', 'last_accessed'
+    ])
+    
     # Mark as completed if 100%
+    lessons_completed = 0
     if progress.completion_percentage >= 100 and not progress.is_completed:
-        progress.is_completed = True
-        progress.completed_at = timezone.now()
-        
-        # Update enrollment completed lessons
-        if str(lesson.id) not in enrollment.completed_lessons:
-            enrollment.completed_lessons.append(str(lesson.id))
-            enrollment.update_progress()
+        lessons_completed = enrollment.complete_lessons([lesson.id])
+        progress.refresh_from_db(fields=['is_completed', 'completed_at'])
     
-    progress.save()
+    lesson_progress_recorded.send(
+        sender=LessonProgress,
+        user=request.user,
+        time_spent=max(progress.time_spent - previous_time_spent, 0),
+        lessons_completed=lessons_completed,
+        courses=[enrollment.course] if lessons_completed else []
+    )
     
     return success_response(
         data=LessonProgressSerializer(progress).data,
@@ -145,6 +168,144 @@ def update_lesson_progress(request, lesson_id):
     )
 
 
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def bulk_update_lesson_progress(request):
+    """
+    Apply a batch of lesson progress events in a single request.
+    
+    Expects ``{"events": [{"lesson_id", "time_spent", "completion_percentage",
+    "notes"}, ...]}``. Enrollments are resolved with one query, missing
+    progress rows are inserted with ``bulk_create`` (ignoring rows a
+    concurrent request inserted first), every row is then locked and read
+    in one query and written back with ``bulk_update``, and enrollment
+    progress is advanced once per course. Events for lessons the user is
+    not enrolled in are reported back as skipped.
+    """
+    events = request.data.get('events')
+    if not isinstance(events, list) or not events:
+        return error_response(
+            message="A non-empty list of events is required",
+            status_code=status.HTTP_400_BAD_REQUEST
+        )
+    if len(events) > MAX_PROGRESS_BATCH_SIZE:
+        return error_response(
+            message=f"At most {MAX_PROGRESS_BATCH_SIZE} events can be sent per batch",
+            status_code=status.HTTP_400_BAD_REQUEST
+        )
+    
+    serializer = LessonProgressEventSerializer(data=events, many=True)
+    if not serializer.is_valid():
+        return error_response(
+            message="Invalid progress events",
+            details=serializer.errors,
+            status_code=status.HTTP_400_BAD_REQUEST
+        )
+    events = serializer.validated_data
+    
+    # Resolve lessons and the user's enrollments for their courses
+    lesson_ids = {event['lesson_id'] for event in events}
+    lessons = {
+        lesson.id: lesson
+        for lesson in Lesson.objects.filter(id__in=lesson_ids).only('id', 'course_id')
+    }
+    enrollments = {
+        enrollment.course_id: enrollment
+        for enrollment in Enrollment.objects.select_related('course').filter(
+            student=request.user,
+            course_id__in={lesson.course_id for lesson in lessons.values()}
+        )
+    }
+    
+    now = timezone.now()
+    skipped = []
+    time_spent_added = 0
+    
+    # Events for lessons the user is not enrolled in are skipped
+    targets = {}
+    for event in events:
+        lesson = lessons.get(event['lesson_id'])
+        enrollment = enrollments.get(lesson.course_id) if lesson else None
+        if enrollment is None:
+            skipped.append(str(event['lesson_id']))
+            continue
+        targets[(enrollment.id, lesson.id)] = (enrollment, lesson)
+    
+    with transaction.atomic():
+        # Insert missing rows, leaving rows created concurrently alone, then
+        # lock every row so the events apply on top of the latest values
+        placeholders = {
+            key: LessonProgress(enrollment=enrollment, lesson=lesson)
+            for key, (enrollment, lesson) in targets.items()
+        }
+        LessonProgress.objects.bulk_create(list(placeholders.values()), ignore_conflicts=True)
+        rows = {
+            (progress.enrollment_id, progress.lesson_id): progress
+            for progress in LessonProgress.objects.select_for_update().filter(
+                enrollment__in=list(enrollments.values()),
+                lesson_id__in=lesson_ids
+            )
+        }
+        created = sum(
+            rows[key].pk == placeholder.pk for key, placeholder in placeholders.items()
+        )
+        completed_by_enrollment = {}
+        
+        # Events are applied in order, so the latest heartbeat for a lesson wins
+        for event in events:
+            lesson = lessons.get(event['lesson_id'])
+            enrollment = enrollments.get(lesson.course_id) if lesson else None
+            if enrollment is None:
+                continue
+            
+            progress = rows[(enrollment.id, lesson.id)]
+            previous_time_spent = progress.time_spent
+            progress.time_spent = event.get('time_spent', progress.time_spent)
+            time_spent_added += max(progress.time_spent - previous_time_spent, 0)
+            progress.completion_percentage = event.get(
+                'completion_percentage',
+                progress.completion_percentage
+            )
+            progress.notes = event.get('notes', progress.notes)
+            progress.last_accessed = now
+            
+            if progress.completion_percentage >= 100 and not progress.is_completed:
+                completed_by_enrollment.setdefault(enrollment, set()).add(lesson.id)
+        
+        LessonProgress.objects.bulk_update(
+            [rows[key] for key in targets],
+            ['time_spent', 'completion_percentage', 'notes', 'last_accessed']
+        )
+        
+        # Advance progress once per affected enrollment
+        completed = 0
+        completed_courses = []
+        for enrollment, lesson_ids_completed in completed_by_enrollment.items():
+            newly_completed = enrollment.complete_lessons(lesson_ids_completed)
+            if newly_completed:
+                completed += newly_completed
+                completed_courses.append(enrollment.course)
+    
+    lesson_progress_recorded.send(
+        sender=LessonProgress,
+        user=request.user,
+        time_spent=time_spent_added,
+        lessons_completed=completed,
+        courses=completed_courses
+    )
+    
+    return success_response(
+        data={
+            'processed': len(events) - len(skipped),
+            'created': created,
+            'updated': len(targets) - created,
+            'completed': completed,
+            'skipped': skipped,
+        },
+        message="Progress updated successfully"
+    )
+
+
 class CourseReviewListCreateView(generics.ListCreateAPIView):
     """List and create course reviews."""
     
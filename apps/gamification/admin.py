@@ -2,7 +2,7 @@
 Admin configuration for gamification app.
 """
 from django.contrib import admin
-from .models import Badge, UserBadge, PointTransaction, Leaderboard, LeaderboardEntry, Challenge, UserChallenge, Reward, UserReward, Level, UserLevel
+from .models import Badge, UserBadge, PointTransaction, PointBalance, Leaderboard, LeaderboardEntry, Challenge, UserChallenge, Reward, UserReward, Level, UserLevel
 
 
 @admin.register(Badge)
@@ -34,6 +34,15 @@ class PointTransactionAdmin(admin.ModelAdmin):
     raw_id_fields = ['user']
 
 
+@admin.register(PointBalance)
+class PointBalanceAdmin(admin.ModelAdmin):
+    """Admin for PointBalance model."""
+    list_display = ['user', 'balance', 'total_earned', 'total_spent', 'updated_at']
+    search_fields = ['user__email']
+    readonly_fields = ['balance', 'total_earned', 'total_spent', 'updated_at']
+    raw_id_fields = ['user']
+
+
 @admin.register(Leaderboard)
 class LeaderboardAdmin(admin.ModelAdmin):
     """Admin for Leaderboard model."""
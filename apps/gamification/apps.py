@@ -3,4 +3,7 @@ from django.apps import AppConfig
 
 class GamificationConfig(AppConfig):
     default_auto_field: str = 'django.db.models.BigAutoField'  # type: ignore[assignment]
-    name = 'apps.gamification'
\ No newline at end of file
+    name = 'apps.gamification'
+
+    def ready(self):
+        import apps.gamification.signals
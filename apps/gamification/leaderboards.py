@@ -0,0 +1,327 @@
+"""
+Leaderboard engine backed by Redis sorted sets.
+
+Each ``Leaderboard`` has one sorted set of user ID -> score. Score updates
+are single ``ZADD``/``ZINCRBY`` calls (O(log N)); ranks come from
+``ZREVRANK`` and top-K or around-me windows from ``ZREVRANGE``, so nothing
+ever re-sorts the users or rewrites ranks, however many there are.
+
+Redis is the live copy. ``LeaderboardEngine.snapshot`` periodically copies a
+sorted set into ``LeaderboardEntry`` rows for durability, and a sorted set
+that Redis has lost is rebuilt from the last snapshot before the next one
+is taken. Each restored set carries a sentinel member scored ``-inf``, so
+the set and its "restored" marker can only be lost together; the sentinel
+is never counted or returned.
+
+Only global leaderboards are scored: points, streaks and the other metrics
+are tracked per user, not per course, so course-scoped leaderboards are
+neither scored nor served.
+"""
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+import logging
+import uuid
+
+from apps.analytics.pipeline import get_redis_client
+
+logger = logging.getLogger(__name__)
+User = get_user_model()
+
+ACTIVE_LEADERBOARDS_KEY = 'leaderboards:active'
+ACTIVE_LEADERBOARDS_TIMEOUT = 60 * 5  # 5 minutes
+SNAPSHOT_CHUNK_SIZE = 10000
+
+# Member marking a sorted set that holds (at least) its last snapshot
+RESTORED_MEMBER = '__restored__'
+
+# PointTransaction type -> sign of its effect on a points leaderboard
+POINTS_SIGN = {
+    'earned': 1,
+    'bonus': 1,
+    'penalty': -1,
+}
+
+# Leaderboard metric -> LearningAnalytics field it ranks by
+ANALYTICS_METRICS = {
+    'streak': 'current_streak',
+    'courses_completed': 'courses_completed',
+    'time_spent': 'total_study_time',
+    'quiz_average': 'average_quiz_score',
+}
+
+
+def get_leaderboard_key(leaderboard_id):
+    """Redis key of a leaderboard's sorted set."""
+    return f"leaderboard:{leaderboard_id}"
+
+
+def get_restore_key(leaderboard_id):
+    """New scratch sorted set a snapshot is loaded into before merging."""
+    return f"leaderboard:{leaderboard_id}:restore:{uuid.uuid4()}"
+
+
+def get_active_leaderboards():
+    """
+    IDs of the global leaderboards currently open, grouped by metric.
+
+    The list of open leaderboards is cached and invalidated whenever a
+    leaderboard is saved, so score updates do not query for it.
+
+    Returns:
+        dict: metric -> list of leaderboard IDs
+    """
+    from .models import Leaderboard
+
+    active = cache.get(ACTIVE_LEADERBOARDS_KEY)
+    if active is None:
+        now = timezone.now()
+        active = list(Leaderboard.objects.filter(
+            is_active=True,
+            course__isnull=True,
+            start_date__lte=now,
+            end_date__gt=now
+        ).values_list('id', 'metric', 'end_date'))
+        cache.set(ACTIVE_LEADERBOARDS_KEY, active, ACTIVE_LEADERBOARDS_TIMEOUT)
+
+    now = timezone.now()
+    by_metric = {}
+    for leaderboard_id, metric, end_date in active:
+        if end_date > now:
+            by_metric.setdefault(metric, []).append(leaderboard_id)
+    return by_metric
+
+
+def invalidate_active_leaderboards():
+    """Drop the cached list of open leaderboards."""
+    cache.delete(ACTIVE_LEADERBOARDS_KEY)
+
+
+class LeaderboardEngine:
+    """Score updates and rank queries over per-leaderboard sorted sets."""
+
+    def __init__(self, client=None):
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = get_redis_client()
+        return self._client
+
+    def set_score(self, leaderboard_id, user_id, score):
+        """Set a user's score."""
+        self.client.zadd(get_leaderboard_key(leaderboard_id), {str(user_id): score})
+
+    def increment_score(self, leaderboard_id, user_id, amount):
+        """
+        Add ``amount`` to a user's score.
+
+        Returns:
+            float: The new score
+        """
+        return self.client.zincrby(get_leaderboard_key(leaderboard_id), amount, str(user_id))
+
+    def set_scores(self, leaderboard_ids, user_id, score):
+        """Set a user's score on several leaderboards in one round trip."""
+        pipe = self.client.pipeline(transaction=False)
+        for leaderboard_id in leaderboard_ids:
+            pipe.zadd(get_leaderboard_key(leaderboard_id), {str(user_id): score})
+        pipe.execute()
+
+    def increment_scores(self, leaderboard_ids, user_id, amount):
+        """Add ``amount`` to a user's score on several leaderboards."""
+        pipe = self.client.pipeline(transaction=False)
+        for leaderboard_id in leaderboard_ids:
+            pipe.zincrby(get_leaderboard_key(leaderboard_id), amount, str(user_id))
+        pipe.execute()
+
+    def remove_user(self, leaderboard_id, user_id):
+        """Remove a user from a leaderboard."""
+        self.client.zrem(get_leaderboard_key(leaderboard_id), str(user_id))
+
+    def get_rank(self, leaderboard_id, user_id):
+        """
+        A user's 1-based rank and score.
+
+        Returns:
+            dict with ``user_id``, ``score`` and ``rank``, or None if the
+            user has no score
+        """
+        return self.get_ranks([leaderboard_id], user_id).get(leaderboard_id)
+
+    def get_ranks(self, leaderboard_ids, user_id):
+        """
+        A user's rank and score on several leaderboards in one round trip.
+
+        Returns:
+            dict: leaderboard ID -> entry, for the leaderboards the user is on
+        """
+        pipe = self.client.pipeline(transaction=False)
+        for leaderboard_id in leaderboard_ids:
+            pipe.zrevrank(get_leaderboard_key(leaderboard_id), str(user_id))
+            pipe.zscore(get_leaderboard_key(leaderboard_id), str(user_id))
+        results = pipe.execute()
+
+        ranks = {}
+        for position, leaderboard_id in enumerate(leaderboard_ids):
+            rank, score = results[2 * position], results[2 * position + 1]
+            if rank is not None:
+                ranks[leaderboard_id] = {'user_id': str(user_id), 'score': score, 'rank': rank + 1}
+        return ranks
+
+    def get_size(self, leaderboard_id):
+        """Number of users on a leaderboard."""
+        # Every score is above the sentinel's -inf
+        return self.client.zcount(get_leaderboard_key(leaderboard_id), '(-inf', '+inf')
+
+    def get_range(self, leaderboard_id, start, stop):
+        """Entries ranked ``start + 1`` to ``stop + 1``, best first."""
+        members = self.client.zrevrange(
+            get_leaderboard_key(leaderboard_id), start, stop, withscores=True
+        )
+        # The sentinel ranks last, so skipping it never shifts other ranks
+        return [
+            {'user_id': _decode(member), 'score': score, 'rank': start + position + 1}
+            for position, (member, score) in enumerate(members)
+            if _decode(member) != RESTORED_MEMBER
+        ]
+
+    def get_top(self, leaderboard_id, limit):
+        """The ``limit`` best entries."""
+        if limit <= 0:
+            return []
+        return self.get_range(leaderboard_id, 0, limit - 1)
+
+    def get_around(self, leaderboard_id, user_id, radius):
+        """
+        The entries within ``radius`` ranks of a user, including the user.
+
+        Returns:
+            list: Entries best first; empty if the user has no score
+        """
+        rank = self.client.zrevrank(get_leaderboard_key(leaderboard_id), str(user_id))
+        if rank is None:
+            return []
+        return self.get_range(leaderboard_id, max(0, rank - radius), rank + radius)
+
+    def is_restored(self, leaderboard_id):
+        """Whether a sorted set still holds its last snapshot."""
+        return self.client.zscore(get_leaderboard_key(leaderboard_id), RESTORED_MEMBER) is not None
+
+    def restore(self, leaderboard):
+        """
+        Merge the last snapshot into a sorted set Redis has lost.
+
+        Points accrue by increments, so points recorded since the loss are
+        added to the snapshot scores: the snapshot is loaded into a scratch
+        set, then summed into the live set and marked restored in one
+        transaction, so a restore that dies half-way can be repeated
+        without counting anything twice. Each call uses its own scratch
+        set, so concurrent restores never sum each other's snapshots. For
+        other metrics the scores are absolute, and those already in Redis
+        win (``ZADD NX``, which is safe to repeat).
+
+        Returns:
+            int: Number of snapshot entries merged
+        """
+        from .models import LeaderboardEntry
+
+        key = get_leaderboard_key(leaderboard.id)
+        is_points = leaderboard.metric == 'points'
+        target = get_restore_key(leaderboard.id) if is_points else key
+        rows = LeaderboardEntry.objects.filter(leaderboard=leaderboard).values_list(
+            'user_id', 'score'
+        ).order_by('pk')
+
+        restored = 0
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            for user_id, score in rows.iterator(chunk_size=SNAPSHOT_CHUNK_SIZE):
+                pipe.zadd(target, {str(user_id): score}, nx=not is_points)
+                restored += 1
+                if restored % SNAPSHOT_CHUNK_SIZE == 0:
+                    pipe.execute()
+            pipe.execute()
+
+            pipe = self.client.pipeline(transaction=True)
+            if is_points:
+                pipe.zunionstore(key, [key, target], aggregate='SUM')
+            pipe.zadd(key, {RESTORED_MEMBER: float('-inf')})
+            pipe.execute()
+        finally:
+            if is_points:
+                self.client.delete(target)
+        return restored
+
+    def snapshot(self, leaderboard):
+        """
+        Copy a leaderboard's sorted set into ``LeaderboardEntry`` rows.
+
+        If Redis has lost the set since the last snapshot, it is restored
+        first so the snapshot is never replaced by partial data.
+
+        Returns:
+            int: Number of entries written
+        """
+        from .models import LeaderboardEntry
+
+        if not self.is_restored(leaderboard.id):
+            restored = self.restore(leaderboard)
+            if restored:
+                logger.warning(f"Restored {restored} entries of leaderboard {leaderboard.id}")
+
+        now = timezone.now()
+        size = self.get_size(leaderboard.id)
+        # Scores can move between chunk reads; keep each user's first entry
+        seen = set()
+        written = 0
+        with transaction.atomic():
+            LeaderboardEntry.objects.filter(leaderboard=leaderboard).delete()
+            for start in range(0, size, SNAPSHOT_CHUNK_SIZE):
+                entries = [
+                    entry for entry in self.get_range(
+                        leaderboard.id, start, start + SNAPSHOT_CHUNK_SIZE - 1
+                    )
+                    if entry['user_id'] not in seen
+                ]
+                seen.update(entry['user_id'] for entry in entries)
+                existing = {
+                    str(user_id) for user_id in User.objects.filter(
+                        id__in=[entry['user_id'] for entry in entries]
+                    ).values_list('id', flat=True)
+                }
+                written += len(LeaderboardEntry.objects.bulk_create([
+                    LeaderboardEntry(
+                        leaderboard=leaderboard,
+                        user_id=entry['user_id'],
+                        score=entry['score'],
+                        rank=entry['rank'],
+                        updated_at=now
+                    )
+                    for entry in entries
+                    if entry['user_id'] in existing
+                ]))
+        return written
+
+
+def attach_users(entries):
+    """Add each entry's ``user`` with one query for the whole page."""
+    users = {
+        str(user_id): user
+        for user_id, user in User.objects.in_bulk([entry['user_id'] for entry in entries]).items()
+    }
+    return [
+        {**entry, 'user': users.get(entry['user_id'])}
+        for entry in entries
+        if entry['user_id'] in users
+    ]
+
+
+def _decode(member):
+    return member.decode() if isinstance(member, bytes) else member
+
+
+# Singleton instance
+leaderboard_engine = LeaderboardEngine()
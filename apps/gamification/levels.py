@@ -0,0 +1,151 @@
+"""
+Level progression.
+
+The ``Level`` thresholds are kept as an array sorted by points required and
+cached until a level is saved or deleted, so a user's level is a binary
+search over the array (O(log L)) and serving levels never queries the
+``Level`` table.
+
+``UserLevel`` follows the points a user has earned: the points ledger
+calls ``update_user_level`` in the same database transaction that applies
+each earning to the balance. ``recompute_levels`` re-levels every user
+after the thresholds change.
+"""
+from bisect import bisect_right
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+LEVELS_KEY = 'gamification:levels'
+LEVELS_TIMEOUT = 60 * 60  # 1 hour
+RECOMPUTE_CHUNK_SIZE = 5000
+
+LEVEL_FIELDS = ['id', 'name', 'level_number', 'points_required', 'description', 'badge']
+
+
+def get_level_table():
+    """
+    The cached level thresholds.
+
+    Returns:
+        tuple: (points required per level, ascending; level dicts in the
+        same order)
+    """
+    from .models import Level
+
+    table = cache.get(LEVELS_KEY)
+    if table is None:
+        levels = list(Level.objects.order_by('points_required', 'level_number').values(*LEVEL_FIELDS))
+        table = ([level['points_required'] for level in levels], levels)
+        cache.set(LEVELS_KEY, table, LEVELS_TIMEOUT)
+    return table
+
+
+def invalidate_levels():
+    """Drop the cached level thresholds."""
+    cache.delete(LEVELS_KEY)
+
+
+def get_level(level_id):
+    """A level dict by ID, or None."""
+    for level in get_level_table()[1]:
+        if level['id'] == level_id:
+            return level
+    return None
+
+
+def level_for_points(total_points):
+    """
+    The highest level a point total reaches.
+
+    Returns:
+        tuple: (level dict, or None below the first level; points needed
+        for the next level, 0 at the top level)
+    """
+    thresholds, levels = get_level_table()
+    index = bisect_right(thresholds, total_points) - 1
+    points_to_next = thresholds[index + 1] - total_points if index + 1 < len(thresholds) else 0
+    return (levels[index] if index >= 0 else None), points_to_next
+
+
+def update_user_level(user_id, total_points):
+    """
+    Move a user to the level of their point total.
+
+    Run inside the ledger's transaction, so the level commits with the
+    points.
+
+    Returns:
+        dict: The user's level, or None if they have not reached one
+    """
+    from .models import UserLevel
+
+    level, points_to_next = level_for_points(total_points)
+    if level is None:
+        return None
+
+    UserLevel.objects.update_or_create(
+        user_id=user_id,
+        defaults={
+            'current_level_id': level['id'],
+            'total_points': total_points,
+            'points_to_next': points_to_next,
+        }
+    )
+    return level
+
+
+def recompute_levels(chunk_size=RECOMPUTE_CHUNK_SIZE):
+    """
+    Re-level every user with points from their balance.
+
+    Returns:
+        dict: Numbers of ``checked`` and ``updated`` users
+    """
+    from .models import PointBalance, UserLevel
+
+    invalidate_levels()
+    rows = list(PointBalance.objects.order_by('user_id').values_list('user_id', 'total_earned'))
+    checked = updated = 0
+    now = timezone.now()
+
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        with transaction.atomic():
+            existing = {
+                user_level.user_id: user_level
+                for user_level in UserLevel.objects.select_for_update().filter(
+                    user_id__in=[user_id for user_id, _ in chunk]
+                )
+            }
+            changed, created, cleared = [], [], []
+            for user_id, total_points in chunk:
+                level, points_to_next = level_for_points(total_points)
+                user_level = existing.get(user_id)
+                if level is None:
+                    if user_level is not None:
+                        cleared.append(user_id)
+                    continue
+                values = (level['id'], total_points, points_to_next)
+                if user_level is None:
+                    created.append(UserLevel(
+                        user_id=user_id,
+                        current_level_id=level['id'],
+                        total_points=total_points,
+                        points_to_next=points_to_next
+                    ))
+                elif (user_level.current_level_id, user_level.total_points, user_level.points_to_next) != values:
+                    user_level.current_level_id, user_level.total_points, user_level.points_to_next = values
+                    user_level.updated_at = now
+                    changed.append(user_level)
+
+            UserLevel.objects.bulk_update(
+                changed, ['current_level', 'total_points', 'points_to_next', 'updated_at']
+            )
+            UserLevel.objects.bulk_create(created, ignore_conflicts=True)
+            UserLevel.objects.filter(user_id__in=cleared).delete()
+
+        checked += len(chunk)
+        updated += len(changed) + len(created) + len(cleared)
+
+    return {'checked': checked, 'updated': updated}
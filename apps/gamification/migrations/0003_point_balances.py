@@ -0,0 +1,73 @@
+# Generated by Django 4.2.7 on 2026-10-19 08:59
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_point_balances(apps, schema_editor):
+    """Materialise balances from the existing transactions."""
+    from django.db.models import Q, Sum
+
+    PointTransaction = apps.get_model("gamification", "PointTransaction")
+    PointBalance = apps.get_model("gamification", "PointBalance")
+
+    rows = (
+        PointTransaction.objects.order_by()
+        .values("user_id")
+        .annotate(
+            earned=Sum("points", filter=Q(transaction_type__in=["earned", "bonus"])),
+            spent=Sum("points", filter=Q(transaction_type="spent")),
+            penalties=Sum("points", filter=Q(transaction_type="penalty")),
+        )
+    )
+    PointBalance.objects.bulk_create(
+        [
+            PointBalance(
+                user_id=row["user_id"],
+                balance=(row["earned"] or 0) - (row["spent"] or 0) - (row["penalties"] or 0),
+                total_earned=row["earned"] or 0,
+                total_spent=row["spent"] or 0,
+            )
+            for row in rows.iterator()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("gamification", "0002_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PointBalance",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("balance", models.IntegerField(default=0)),
+                ("total_earned", models.IntegerField(default=0)),
+                ("total_spent", models.IntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="point_balance",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.RunPython(backfill_point_balances, migrations.RunPython.noop),
+    ]
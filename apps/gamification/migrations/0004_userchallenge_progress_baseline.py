@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 09:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("gamification", "0003_point_balances"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="userchallenge",
+            name="progress_baseline",
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -74,6 +74,18 @@ class PointTransaction(models.Model):
         return f"{self.user.username}: {self.points} points ({self.transaction_type})"
 
 
+class PointBalance(models.Model):
+    """Materialised points balance, kept in step with PointTransaction inserts"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='point_balance')
+    balance = models.IntegerField(default=0)
+    total_earned = models.IntegerField(default=0)
+    total_spent = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user.username}: {self.balance} points"
+
+
 class Leaderboard(models.Model):
     """Dynamic leaderboards for competitions"""
     name = models.CharField(max_length=100)
@@ -160,6 +172,8 @@ class UserChallenge(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='challenges')
     challenge = models.ForeignKey(Challenge, on_delete=models.CASCADE)
     progress = models.IntegerField(default=0)
+    # Metric value at the last completion; repeat completions count growth past it
+    progress_baseline = models.IntegerField(default=0)
     completed_at = models.DateTimeField(null=True, blank=True)
     is_completed = models.BooleanField(default=False)
     times_completed = models.IntegerField(default=0)
@@ -0,0 +1,205 @@
+"""
+Points ledger.
+
+Every ``PointTransaction`` is inserted together with an atomic update of the
+user's ``PointBalance`` row in one database transaction, so the balance is a
+single-row read instead of an aggregate over the user's whole history.
+
+Spending uses a conditional update (``balance >= cost``), so concurrent
+redemptions cannot overspend: at most one of them finds enough points.
+Earnings also move the user's ``UserLevel`` in the same transaction.
+``reconcile_balances`` recomputes balances from the transactions and
+repairs any rows that have drifted.
+"""
+from django.db import transaction
+from django.db.models import F, Q, Sum
+
+from .levels import update_user_level
+from .models import PointBalance, PointTransaction
+
+# Transaction type -> sign of its effect on the balance
+BALANCE_EFFECT = {
+    'earned': 1,
+    'bonus': 1,
+    'spent': -1,
+    'penalty': -1,
+}
+EARNED_TYPES = ['earned', 'bonus']
+SPENT_TYPES = ['spent']
+RECONCILE_CHUNK_SIZE = 5000
+
+
+class InsufficientPointsError(Exception):
+    """Raised when a user does not have enough points to spend."""
+
+
+def _balance_changes(points, transaction_type):
+    """Field updates applying a transaction to a balance row."""
+    changes = {'balance': F('balance') + BALANCE_EFFECT[transaction_type] * points}
+    if transaction_type in EARNED_TYPES:
+        changes['total_earned'] = F('total_earned') + points
+    if transaction_type in SPENT_TYPES:
+        changes['total_spent'] = F('total_spent') + points
+    return changes
+
+
+def get_balance(user):
+    """
+    The user's balance row; created empty for users with no points yet.
+    """
+    balance, _ = PointBalance.objects.get_or_create(user=user)
+    return balance
+
+
+def lock_balance(user):
+    """
+    Lock the user's balance row until the end of the current transaction.
+
+    Serialises a user's spending decisions, e.g. so that "already
+    redeemed" checks cannot pass twice concurrently.
+    """
+    PointBalance.objects.get_or_create(user=user)
+    return PointBalance.objects.select_for_update().get(user=user)
+
+
+def record_transaction(user, points, transaction_type, reason, **fields):
+    """
+    Insert a point transaction and apply it to the user's balance and,
+    for earnings, level.
+
+    Args:
+        user: User (or user ID) the points belong to
+        points: Positive number of points
+        transaction_type: One of ``BALANCE_EFFECT``
+        reason: Description shown to the user
+        **fields: Extra PointTransaction fields, e.g. ``related_object_type``
+
+    Returns:
+        PointTransaction: The inserted transaction
+    """
+    user_id = getattr(user, 'pk', user)
+    with transaction.atomic():
+        PointBalance.objects.get_or_create(user_id=user_id)
+        PointBalance.objects.filter(user_id=user_id).update(
+            **_balance_changes(points, transaction_type)
+        )
+        if transaction_type in EARNED_TYPES:
+            total_earned = PointBalance.objects.values_list('total_earned', flat=True).get(
+                user_id=user_id
+            )
+            update_user_level(user_id, total_earned)
+        return PointTransaction.objects.create(
+            user_id=user_id,
+            points=points,
+            transaction_type=transaction_type,
+            reason=reason,
+            **fields
+        )
+
+
+def spend_points(user, points, reason, **fields):
+    """
+    Spend points if, and only if, the user has enough.
+
+    Must run inside the caller's transaction when the spend pays for other
+    writes, so they roll back together.
+
+    Raises:
+        InsufficientPointsError: If the balance is below ``points``
+
+    Returns:
+        PointTransaction: The inserted ``spent`` transaction
+    """
+    with transaction.atomic():
+        updated = PointBalance.objects.filter(user=user, balance__gte=points).update(
+            **_balance_changes(points, 'spent')
+        )
+        if not updated:
+            raise InsufficientPointsError(f"Balance is below {points} points")
+        return PointTransaction.objects.create(
+            user=user,
+            points=points,
+            transaction_type='spent',
+            reason=reason,
+            **fields
+        )
+
+
+def compute_balances(user_ids=None):
+    """
+    Balances recomputed from PointTransaction with one grouped query.
+
+    Returns:
+        dict: user ID -> (balance, total_earned, total_spent)
+    """
+    transactions = PointTransaction.objects.all()
+    if user_ids is not None:
+        transactions = transactions.filter(user_id__in=user_ids)
+
+    rows = transactions.order_by().values('user_id').annotate(
+        earned=Sum('points', filter=Q(transaction_type__in=EARNED_TYPES)),
+        spent=Sum('points', filter=Q(transaction_type__in=SPENT_TYPES)),
+        penalties=Sum('points', filter=Q(transaction_type='penalty')),
+    )
+    return {
+        row['user_id']: (
+            (row['earned'] or 0) - (row['spent'] or 0) - (row['penalties'] or 0),
+            row['earned'] or 0,
+            row['spent'] or 0,
+        )
+        for row in rows
+    }
+
+
+def reconcile_balances(chunk_size=RECONCILE_CHUNK_SIZE):
+    """
+    Repair balance rows that disagree with the transaction history.
+
+    Users are processed in chunks; each chunk is one grouped aggregate, one
+    balance read and at most one bulk update and one bulk insert.
+
+    Returns:
+        dict: Numbers of ``checked``, ``corrected`` and ``created`` rows
+    """
+    user_ids = list(
+        PointTransaction.objects.order_by('user_id').values_list('user_id', flat=True).distinct()
+    )
+    checked = corrected = created = 0
+
+    for start in range(0, len(user_ids), chunk_size):
+        chunk = user_ids[start:start + chunk_size]
+        with transaction.atomic():
+            existing = {
+                balance.user_id: balance
+                for balance in PointBalance.objects.select_for_update().filter(user_id__in=chunk)
+            }
+            # Computed under the row locks so concurrent writes are included
+            expected = compute_balances(chunk)
+
+            drifted = []
+            for user_id, (balance, total_earned, total_spent) in expected.items():
+                row = existing.get(user_id)
+                if row is None:
+                    continue
+                if (row.balance, row.total_earned, row.total_spent) != (balance, total_earned, total_spent):
+                    row.balance, row.total_earned, row.total_spent = balance, total_earned, total_spent
+                    drifted.append(row)
+            PointBalance.objects.bulk_update(drifted, ['balance', 'total_earned', 'total_spent'])
+
+            missing = [
+                PointBalance(
+                    user_id=user_id,
+                    balance=balance,
+                    total_earned=total_earned,
+                    total_spent=total_spent
+                )
+                for user_id, (balance, total_earned, total_spent) in expected.items()
+                if user_id not in existing
+            ]
+            PointBalance.objects.bulk_create(missing, ignore_conflicts=True)
+
+        checked += len(expected)
+        corrected += len(drifted)
+        created += len(missing)
+
+    return {'checked': checked, 'corrected': corrected, 'created': created}
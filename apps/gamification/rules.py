@@ -0,0 +1,322 @@
+"""
+Event-driven badge and challenge rules.
+
+Active badges and challenges are compiled into a rule index keyed by the
+event types that can change their criteria, and the index is cached until
+a badge or challenge is saved. Each batch of a user's events (analytics
+events folded by the pipeline, and points earned) only looks up the rules
+for those event types, so a quiz completion only evaluates quiz and streak
+rules, and nothing ever scans every user.
+
+Badges are thresholds on a metric (e.g. ``streak_days >= 7``). Challenges
+either track the same metrics or count events inside their window (e.g.
+three ``quizzes_completed`` this week); their progress is updated
+incrementally from the events themselves, with the user's challenge rows
+locked, and repeat completions of a metric challenge only count growth
+since the previous completion. Badge rewards are paid only for badges
+actually inserted, so concurrent evaluations never pay twice.
+"""
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+import logging
+
+logger = logging.getLogger(__name__)
+
+RULE_INDEX_KEY = 'gamification:rules'
+RULE_INDEX_TIMEOUT = 60 * 5  # 5 minutes
+
+ANALYTICS_EVENT_TYPES = [
+    'lesson_progress', 'quiz_completed', 'chat_message', 'activity', 'enrollment',
+    'course_completed',
+]
+POINTS_EVENT = 'points'
+
+# Metric criteria -> event types that can change the metric
+METRIC_TRIGGERS = {
+    'quiz_score': ['quiz_completed'],
+    'streak_days': ANALYTICS_EVENT_TYPES,
+    'courses_completed': ['course_completed'],
+    'time_spent': ['lesson_progress'],
+    'total_points': [POINTS_EVENT],
+    'social_interactions': ['chat_message'],
+}
+
+# Metrics that only grow over time; a repeatable challenge on one counts
+# growth since its last completion. ``quiz_score`` is judged per quiz instead.
+CUMULATIVE_METRICS = {
+    'streak_days', 'courses_completed', 'time_spent', 'total_points', 'social_interactions',
+}
+
+# Counter criteria (challenges only) -> (event type, increment per event)
+CHALLENGE_COUNTERS = {
+    'quizzes_completed': ('quiz_completed', lambda event: 1),
+    'quizzes_passed': ('quiz_completed', lambda event: int(bool(event.get('passed')))),
+    'lessons_completed': ('lesson_progress', lambda event: event.get('lessons_completed', 0)),
+    'chat_messages': ('chat_message', lambda event: 1),
+    'points_earned': (POINTS_EVENT, lambda event: event.get('points', 0)),
+}
+
+
+class RuleContext:
+    """Lazily computed metric values for one user's batch of events."""
+
+    def __init__(self, user_id, events, analytics=None):
+        self.user_id = user_id
+        self.events = events
+        self._analytics = analytics
+        self._values = {}
+
+    @property
+    def analytics(self):
+        from apps.analytics.models import LearningAnalytics
+
+        if self._analytics is None:
+            self._analytics, _ = LearningAnalytics.objects.get_or_create(user_id=self.user_id)
+        return self._analytics
+
+    def metric(self, criteria_type):
+        """Current value of a metric criteria for the user."""
+        if criteria_type not in self._values:
+            self._values[criteria_type] = self._compute(criteria_type)
+        return self._values[criteria_type]
+
+    def _compute(self, criteria_type):
+        from .models import PointBalance
+
+        if criteria_type == 'quiz_score':
+            scores = [
+                event.get('score') or 0
+                for event in self.events
+                if event['type'] == 'quiz_completed'
+            ]
+            return max(scores, default=0)
+        if criteria_type == 'streak_days':
+            return self.analytics.current_streak
+        if criteria_type == 'courses_completed':
+            return self.analytics.courses_completed
+        if criteria_type == 'time_spent':
+            return self.analytics.total_study_time
+        if criteria_type == 'social_interactions':
+            return self.analytics.chat_messages_sent
+        if criteria_type == 'total_points':
+            balance = PointBalance.objects.filter(user_id=self.user_id).first()
+            return balance.total_earned if balance else 0
+        return 0
+
+    def count(self, criteria_type):
+        """Progress a counter criteria gains from this batch of events."""
+        event_type, increment = CHALLENGE_COUNTERS[criteria_type]
+        return sum(increment(event) for event in self.events if event['type'] == event_type)
+
+
+def build_rule_index():
+    """
+    Index active badges and challenges by the event types they depend on.
+
+    Returns:
+        dict with ``badges`` and ``challenges``, each mapping an event type
+        to a list of rule dicts
+    """
+    from .models import Badge, Challenge
+
+    index = {'badges': {}, 'challenges': {}}
+
+    for badge in Badge.objects.filter(is_active=True).values(
+        'id', 'criteria_type', 'criteria_value', 'points_reward', 'name'
+    ):
+        if badge['criteria_type'] not in METRIC_TRIGGERS:
+            logger.warning(f"Badge {badge['name']} has unsupported criteria {badge['criteria_type']}")
+        for event_type in METRIC_TRIGGERS.get(badge['criteria_type'], []):
+            index['badges'].setdefault(event_type, []).append(badge)
+
+    for challenge in Challenge.objects.filter(
+        is_active=True,
+        end_date__gt=timezone.now()
+    ).values(
+        'id', 'title', 'criteria_type', 'criteria_value', 'points_reward',
+        'badge_reward_id', 'max_completions', 'start_date', 'end_date'
+    ):
+        criteria_type = challenge['criteria_type']
+        if criteria_type in CHALLENGE_COUNTERS:
+            event_types = [CHALLENGE_COUNTERS[criteria_type][0]]
+        else:
+            event_types = METRIC_TRIGGERS.get(criteria_type, [])
+        if not event_types:
+            logger.warning(f"Challenge {challenge['title']} has unsupported criteria {criteria_type}")
+        for event_type in event_types:
+            index['challenges'].setdefault(event_type, []).append(challenge)
+
+    return index
+
+
+def get_rule_index():
+    """The cached rule index."""
+    index = cache.get(RULE_INDEX_KEY)
+    if index is None:
+        index = build_rule_index()
+        cache.set(RULE_INDEX_KEY, index, RULE_INDEX_TIMEOUT)
+    return index
+
+
+def invalidate_rule_index():
+    """Drop the cached rule index."""
+    cache.delete(RULE_INDEX_KEY)
+
+
+def _rules_for(rules_by_event, event_types):
+    """Rules triggered by any of ``event_types``, each once."""
+    rules = {}
+    for event_type in event_types:
+        for rule in rules_by_event.get(event_type, []):
+            rules[rule['id']] = rule
+    return list(rules.values())
+
+
+def evaluate_events(user_id, events, analytics=None):
+    """
+    Evaluate the badge and challenge rules triggered by a user's events.
+
+    Runs in its own transaction (a savepoint when called inside another
+    one), so a failure rolls back only the evaluation. The user's
+    challenge rows are locked while their progress is updated, and badge
+    rewards are only paid for badges this call actually inserted, so
+    concurrent evaluations for the same user neither lose progress nor
+    pay twice.
+
+    Args:
+        user_id: ID of the user the events belong to
+        events: Event dicts with a ``type``, oldest first
+        analytics: The user's LearningAnalytics row, if already loaded
+
+    Returns:
+        dict: ``badges`` and ``challenges`` awarded
+    """
+    from .points import record_transaction
+
+    index = get_rule_index()
+    event_types = {event['type'] for event in events}
+    now = timezone.now()
+    badge_rules = _rules_for(index['badges'], event_types)
+    challenge_rules = [
+        rule for rule in _rules_for(index['challenges'], event_types)
+        if rule['start_date'] <= now < rule['end_date']
+    ]
+    if not badge_rules and not challenge_rules:
+        return {'badges': [], 'challenges': []}
+
+    context = RuleContext(user_id, events, analytics)
+    with transaction.atomic():
+        completed, badge_ids, awards = _evaluate_challenges(user_id, challenge_rules, context, now)
+        for rule in badge_rules:
+            if context.metric(rule['criteria_type']) >= rule['criteria_value']:
+                badge_ids.add(rule['id'])
+        earned = _insert_badges(user_id, badge_ids)
+        awards.extend(
+            (rule['points_reward'], f"Earned badge: {rule['name']}", 'badge', rule['id'])
+            for rule in badge_rules
+            if rule['id'] in earned and rule['points_reward']
+        )
+
+        for points, reason, related_type, related_id in awards:
+            if points:
+                record_transaction(
+                    user_id,
+                    points,
+                    'earned',
+                    reason,
+                    related_object_type=related_type,
+                    related_object_id=str(related_id)
+                )
+
+    return {'badges': sorted(earned), 'challenges': completed}
+
+
+def _evaluate_challenges(user_id, challenge_rules, context, now):
+    """
+    Advance the user's progress on triggered challenges under row locks.
+
+    Returns:
+        tuple: (completed challenge IDs, badge IDs they reward, point awards)
+    """
+    from .models import UserChallenge
+    from .user_state import CHALLENGE_PROGRESS, invalidate_user_state
+
+    if not challenge_rules:
+        return [], set(), []
+
+    challenge_ids = [rule['id'] for rule in challenge_rules]
+    # Make sure every row exists, then lock them all before reading progress
+    UserChallenge.objects.bulk_create(
+        [UserChallenge(user_id=user_id, challenge_id=challenge_id) for challenge_id in challenge_ids],
+        ignore_conflicts=True
+    )
+    user_challenges = {
+        user_challenge.challenge_id: user_challenge
+        for user_challenge in UserChallenge.objects.select_for_update().filter(
+            user_id=user_id,
+            challenge_id__in=challenge_ids
+        )
+    }
+
+    completed, badge_ids, awards, changed = [], set(), [], []
+    for rule in challenge_rules:
+        user_challenge = user_challenges[rule['id']]
+        if user_challenge.times_completed >= rule['max_completions']:
+            continue
+
+        criteria_type = rule['criteria_type']
+        if criteria_type in CHALLENGE_COUNTERS:
+            user_challenge.progress += context.count(criteria_type)
+        else:
+            value = context.metric(criteria_type)
+            if value < user_challenge.progress_baseline:
+                # The metric restarted (e.g. a broken streak); count from there
+                user_challenge.progress_baseline = value
+            user_challenge.progress = max(user_challenge.progress, value - user_challenge.progress_baseline)
+        changed.append(user_challenge)
+
+        if user_challenge.progress >= rule['criteria_value']:
+            user_challenge.is_completed = True
+            user_challenge.completed_at = now
+            user_challenge.times_completed += 1
+            if user_challenge.times_completed < rule['max_completions']:
+                # The next completion has to be earned from here on
+                user_challenge.progress = 0
+                if criteria_type in CUMULATIVE_METRICS:
+                    user_challenge.progress_baseline = context.metric(criteria_type)
+            completed.append(rule['id'])
+            awards.append((
+                rule['points_reward'], f"Completed challenge: {rule['title']}",
+                'challenge', rule['id']
+            ))
+            if rule['badge_reward_id']:
+                badge_ids.add(rule['badge_reward_id'])
+
+    UserChallenge.objects.bulk_update(changed, [
+        'progress', 'progress_baseline', 'is_completed', 'completed_at', 'times_completed'
+    ])
+    # Bulk writes send no signals
+    invalidate_user_state(CHALLENGE_PROGRESS, user_id)
+    return completed, badge_ids, awards
+
+
+def _insert_badges(user_id, badge_ids):
+    """
+    Award badges the user does not have yet.
+
+    Returns:
+        set: IDs of the badges inserted by this call
+    """
+    from .models import UserBadge
+
+    if not badge_ids:
+        return set()
+
+    earned = set()
+    for badge_id in sorted(badge_ids):
+        # get_or_create tolerates a concurrent insert and reports who won
+        _, created = UserBadge.objects.get_or_create(user_id=user_id, badge_id=badge_id)
+        if created:
+            earned.add(badge_id)
+    return earned
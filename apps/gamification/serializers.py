@@ -1,11 +1,32 @@
 from rest_framework import serializers
+from .leaderboards import leaderboard_engine, attach_users
 from .models import (
     Badge, UserBadge, PointTransaction, Leaderboard, LeaderboardEntry,
     Challenge, UserChallenge, Reward, UserReward, Level, UserLevel
 )
+from .levels import get_level
+from .user_state import get_challenge_progress, get_earned_badge_ids, get_redeemed_reward_ids
 
 
-class BadgeSerializer(serializers.ModelSerializer):
+class UserStateMixin:
+    """
+    Reads the request user's state from the serializer context.
+
+    Views preload it into the context; otherwise it is loaded (from the
+    per-user cache) on first use and kept in the context, so a list never
+    queries per item.
+    """
+
+    def get_user_state(self, name, load):
+        if name not in self.context:
+            request = self.context.get('request')
+            if not (request and request.user.is_authenticated):
+                return None
+            self.context[name] = load(request.user.id)
+        return self.context[name]
+
+
+class BadgeSerializer(UserStateMixin, serializers.ModelSerializer):
     earned_by_user = serializers.SerializerMethodField()
 
     class Meta:
@@ -14,10 +35,8 @@ class BadgeSerializer(serializers.ModelSerializer):
                  'criteria_value', 'points_reward', 'is_active', 'created_at', 'earned_by_user']
 
     def get_earned_by_user(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return UserBadge.objects.filter(user=request.user, badge=obj).exists()
-        return False
+        earned = self.get_user_state('earned_badge_ids', get_earned_badge_ids)
+        return earned is not None and obj.id in earned
 
 
 class UserBadgeSerializer(serializers.ModelSerializer):
@@ -43,17 +62,35 @@ class LeaderboardEntrySerializer(serializers.ModelSerializer):
         fields = ['user', 'score', 'rank', 'updated_at']
 
 
+class LeaderboardRankSerializer(serializers.Serializer):
+    """A live entry read from the leaderboard engine."""
+    user = serializers.StringRelatedField()
+    user_id = serializers.CharField()
+    score = serializers.FloatField()
+    rank = serializers.IntegerField()
+
+
 class LeaderboardSerializer(serializers.ModelSerializer):
-    entries = LeaderboardEntrySerializer(many=True, read_only=True)
-    course_name = serializers.CharField(source='course.name', read_only=True)
+    course_name = serializers.CharField(source='course.title', read_only=True)
 
     class Meta:
         model = Leaderboard
         fields = ['id', 'name', 'description', 'category', 'metric', 'course',
-                 'course_name', 'start_date', 'end_date', 'is_active', 'entries']
+                 'course_name', 'start_date', 'end_date', 'is_active', 'max_entries']
+
+
+class LeaderboardDetailSerializer(LeaderboardSerializer):
+    entries = serializers.SerializerMethodField()
+
+    class Meta(LeaderboardSerializer.Meta):
+        fields = LeaderboardSerializer.Meta.fields + ['entries']
 
+    def get_entries(self, obj):
+        entries = leaderboard_engine.get_top(obj.id, obj.max_entries)
+        return LeaderboardRankSerializer(attach_users(entries), many=True).data
 
-class ChallengeSerializer(serializers.ModelSerializer):
+
+class ChallengeSerializer(UserStateMixin, serializers.ModelSerializer):
     user_progress = serializers.SerializerMethodField()
     badge_reward_name = serializers.CharField(source='badge_reward.name', read_only=True)
 
@@ -65,19 +102,10 @@ class ChallengeSerializer(serializers.ModelSerializer):
                  'max_completions', 'user_progress']
 
     def get_user_progress(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            try:
-                user_challenge = UserChallenge.objects.get(user=request.user, challenge=obj)
-                return {
-                    'progress': user_challenge.progress,
-                    'is_completed': user_challenge.is_completed,
-                    'times_completed': user_challenge.times_completed,
-                    'completed_at': user_challenge.completed_at
-                }
-            except UserChallenge.DoesNotExist:
-                return None
-        return None
+        progress = self.get_user_state('challenge_progress', get_challenge_progress)
+        if progress is None:
+            return None
+        return progress.get(obj.id)
 
 
 class UserChallengeSerializer(serializers.ModelSerializer):
@@ -88,7 +116,7 @@ class UserChallengeSerializer(serializers.ModelSerializer):
         fields = ['id', 'challenge', 'progress', 'completed_at', 'is_completed', 'times_completed']
 
 
-class RewardSerializer(serializers.ModelSerializer):
+class RewardSerializer(UserStateMixin, serializers.ModelSerializer):
     redeemed_by_user = serializers.SerializerMethodField()
 
     class Meta:
@@ -97,10 +125,8 @@ class RewardSerializer(serializers.ModelSerializer):
                  'image', 'is_active', 'stock', 'created_at', 'redeemed_by_user']
 
     def get_redeemed_by_user(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return UserReward.objects.filter(user=request.user, reward=obj).exists()
-        return False
+        redeemed = self.get_user_state('redeemed_reward_ids', get_redeemed_reward_ids)
+        return redeemed is not None and obj.id in redeemed
 
 
 class UserRewardSerializer(serializers.ModelSerializer):
@@ -118,7 +144,7 @@ class LevelSerializer(serializers.ModelSerializer):
 
 
 class UserLevelSerializer(serializers.ModelSerializer):
-    level = LevelSerializer()
+    level = serializers.SerializerMethodField()
     progress_percentage = serializers.SerializerMethodField()
 
     class Meta:
@@ -126,6 +152,10 @@ class UserLevelSerializer(serializers.ModelSerializer):
         fields = ['current_level', 'total_points', 'points_to_next', 'updated_at',
                  'level', 'progress_percentage']
 
+    def get_level(self, obj):
+        # Served from the cached level table, not the Level table
+        return get_level(obj.current_level_id)
+
     def get_progress_percentage(self, obj):
         if obj.points_to_next > 0:
             return min(100, int((obj.total_points / (obj.total_points + obj.points_to_next)) * 100))
@@ -0,0 +1,129 @@
+"""
+Signal handlers that keep leaderboards and badge/challenge progress in step
+with scores and learning events.
+"""
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+import logging
+import redis
+
+from apps.analytics.models import LearningAnalytics
+from apps.analytics.pipeline import events_folded
+from .models import (
+    Badge, Challenge, Leaderboard, Level, PointTransaction, UserBadge, UserChallenge, UserReward
+)
+from .leaderboards import (
+    ANALYTICS_METRICS, POINTS_SIGN, get_active_leaderboards,
+    invalidate_active_leaderboards, leaderboard_engine
+)
+from .levels import invalidate_levels
+from .points import EARNED_TYPES
+from .rules import POINTS_EVENT, evaluate_events, invalidate_rule_index
+from .user_state import (
+    CHALLENGE_PROGRESS, EARNED_BADGES, REDEEMED_REWARDS, invalidate_user_state
+)
+
+logger = logging.getLogger(__name__)
+
+
+@receiver([post_save, post_delete], sender=Leaderboard)
+def invalidate_leaderboards(sender, instance, **kwargs):
+    invalidate_active_leaderboards()
+
+
+# Redis is not transactional with the database: scores are only written
+# once the change is committed, so a rollback never leaves them behind.
+
+@receiver(post_save, sender=PointTransaction)
+def update_points_leaderboards(sender, instance, created, **kwargs):
+    sign = POINTS_SIGN.get(instance.transaction_type)
+    if not created or sign is None:
+        return
+
+    leaderboard_ids = get_active_leaderboards().get('points')
+    if not leaderboard_ids:
+        return
+    user_id, amount = instance.user_id, sign * instance.points
+
+    def increment():
+        try:
+            leaderboard_engine.increment_scores(leaderboard_ids, user_id, amount)
+        except redis.RedisError as e:
+            logger.warning(f"Could not update points leaderboards: {str(e)}")
+
+    transaction.on_commit(increment)
+
+
+@receiver(post_save, sender=LearningAnalytics)
+def update_analytics_leaderboards(sender, instance, **kwargs):
+    active = get_active_leaderboards()
+    scores = [
+        (active[metric], getattr(instance, field))
+        for metric, field in ANALYTICS_METRICS.items()
+        if active.get(metric)
+    ]
+    if not scores:
+        return
+    user_id = instance.user_id
+
+    def set_scores():
+        try:
+            for leaderboard_ids, score in scores:
+                leaderboard_engine.set_scores(leaderboard_ids, user_id, score)
+        except redis.RedisError as e:
+            logger.warning(f"Could not update analytics leaderboards: {str(e)}")
+
+    transaction.on_commit(set_scores)
+
+
+@receiver([post_save, post_delete], sender=Level)
+def invalidate_level_table(sender, instance, **kwargs):
+    invalidate_levels()
+
+
+@receiver([post_save, post_delete], sender=Badge)
+@receiver([post_save, post_delete], sender=Challenge)
+def invalidate_rules(sender, instance, **kwargs):
+    invalidate_rule_index()
+
+
+@receiver(events_folded)
+def evaluate_learning_rules(sender, analytics, events, **kwargs):
+    try:
+        evaluate_events(analytics.user_id, events, analytics=analytics)
+    except Exception as e:
+        logger.error(f"Rule evaluation failed for user {analytics.user_id}: {str(e)}")
+
+
+@receiver(post_save, sender=PointTransaction)
+def evaluate_points_rules(sender, instance, created, **kwargs):
+    if not created or instance.transaction_type not in EARNED_TYPES:
+        return
+    user_id, points = instance.user_id, instance.points
+
+    # Evaluate once the points are committed, outside the ledger's
+    # transaction, so rewards recorded by the rules start a new evaluation
+    # instead of re-entering this one
+    def evaluate():
+        try:
+            evaluate_events(user_id, [{'type': POINTS_EVENT, 'points': points}])
+        except Exception as e:
+            logger.error(f"Rule evaluation failed for user {user_id}: {str(e)}")
+
+    transaction.on_commit(evaluate)
+
+
+@receiver([post_save, post_delete], sender=UserBadge)
+def invalidate_earned_badges(sender, instance, **kwargs):
+    invalidate_user_state(EARNED_BADGES, instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=UserChallenge)
+def invalidate_challenge_progress(sender, instance, **kwargs):
+    invalidate_user_state(CHALLENGE_PROGRESS, instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=UserReward)
+def invalidate_redeemed_rewards(sender, instance, **kwargs):
+    invalidate_user_state(REDEEMED_REWARDS, instance.user_id)
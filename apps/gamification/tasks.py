@@ -0,0 +1,61 @@
+"""
+Celery tasks for gamification.
+"""
+try:
+    from celery import shared_task
+except ImportError:
+    # Celery not installed, create dummy decorator
+    def shared_task(func):
+        return func
+
+from .leaderboards import leaderboard_engine
+from .levels import recompute_levels
+from .points import reconcile_balances
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def snapshot_leaderboards():
+    """Copy every active global leaderboard from Redis into LeaderboardEntry rows."""
+    from .models import Leaderboard
+    
+    try:
+        snapshotted = {}
+        for leaderboard in Leaderboard.objects.filter(is_active=True, course__isnull=True):
+            snapshotted[leaderboard.id] = leaderboard_engine.snapshot(leaderboard)
+        
+        logger.info(f"Snapshotted {len(snapshotted)} leaderboards")
+        return {'success': True, 'entries': sum(snapshotted.values())}
+    except Exception as e:
+        logger.error(f"Leaderboard snapshot failed: {str(e)}")
+        return {'success': False, 'error': str(e)}
+
+
+@shared_task
+def reconcile_point_balances():
+    """Repair points balances that have drifted from the transaction history."""
+    try:
+        result = reconcile_balances()
+        if result['corrected'] or result['created']:
+            logger.warning(
+                f"Reconciled points balances: {result['corrected']} corrected, "
+                f"{result['created']} created"
+            )
+        return {'success': True, **result}
+    except Exception as e:
+        logger.error(f"Points reconciliation failed: {str(e)}")
+        return {'success': False, 'error': str(e)}
+
+
+@shared_task
+def recompute_user_levels():
+    """Re-level every user against the current level thresholds."""
+    try:
+        result = recompute_levels()
+        logger.info(f"Recomputed levels: {result['updated']} of {result['checked']} users updated")
+        return {'success': True, **result}
+    except Exception as e:
+        logger.error(f"Level recomputation failed: {str(e)}")
+        return {'success': False, 'error': str(e)}
@@ -0,0 +1,84 @@
+"""
+Per-user gamification state for serializers.
+
+Badge, challenge and reward list responses mark each item with the current
+user's state (earned, progress, redeemed). Instead of one query per item,
+each kind of state is loaded for the user in one query and cached per
+user. The caches are invalidated whenever the user earns a badge, makes
+challenge progress or redeems a reward.
+"""
+from django.core.cache import cache
+from django.db import transaction
+
+USER_STATE_TIMEOUT = 60 * 15  # 15 minutes
+
+EARNED_BADGES = 'earned_badges'
+CHALLENGE_PROGRESS = 'challenge_progress'
+REDEEMED_REWARDS = 'redeemed_rewards'
+
+
+def get_user_state_key(kind, user_id):
+    """Cache key of one kind of state for a user."""
+    return f"gamification:{kind}:{user_id}"
+
+
+def _cached(kind, user_id, load):
+    key = get_user_state_key(kind, user_id)
+    value = cache.get(key)
+    if value is None:
+        value = load()
+        cache.set(key, value, USER_STATE_TIMEOUT)
+    return value
+
+
+def get_earned_badge_ids(user_id):
+    """IDs of the badges a user has earned."""
+    from .models import UserBadge
+
+    return _cached(EARNED_BADGES, user_id, lambda: set(
+        UserBadge.objects.filter(user_id=user_id).values_list('badge_id', flat=True)
+    ))
+
+
+def get_challenge_progress(user_id):
+    """
+    A user's progress on the challenges they have started.
+
+    Returns:
+        dict: challenge ID -> progress dict
+    """
+    from .models import UserChallenge
+
+    return _cached(CHALLENGE_PROGRESS, user_id, lambda: {
+        row['challenge_id']: {
+            'progress': row['progress'],
+            'is_completed': row['is_completed'],
+            'times_completed': row['times_completed'],
+            'completed_at': row['completed_at'],
+        }
+        for row in UserChallenge.objects.filter(user_id=user_id).values(
+            'challenge_id', 'progress', 'is_completed', 'times_completed', 'completed_at'
+        )
+    })
+
+
+def get_redeemed_reward_ids(user_id):
+    """IDs of the rewards a user has redeemed."""
+    from .models import UserReward
+
+    return _cached(REDEEMED_REWARDS, user_id, lambda: set(
+        UserReward.objects.filter(user_id=user_id).values_list('reward_id', flat=True)
+    ))
+
+
+def invalidate_user_state(kind, user_id):
+    """
+    Drop one kind of cached state for a user.
+
+    The state is dropped again when the current transaction commits, so a
+    copy re-cached by a concurrent read before the commit is not served.
+    """
+    key = get_user_state_key(kind, user_id)
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
+
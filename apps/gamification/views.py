@@ -2,17 +2,26 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.db.models import Sum, Count, Q
+from django.db import transaction
+from django.db.models import F
 from django.utils import timezone
 from .models import (
-    Badge, UserBadge, PointTransaction, Leaderboard, LeaderboardEntry,
+    Badge, UserBadge, PointTransaction, Leaderboard,
     Challenge, UserChallenge, Reward, UserReward, Level, UserLevel
 )
 from .serializers import (
     BadgeSerializer, UserBadgeSerializer, PointTransactionSerializer,
-    LeaderboardSerializer, LeaderboardEntrySerializer, ChallengeSerializer, UserChallengeSerializer,
+    LeaderboardSerializer, LeaderboardDetailSerializer, LeaderboardRankSerializer,
+    ChallengeSerializer, UserChallengeSerializer,
     RewardSerializer, UserRewardSerializer, LevelSerializer, UserLevelSerializer
 )
+from .leaderboards import leaderboard_engine, attach_users
+from .levels import get_level_table
+from .points import InsufficientPointsError, get_balance, lock_balance, spend_points
+from .user_state import get_challenge_progress, get_earned_badge_ids, get_redeemed_reward_ids
+
+AROUND_ME_DEFAULT_RADIUS = 5
+AROUND_ME_MAX_RADIUS = 50
 
 
 class BadgeViewSet(viewsets.ReadOnlyModelViewSet):
@@ -20,11 +29,18 @@ class BadgeViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = BadgeSerializer
     permission_classes = [IsAuthenticated]
 
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['earned_badge_ids'] = get_earned_badge_ids(self.request.user.id)
+        return context
+
     @action(detail=False, methods=['get'])
     def earned(self, request):
         """Get badges earned by the current user"""
-        user_badges = UserBadge.objects.filter(user=request.user)
-        serializer = UserBadgeSerializer(user_badges, many=True)
+        user_badges = UserBadge.objects.filter(user=request.user).select_related('badge')
+        serializer = UserBadgeSerializer(
+            user_badges, many=True, context=self.get_serializer_context()
+        )
         return Response(serializer.data)
 
 
@@ -38,34 +54,77 @@ class PointTransactionViewSet(viewsets.ReadOnlyModelViewSet):
     @action(detail=False, methods=['get'])
     def summary(self, request):
         """Get points summary for the user"""
-        transactions = self.get_queryset()
-        total_earned = transactions.filter(transaction_type='earned').aggregate(
-            total=Sum('points'))['total'] or 0
-        total_spent = transactions.filter(transaction_type='spent').aggregate(
-            total=Sum('points'))['total'] or 0
-        current_balance = total_earned - total_spent
+        balance = get_balance(request.user)
 
         return Response({
-            'total_earned': total_earned,
-            'total_spent': total_spent,
-            'current_balance': current_balance
+            'total_earned': balance.total_earned,
+            'total_spent': balance.total_spent,
+            'current_balance': balance.balance
         })
 
 
 class LeaderboardViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = Leaderboard.objects.filter(is_active=True)
-    serializer_class = LeaderboardSerializer
+    # Course-scoped leaderboards are not scored by the leaderboard engine
+    queryset = Leaderboard.objects.filter(is_active=True, course__isnull=True)
     permission_classes = [IsAuthenticated]
 
+    def get_serializer_class(self):
+        if self.action == 'retrieve':
+            return LeaderboardDetailSerializer
+        return LeaderboardSerializer
+
+    def _int_param(self, name, default, maximum):
+        """Parse a bounded positive integer query parameter, or None if invalid."""
+        try:
+            value = int(self.request.query_params.get(name, default))
+        except (TypeError, ValueError):
+            return None
+        return value if 0 < value <= maximum else None
+
+    def _ranked_response(self, entries):
+        serializer = LeaderboardRankSerializer(attach_users(entries), many=True)
+        return Response(serializer.data)
+
+    @action(detail=True, methods=['get'])
+    def top(self, request, pk=None):
+        """Get the top entries, up to the leaderboard's max_entries"""
+        leaderboard = self.get_object()
+        limit = self._int_param('limit', leaderboard.max_entries, leaderboard.max_entries)
+        if limit is None:
+            return Response(
+                {'error': f'limit must be between 1 and {leaderboard.max_entries}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return self._ranked_response(leaderboard_engine.get_top(leaderboard.id, limit))
+
+    @action(detail=True, methods=['get'])
+    def around_me(self, request, pk=None):
+        """Get the entries ranked around the current user"""
+        leaderboard = self.get_object()
+        radius = self._int_param('radius', AROUND_ME_DEFAULT_RADIUS, AROUND_ME_MAX_RADIUS)
+        if radius is None:
+            return Response(
+                {'error': f'radius must be between 1 and {AROUND_ME_MAX_RADIUS}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return self._ranked_response(
+            leaderboard_engine.get_around(leaderboard.id, request.user.id, radius)
+        )
+
     @action(detail=False, methods=['get'])
     def user_rankings(self, request):
         """Get user's position in active leaderboards"""
-        user_entries = LeaderboardEntry.objects.filter(
-            user=request.user,
-            leaderboard__is_active=True
-        ).select_related('leaderboard')
-        serializer = LeaderboardEntrySerializer(user_entries, many=True)
-        return Response(serializer.data)
+        leaderboards = {leaderboard.id: leaderboard for leaderboard in self.get_queryset()}
+        ranks = leaderboard_engine.get_ranks(list(leaderboards), request.user.id)
+        return Response([
+            {
+                'leaderboard': leaderboard_id,
+                'leaderboard_name': leaderboards[leaderboard_id].name,
+                'score': entry['score'],
+                'rank': entry['rank'],
+            }
+            for leaderboard_id, entry in ranks.items()
+        ])
 
 
 class ChallengeViewSet(viewsets.ReadOnlyModelViewSet):
@@ -76,46 +135,37 @@ class ChallengeViewSet(viewsets.ReadOnlyModelViewSet):
         return Challenge.objects.filter(
             is_active=True,
             end_date__gt=timezone.now()
-        )
+        ).select_related('badge_reward')
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['challenge_progress'] = get_challenge_progress(self.request.user.id)
+        return context
 
     @action(detail=True, methods=['post'])
     def complete(self, request, pk=None):
-        """Mark a challenge as completed"""
+        """Confirm a challenge the rules engine has marked as completed"""
         challenge = self.get_object()
-        user_challenge, created = UserChallenge.objects.get_or_create(
+        user_challenge = UserChallenge.objects.filter(
             user=request.user,
             challenge=challenge
-        )
+        ).first()
 
-        if user_challenge.is_completed and user_challenge.times_completed >= challenge.max_completions:
+        # Progress and rewards are applied by the rules engine as events arrive
+        if user_challenge is None or not user_challenge.is_completed:
             return Response(
-                {'error': 'Challenge already completed maximum times'},
+                {
+                    'error': 'Challenge criteria not met',
+                    'progress': user_challenge.progress if user_challenge else 0,
+                    'target': challenge.criteria_value
+                },
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Check if criteria are met (simplified - in real implementation, check actual progress)
-        user_challenge.progress = challenge.criteria_value
-        user_challenge.is_completed = True
-        user_challenge.completed_at = timezone.now()
-        user_challenge.times_completed += 1
-        user_challenge.save()
-
-        # Award points
-        PointTransaction.objects.create(
-            user=request.user,
-            points=challenge.points_reward,
-            transaction_type='earned',
-            reason=f'Completed challenge: {challenge.title}'
-        )
-
-        # Award badge if applicable
-        if challenge.badge_reward:
-            UserBadge.objects.get_or_create(
-                user=request.user,
-                badge=challenge.badge_reward
-            )
-
-        return Response({'message': 'Challenge completed successfully'})
+        return Response({
+            'message': 'Challenge completed successfully',
+            'times_completed': user_challenge.times_completed
+        })
 
 
 class UserChallengeViewSet(viewsets.ReadOnlyModelViewSet):
@@ -123,7 +173,14 @@ class UserChallengeViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return UserChallenge.objects.filter(user=self.request.user)
+        return UserChallenge.objects.filter(
+            user=self.request.user
+        ).select_related('challenge__badge_reward')
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['challenge_progress'] = get_challenge_progress(self.request.user.id)
+        return context
 
 
 class RewardViewSet(viewsets.ReadOnlyModelViewSet):
@@ -131,47 +188,57 @@ class RewardViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = RewardSerializer
     permission_classes = [IsAuthenticated]
 
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['redeemed_reward_ids'] = get_redeemed_reward_ids(self.request.user.id)
+        return context
+
     @action(detail=True, methods=['post'])
     def redeem(self, request, pk=None):
         """Redeem a reward"""
         reward = self.get_object()
 
-        # Check if user already redeemed this reward
-        if UserReward.objects.filter(user=request.user, reward=reward).exists():
-            return Response(
-                {'error': 'Reward already redeemed'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-
-        # Check points balance
-        points_summary = PointTransaction.objects.filter(user=request.user).aggregate(
-            earned=Sum('points', filter=Q(transaction_type='earned')),
-            spent=Sum('points', filter=Q(transaction_type='spent'))
-        )
-        current_balance = (points_summary['earned'] or 0) - (points_summary['spent'] or 0)
-
-        if current_balance < reward.points_cost:
+        try:
+            with transaction.atomic():
+                # Concurrent redemptions by the same user wait here, so the
+                # check below sees any redemption committed before it
+                lock_balance(request.user)
+
+                # Check if user already redeemed this reward
+                if UserReward.objects.filter(user=request.user, reward=reward).exists():
+                    return Response(
+                        {'error': 'Reward already redeemed'},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+
+                # Claim stock first; the spend below rolls it back on failure
+                if reward.stock != -1:
+                    claimed = Reward.objects.filter(pk=reward.pk, stock__gt=0).update(
+                        stock=F('stock') - 1
+                    )
+                    if not claimed:
+                        return Response(
+                            {'error': 'Reward out of stock'},
+                            status=status.HTTP_400_BAD_REQUEST
+                        )
+
+                # Deduct points only if the balance covers the cost
+                spend_points(
+                    request.user,
+                    reward.points_cost,
+                    f'Redeemed reward: {reward.name}',
+                    related_object_type='reward',
+                    related_object_id=str(reward.id)
+                )
+
+                # Create redemption record
+                UserReward.objects.create(user=request.user, reward=reward)
+        except InsufficientPointsError:
             return Response(
                 {'error': 'Insufficient points'},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Check stock
-        if reward.stock > 0:
-            reward.stock -= 1
-            reward.save()
-
-        # Create redemption record
-        UserReward.objects.create(user=request.user, reward=reward)
-
-        # Deduct points
-        PointTransaction.objects.create(
-            user=request.user,
-            points=reward.points_cost,
-            transaction_type='spent',
-            reason=f'Redeemed reward: {reward.name}'
-        )
-
         return Response({'message': 'Reward redeemed successfully'})
 
 
@@ -180,7 +247,12 @@ class UserRewardViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return UserReward.objects.filter(user=self.request.user)
+        return UserReward.objects.filter(user=self.request.user).select_related('reward')
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['redeemed_reward_ids'] = get_redeemed_reward_ids(self.request.user.id)
+        return context
 
 
 class LevelViewSet(viewsets.ReadOnlyModelViewSet):
@@ -188,6 +260,14 @@ class LevelViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = LevelSerializer
     permission_classes = [IsAuthenticated]
 
+    def list(self, request, *args, **kwargs):
+        """List levels from the cached level table"""
+        levels = sorted(get_level_table()[1], key=lambda level: level['level_number'])
+        page = self.paginate_queryset(levels)
+        if page is not None:
+            return self.get_paginated_response(page)
+        return Response(levels)
+
 
 class UserLevelViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = UserLevelSerializer
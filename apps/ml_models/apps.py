@@ -4,4 +4,7 @@ from django.apps import AppConfig
 class MlModelsConfig(AppConfig):
     default_auto_field: str = 'django.db.models.BigAutoField'  # type: ignore[assignment]
     name = 'apps.ml_models'
-    verbose_name = 'Machine Learning Models'
\ No newline at end of file
+    verbose_name = 'Machine Learning Models'
+
+    def ready(self):
+        import apps.ml_models.signals
\ No newline at end of file
@@ -0,0 +1,92 @@
+"""
+Compiled NumPy inference for the fitted sklearn models.
+
+sklearn estimators validate their input, check feature names and dispatch
+through joblib on every call, which dominates the cost of scoring a single
+row. The fitted parameters are small, so they are compiled once into plain
+arrays and evaluated directly:
+
+- The learning style pipeline (StandardScaler -> PCA -> KMeans) is linear up
+  to the nearest-centroid search, so it folds into one affine transform
+  whose output is the squared distance to each centroid (up to a constant
+  per row); the cluster is the argmin.
+- The random forest is flattened into node arrays covering every tree.
+  Rows walk all trees at once, one depth level per vectorised step, and the
+  leaf class distributions are averaged exactly as ``predict_proba`` does.
+"""
+import numpy as np
+
+
+class CompiledLearningStyleModel:
+    """Scaler, PCA and KMeans folded into ``argmin(x @ weights + bias)``."""
+
+    def __init__(self, scaler, pca, kmeans):
+        centroids = kmeans.cluster_centers_
+        # Scaler and PCA: z = x @ projection + offset
+        projection = (pca.components_ / scaler.scale_).T
+        offset = -(scaler.mean_ / scaler.scale_ + pca.mean_) @ pca.components_.T
+        if getattr(pca, 'whiten', False):
+            projection = projection / np.sqrt(pca.explained_variance_)
+            offset = offset / np.sqrt(pca.explained_variance_)
+
+        # ||z - c||^2 = ||z||^2 - 2 z.c + ||c||^2; ||z||^2 is the same for
+        # every centroid, so it is dropped
+        self.weights = -2 * projection @ centroids.T
+        self.bias = -2 * offset @ centroids.T + (centroids ** 2).sum(axis=1)
+
+    def predict(self, X):
+        """Return the cluster index for each row of ``X``."""
+        X = np.atleast_2d(np.asarray(X, dtype=float))
+        return np.argmin(X @ self.weights + self.bias, axis=1)
+
+
+class CompiledForest:
+    """Array-backed evaluator for a fitted RandomForestClassifier."""
+
+    def __init__(self, forest, scaler=None):
+        trees = [estimator.tree_ for estimator in forest.estimators_]
+        offsets = np.cumsum([0] + [tree.node_count for tree in trees[:-1]])
+
+        def flatten(attribute):
+            return np.concatenate([getattr(tree, attribute) for tree in trees])
+
+        left = flatten('children_left')
+        right = flatten('children_right')
+        self.is_leaf = left == -1
+        node_offsets = np.repeat(offsets, [tree.node_count for tree in trees])
+        # Leaves point at themselves so finished walks stay put
+        node_ids = np.arange(len(left))
+        self.left = np.where(self.is_leaf, node_ids, left + node_offsets)
+        self.right = np.where(self.is_leaf, node_ids, right + node_offsets)
+        self.feature = np.where(self.is_leaf, 0, flatten('feature'))
+        self.threshold = flatten('threshold')
+
+        values = np.concatenate([tree.value[:, 0, :] for tree in trees])
+        totals = values.sum(axis=1, keepdims=True)
+        self.leaf_proba = np.divide(values, totals, out=np.zeros_like(values), where=totals > 0)
+
+        self.roots = offsets
+        self.max_depth = max(tree.max_depth for tree in trees)
+        self.classes = forest.classes_
+        self.mean = scaler.mean_ if scaler is not None else None
+        self.scale = scaler.scale_ if scaler is not None else None
+
+    def predict_proba(self, X):
+        """Class probabilities for each row of ``X``, as ``predict_proba``."""
+        X = np.atleast_2d(np.asarray(X, dtype=float))
+        if self.mean is not None:
+            X = (X - self.mean) / self.scale
+        # sklearn trees compare float32 inputs against float64 thresholds
+        X = X.astype(np.float32)
+
+        rows = np.arange(len(X))[:, None]
+        nodes = np.broadcast_to(self.roots, (len(X), len(self.roots)))
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+
+        return self.leaf_proba[nodes].mean(axis=1)
+
+    def predict(self, X):
+        """Predicted class label for each row of ``X``."""
+        return self.classes[self.predict_proba(X).argmax(axis=1)]
@@ -0,0 +1,320 @@
+"""
+Vectorised feature engineering for the ML models.
+
+Builds the 10-feature matrices used by ``LearningStyleDetector`` and
+``PerformancePredictor`` for a whole population of users at once. Every
+source table is read with a single grouped aggregate query, and the results
+are scattered into a preallocated NumPy matrix by user position, so the
+cost does not involve per-user queries or per-user Python loops.
+
+Large populations can be streamed in chunks of users with
+``iter_feature_chunks``, and feature matrices can be snapshotted to disk so
+training runs are repeatable.
+"""
+from django.conf import settings
+from django.db.models import Count, Min, Q, Sum
+from django.utils import timezone
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import logging
+
+from .learning_style_detector import FEATURE_NAMES as LEARNING_STYLE_FEATURES
+from .performance_predictor import (
+    FEATURE_NAMES as PERFORMANCE_FEATURES,
+    LEARNING_STYLE_ENCODING
+)
+
+logger = logging.getLogger(__name__)
+
+# Lesson content type -> (time feature, view count feature)
+CONTENT_TYPE_FEATURES = {
+    'video': ('video_time', 'visual_content_views'),
+    'text': ('text_time', 'text_content_views'),
+    'interactive': ('interactive_time', None),
+}
+
+FEATURE_CHUNK_SIZE = 5000
+
+# Share of finished courses completed (not dropped) separating
+# at_risk / on_track / excelling
+COMPLETION_LABEL_THRESHOLDS = [0.5, 1.0]
+
+
+def get_features_dir():
+    """Directory where feature snapshots are stored."""
+    return Path(getattr(settings, 'ML_FEATURES_DIR', Path(settings.ML_MODELS_DIR) / 'features'))
+
+
+def _get_users(users):
+    from apps.users.models import User
+
+    if users is None:
+        users = User.objects.filter(role='student')
+    return users
+
+
+def get_users_active_since(day, users=None):
+    """Users with analytics activity on or after ``day``."""
+    return _get_users(users).filter(learning_analytics__last_activity_date__gte=day)
+
+
+def iter_feature_chunks(build, users=None, chunk_size=FEATURE_CHUNK_SIZE, sample_size=None,
+                        seed=None):
+    """
+    Yield feature matrices for ``users`` in chunks of ``chunk_size`` users.
+
+    Every user appears in at most one chunk.
+
+    Args:
+        build: Feature builder, e.g. ``build_learning_style_features``
+        users: User queryset; defaults to all students
+        chunk_size: Users per chunk
+        sample_size: If set, a random sample of at most this many users
+        seed: Random seed for the sample
+    """
+    users = _get_users(users)
+    user_ids = list(users.order_by('pk').values_list('id', flat=True))
+    if sample_size is not None and len(user_ids) > sample_size:
+        picked = np.random.default_rng(seed).choice(len(user_ids), sample_size, replace=False)
+        user_ids = [user_ids[position] for position in np.sort(picked)]
+    for start in range(0, len(user_ids), chunk_size):
+        yield build(users.model.objects.filter(id__in=user_ids[start:start + chunk_size]))
+
+
+def _columns(rows, count):
+    """Transpose ``values_list`` rows into ``count`` arrays."""
+    if not rows:
+        return [np.array([]) for _ in range(count)]
+    return [np.asarray(column) for column in zip(*rows)]
+
+
+def _scatter(matrix, index, user_ids, column, values):
+    """Add ``values`` into ``matrix[:, column]`` at each user's row."""
+    positions = index.get_indexer(user_ids)
+    mask = positions >= 0
+    np.add.at(matrix[:, column], positions[mask], np.asarray(values, dtype=float)[mask])
+
+
+def _progress_by_content_type(users):
+    """Time spent, lessons viewed and completed per user and content type."""
+    from apps.courses.models import LessonProgress
+
+    rows = LessonProgress.objects.filter(enrollment__student__in=users).order_by().values_list(
+        'enrollment__student', 'lesson__content_type'
+    ).annotate(
+        time_spent=Sum('time_spent'),
+        views=Count('id'),
+        completed=Count('id', filter=Q(is_completed=True)),
+    )
+    return _columns(list(rows), 5)
+
+
+def _session_minutes(index, progress_users, progress_time, users):
+    """
+    Average study minutes per active day for each user.
+
+    Active days come from the daily activity rollups; users with study
+    time but no logged activity count as a single session.
+    """
+    from apps.analytics.models import DailyActivityRollup
+
+    total_seconds = np.zeros(len(index))
+    _scatter(total_seconds[:, None], index, progress_users, 0, progress_time)
+
+    sessions = np.zeros(len(index))
+    day_user_ids, day_counts = _columns(list(
+        DailyActivityRollup.objects.filter(user__in=users).order_by().values_list(
+            'user'
+        ).annotate(days=Count('day', distinct=True))
+    ), 2)
+    _scatter(sessions[:, None], index, day_user_ids, 0, day_counts)
+
+    sessions = np.where((sessions == 0) & (total_seconds > 0), 1, sessions)
+    return np.divide(
+        total_seconds / 60,
+        sessions,
+        out=np.zeros(len(index)),
+        where=sessions > 0
+    )
+
+
+def build_learning_style_features(users=None):
+    """
+    Build the learning style feature matrix for many users.
+
+    Args:
+        users: User queryset; defaults to all students
+
+    Returns:
+        DataFrame indexed by user ID with ``LEARNING_STYLE_FEATURES`` columns
+    """
+    from apps.assessments.models import QuizAttempt
+    from apps.ai_tutor.models import ChatMessage
+
+    users = _get_users(users)
+    index = pd.Index(list(users.values_list('id', flat=True)))
+    matrix = np.zeros((len(index), len(LEARNING_STYLE_FEATURES)))
+    column = {name: position for position, name in enumerate(LEARNING_STYLE_FEATURES)}
+
+    user_ids, content_types, time_spent, views, completed = _progress_by_content_type(users)
+    for content_type, (time_feature, views_feature) in CONTENT_TYPE_FEATURES.items():
+        mask = content_types == content_type
+        _scatter(matrix, index, user_ids[mask], column[time_feature], time_spent[mask])
+        if views_feature:
+            _scatter(matrix, index, user_ids[mask], column[views_feature], views[mask])
+    mask = content_types == 'interactive'
+    _scatter(
+        matrix, index, user_ids[mask],
+        column['practice_exercises_completed'], completed[mask]
+    )
+    matrix[:, column['avg_session_duration']] = _session_minutes(index, user_ids, time_spent, users)
+
+    attempt_users, attempts = _columns(list(
+        QuizAttempt.objects.filter(student__in=users).order_by().values_list(
+            'student'
+        ).annotate(attempts=Count('id'))
+    ), 2)
+    _scatter(matrix, index, attempt_users, column['quiz_attempts'], attempts)
+
+    chat_users, messages = _columns(list(
+        ChatMessage.objects.filter(session__user__in=users, role='user').order_by().values_list(
+            'session__user'
+        ).annotate(messages=Count('id'))
+    ), 2)
+    _scatter(matrix, index, chat_users, column['chat_interactions'], messages)
+
+    return pd.DataFrame(matrix, index=index, columns=LEARNING_STYLE_FEATURES)
+
+
+def build_performance_features(users=None):
+    """
+    Build the performance prediction feature matrix for many users.
+
+    Args:
+        users: User queryset; defaults to all students
+
+    Returns:
+        DataFrame indexed by user ID with ``PERFORMANCE_FEATURES`` columns
+    """
+    from apps.analytics.models import LearningAnalytics
+    from apps.courses.models import Enrollment
+
+    users = _get_users(users)
+    user_ids, learning_styles = _columns(list(users.values_list('id', 'learning_style')), 2)
+    index = pd.Index(user_ids)
+    matrix = np.zeros((len(index), len(PERFORMANCE_FEATURES)))
+    column = {name: position for position, name in enumerate(PERFORMANCE_FEATURES)}
+
+    analytics_fields = [
+        'average_quiz_score', 'total_study_time', 'current_streak',
+        'courses_enrolled', 'lessons_completed', 'quizzes_taken',
+        'chat_messages_sent',
+    ]
+    analytics_columns = _columns(list(
+        LearningAnalytics.objects.filter(user__in=users).values_list('user', *analytics_fields)
+    ), len(analytics_fields) + 1)
+    for field, values in zip(analytics_fields, analytics_columns[1:]):
+        _scatter(matrix, index, analytics_columns[0], column[field], values)
+
+    progress_users, _, time_spent, _, _ = _progress_by_content_type(users)
+    matrix[:, column['average_session_duration']] = _session_minutes(
+        index, progress_users, time_spent, users
+    )
+
+    matrix[:, column['learning_style']] = pd.Series(learning_styles, dtype=object).map(
+        LEARNING_STYLE_ENCODING
+    ).fillna(LEARNING_STYLE_ENCODING['unknown']).to_numpy(dtype=float)
+
+    enrolled_users, first_enrolled = _columns(list(
+        Enrollment.objects.filter(student__in=users).order_by().values_list(
+            'student'
+        ).annotate(first_enrolled=Min('enrolled_at'))
+    ), 2)
+    if len(enrolled_users):
+        days = (pd.Timestamp(timezone.now()) - pd.to_datetime(first_enrolled, utc=True)).days
+        _scatter(matrix, index, enrolled_users, column['days_since_enrollment'], days)
+
+    return pd.DataFrame(matrix, index=index, columns=PERFORMANCE_FEATURES)
+
+
+def build_performance_labels(users=None):
+    """
+    Performance labels for the users with a known outcome.
+
+    Students are labelled by the share of their finished enrollments they
+    completed rather than dropped, using ``COMPLETION_LABEL_THRESHOLDS``.
+    The outcome is an enrollment status, not derived from the feature
+    columns, and students with no completed or dropped enrollment yet are
+    left out instead of being given a default label.
+
+    Args:
+        users: User queryset; defaults to all students
+
+    Returns:
+        Series indexed by user ID of label indices in ``LABELS`` order
+    """
+    from apps.courses.models import Enrollment
+
+    users = _get_users(users)
+    labelled_users, completed, finished = _columns(list(
+        Enrollment.objects.filter(
+            student__in=users,
+            status__in=['completed', 'dropped']
+        ).order_by().values_list('student').annotate(
+            completed=Count('id', filter=Q(status='completed')),
+            finished=Count('id'),
+        )
+    ), 3)
+    completion_rate = np.asarray(completed, dtype=float) / np.asarray(finished, dtype=float)
+    return pd.Series(
+        np.digitize(completion_rate, COMPLETION_LABEL_THRESHOLDS),
+        index=pd.Index(labelled_users),
+        dtype=int
+    )
+
+
+def save_feature_snapshot(frame, name, directory=None, format='npy'):
+    """
+    Save a feature matrix to disk for repeatable training.
+
+    ``npy`` snapshots are a NumPy ``.npz`` bundle of the matrix, user IDs
+    and column names; ``parquet`` snapshots need pyarrow.
+
+    Returns:
+        Path: Location of the snapshot
+    """
+    directory = Path(directory or get_features_dir())
+    directory.mkdir(parents=True, exist_ok=True)
+    stamp = timezone.now().strftime('%Y%m%dT%H%M%S')
+
+    if format == 'parquet':
+        path = directory / f'{name}-{stamp}.parquet'
+        snapshot = frame.copy()
+        snapshot.index = snapshot.index.astype(str)
+        snapshot.to_parquet(path, engine='pyarrow')
+    else:
+        path = directory / f'{name}-{stamp}.npz'
+        np.savez(
+            path,
+            features=frame.to_numpy(),
+            user_ids=np.asarray(frame.index.astype(str), dtype=str),
+            columns=np.asarray(frame.columns, dtype=str)
+        )
+
+    logger.info(f"Saved {len(frame)} feature rows to {path}")
+    return path
+
+
+def load_feature_snapshot(path):
+    """Load a feature snapshot written by ``save_feature_snapshot``."""
+    path = Path(path)
+    if path.suffix == '.parquet':
+        return pd.read_parquet(path)
+
+    with np.load(path, allow_pickle=False) as snapshot:
+        return pd.DataFrame(
+            snapshot['features'],
+            index=pd.Index(snapshot['user_ids']),
+            columns=list(snapshot['columns'])
+        )
@@ -3,16 +3,35 @@ Machine Learning model for detecting learning styles using K-means clustering.
 """
 import numpy as np
 import pandas as pd
-from sklearn.cluster import KMeans
+from sklearn.cluster import KMeans, MiniBatchKMeans
 from sklearn.preprocessing import StandardScaler
-from sklearn.decomposition import PCA
+from sklearn.decomposition import PCA, IncrementalPCA
 import joblib
 import os
 from django.conf import settings
+from django.utils import timezone
+from .registry import model_registry, ModelNotTrainedError
+from .compiled import CompiledLearningStyleModel
 import logging
 
 logger = logging.getLogger(__name__)
 
+FEATURE_NAMES = [
+    'video_time',
+    'text_time',
+    'interactive_time',
+    'quiz_attempts',
+    'chat_interactions',
+    'visual_content_views',
+    'audio_content_views',
+    'text_content_views',
+    'practice_exercises_completed',
+    'avg_session_duration',
+]
+
+INCREMENTAL_ALGORITHM = 'MiniBatchKMeans + IncrementalPCA'
+INCREMENTAL_BATCH_SIZE = 1024
+
 
 class LearningStyleDetector:
     """
@@ -25,8 +44,13 @@ class LearningStyleDetector:
     - Content preference patterns
     """
     
+    model_type = 'learning_style'
+    
     def __init__(self):
         self.model = None
+        self.samples_seen = 0
+        self._file_checked = False
+        self._compiled = (None, None)
         self.scaler = StandardScaler()
         self.pca = PCA(n_components=4)
         self.n_clusters = 4  # Visual, Auditory, Reading/Writing, Kinesthetic
@@ -45,18 +69,7 @@ class LearningStyleDetector:
         Returns:
             numpy array of features
         """
-        features = [
-            user_data.get('video_time', 0),
-            user_data.get('text_time', 0),
-            user_data.get('interactive_time', 0),
-            user_data.get('quiz_attempts', 0),
-            user_data.get('chat_interactions', 0),
-            user_data.get('visual_content_views', 0),
-            user_data.get('audio_content_views', 0),
-            user_data.get('text_content_views', 0),
-            user_data.get('practice_exercises_completed', 0),
-            user_data.get('avg_session_duration', 0),
-        ]
+        features = [user_data.get(name, 0) for name in FEATURE_NAMES]
         return np.array(features).reshape(1, -1)
     
     def train(self, training_data):
@@ -91,6 +104,167 @@ class LearningStyleDetector:
         # Save model
         self.save_model()
     
+    def partial_train(self, X):
+        """
+        Update the model with one batch of rows.
+        
+        The scaler keeps running means and variances, and the PCA and
+        clustering are updated in place, so the cost depends only on the
+        size of the batch. A batch-trained model is replaced by fresh
+        incremental estimators on the first call.
+        
+        Args:
+            X: Feature array with at least ``n_clusters`` rows
+        """
+        if not isinstance(self.model, MiniBatchKMeans):
+            self.reset_incremental()
+        
+        X = np.asarray(X, dtype=float)
+        if not hasattr(self.pca, 'components_') and not np.ptp(X, axis=0).any():
+            # IncrementalPCA divides by the variance seen so far, so it
+            # cannot start from identical rows
+            return False
+        X_scaled = self.scaler.partial_fit(X).transform(X)
+        X_pca = self.pca.partial_fit(X_scaled).transform(X_scaled)
+        self.model.partial_fit(X_pca)
+        return True
+    
+    def reset_incremental(self):
+        """Replace the estimators with fresh, untrained incremental ones."""
+        self.samples_seen = 0
+        self.scaler = StandardScaler()
+        self.pca = IncrementalPCA(n_components=self.pca.n_components)
+        self.model = MiniBatchKMeans(
+            n_clusters=self.n_clusters,
+            random_state=42,
+            batch_size=INCREMENTAL_BATCH_SIZE,
+            n_init=3
+        )
+    
+    def update_clusters(self, X):
+        """
+        Update the clusters with one batch of rows, keeping the scaler and
+        PCA fixed.
+        
+        Args:
+            X: Feature array
+        """
+        X_scaled = self.scaler.transform(np.asarray(X, dtype=float))
+        self.model.partial_fit(self.pca.transform(X_scaled))
+        return True
+    
+    def train_incremental(self, chunks, resume=False):
+        """
+        Train the incremental estimators chunk by chunk.
+        
+        Fresh estimators are fit unless ``resume`` is set, in which case
+        the clusters of the loaded checkpoint are updated in place. Its
+        scaler and PCA are kept as they are, so the centroids stay in the
+        same space and keep their indices, and with them the learning
+        style each index maps to.
+        
+        Each row is seen once and only one chunk is held in memory, so
+        chunks should contain each user at most once. Chunks smaller than a
+        usable batch are carried over into the next one; a final remainder
+        that is still too small is skipped.
+        
+        Args:
+            chunks: Iterable of DataFrames with ``FEATURE_NAMES`` columns
+            resume: Update the loaded checkpoint instead of starting over
+        
+        Returns:
+            int: Number of rows trained on
+        """
+        if not resume:
+            self.reset_incremental()
+        train = self.update_clusters if resume else self.partial_train
+        min_rows = max(self.n_clusters, self.pca.n_components)
+        pending = []
+        trained = 0
+        
+        for chunk in chunks:
+            pending.append(chunk[FEATURE_NAMES].to_numpy())
+            if sum(len(rows) for rows in pending) < min_rows:
+                continue
+            X = np.vstack(pending)
+            if train(X):
+                trained += len(X)
+                pending = []
+        
+        skipped = sum(len(rows) for rows in pending)
+        if skipped:
+            logger.warning(f"Skipped {skipped} rows, too few for an incremental batch")
+        self.samples_seen += trained
+        logger.info(f"Learning style detector updated with {trained} rows")
+        return trained
+    
+    def load_checkpoint(self):
+        """
+        Load the latest incremental checkpoint to resume training from.
+        
+        Returns:
+            date: The checkpoint's watermark, or None if there is no
+            checkpoint to resume
+        """
+        from .models import MLModel
+        
+        checkpoint = MLModel.objects.filter(
+            model_type=self.model_type,
+            algorithm=INCREMENTAL_ALGORITHM
+        ).order_by('-trained_at').first()
+        if checkpoint is None or 'watermark' not in checkpoint.hyperparameters:
+            return None
+        if not os.path.exists(checkpoint.model_file_path):
+            logger.warning(f"Checkpoint file {checkpoint.model_file_path} is missing")
+            return None
+        
+        data = joblib.load(checkpoint.model_file_path)
+        self.model = data['model']
+        self.scaler = data['scaler']
+        self.pca = data['pca']
+        self.samples_seen = checkpoint.hyperparameters.get('samples_seen', 0)
+        logger.info(f"Checkpoint loaded from {checkpoint.model_file_path}")
+        return data['watermark']
+    
+    def save_checkpoint(self, watermark, samples):
+        """
+        Save the incremental model and register it as a new MLModel version.
+        
+        Args:
+            watermark: Date up to which activity has been trained on
+            samples: Rows trained on since the previous checkpoint
+        
+        Returns:
+            MLModel: The registered (inactive) version
+        """
+        from .models import MLModel
+        
+        version = timezone.now().strftime('%Y%m%dT%H%M%S%f')
+        path = os.path.join(settings.ML_MODELS_DIR, f'learning_style_detector-{version}.pkl')
+        joblib.dump({
+            'model': self.model,
+            'scaler': self.scaler,
+            'pca': self.pca,
+            'watermark': watermark,
+        }, path)
+        logger.info(f"Checkpoint saved to {path}")
+        
+        return MLModel.objects.create(
+            name='Learning Style Detector',
+            model_type=self.model_type,
+            version=version,
+            description=f'Incremental checkpoint updated with {samples} students',
+            algorithm=INCREMENTAL_ALGORITHM,
+            hyperparameters={
+                'n_clusters': self.n_clusters,
+                'n_components': self.pca.n_components,
+                'batch_size': self.model.batch_size,
+                'samples_seen': self.samples_seen,
+                'watermark': watermark.isoformat(),
+            },
+            model_file_path=path
+        )
+    
     def predict(self, user_data):
         """
         Predict learning style for a user.
@@ -101,16 +275,11 @@ class LearningStyleDetector:
         Returns:
             str: Predicted learning style
         """
-        if self.model is None:
-            self.load_model()
+        artefact = self.get_artefact()
         
-        # Extract and prepare features
+        # Scale, project and find the nearest centroid in one compiled step
         features = self.extract_features(user_data)
-        features_scaled = self.scaler.transform(features)
-        features_pca = self.pca.transform(features_scaled)
-        
-        # Predict cluster
-        cluster = self.model.predict(features_pca)[0]
+        cluster = self.get_compiled(artefact).predict(features)[0]
         
         # Map cluster to learning style
         style_mapping = {
@@ -122,6 +291,34 @@ class LearningStyleDetector:
         
         return style_mapping.get(cluster, 'unknown')
     
+    def get_artefact(self):
+        """
+        Return the fitted model, scaler and PCA to predict with.
+        
+        The active version in the model registry wins; otherwise the model
+        trained in this process or saved at ``model_path`` is used.
+        """
+        artefact = model_registry.get(self.model_type)
+        if artefact is not None:
+            return artefact
+        
+        if self.model is None and not self._file_checked:
+            self._file_checked = True
+            self.load_model()
+        if self.model is None:
+            raise ModelNotTrainedError("Learning style detector has not been trained")
+        return {'model': self.model, 'scaler': self.scaler, 'pca': self.pca}
+    
+    def get_compiled(self, artefact):
+        """Compiled NumPy pipeline for an artefact, built once per model."""
+        model, compiled = self._compiled
+        if model is not artefact['model']:
+            compiled = CompiledLearningStyleModel(
+                artefact['scaler'], artefact['pca'], artefact['model']
+            )
+            self._compiled = (artefact['model'], compiled)
+        return compiled
+    
     def get_cluster_characteristics(self, cluster_id):
         """Get characteristics of a specific cluster."""
         if self.model is None:
@@ -0,0 +1,68 @@
+"""
+Search hyperparameters for the performance predictor and promote the best.
+"""
+from django.core.management.base import BaseCommand, CommandError
+import json
+from apps.ml_models.search import DEFAULT_CV_FOLDS, train_performance_model
+
+
+class Command(BaseCommand):
+    help = "Cross-validate performance predictor configurations on every core and register the best"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--cv',
+            type=int,
+            default=DEFAULT_CV_FOLDS,
+            help="Number of cross-validation folds"
+        )
+        parser.add_argument(
+            '--jobs',
+            type=int,
+            default=-1,
+            help="Worker processes (default: every core)"
+        )
+        activation = parser.add_mutually_exclusive_group()
+        activation.add_argument(
+            '--no-activate',
+            action='store_true',
+            help="Register the best model without making it active"
+        )
+        activation.add_argument(
+            '--activate',
+            action='store_true',
+            help="Make the best model active even if it scores below the active one"
+        )
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            help="Print a one-line JSON summary instead of the candidate table"
+        )
+
+    def handle(self, *args, **options):
+        try:
+            ml_model = train_performance_model(
+                cv=options['cv'],
+                n_jobs=options['jobs'],
+                activate=not options['no_activate'],
+                force_activate=options['activate']
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        if options['json']:
+            self.stdout.write(json.dumps({
+                'model_id': str(ml_model.id),
+                'f1_score': ml_model.f1_score,
+                'candidates': len(ml_model.hyperparameters['candidates']),
+                'active': ml_model.is_active,
+            }))
+            return
+
+        for candidate in ml_model.hyperparameters['candidates']:
+            self.stdout.write(
+                f"F1 {candidate['f1_score']:.3f}  accuracy {candidate['accuracy']:.3f}  "
+                f"{candidate['params']}"
+            )
+        status = "active" if ml_model.is_active else "inactive"
+        self.stdout.write(self.style.SUCCESS(f"Registered {ml_model} ({status})"))
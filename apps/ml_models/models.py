@@ -1,7 +1,7 @@
 """
 Models for ML model management.
 """
-from django.db import models
+from django.db import models, transaction
 import uuid
 
 
@@ -45,4 +45,14 @@ class MLModel(models.Model):
         ordering = ['-trained_at']
     
     def __str__(self):
-        return f"{self.name} v{self.version}"
\ No newline at end of file
+        return f"{self.name} v{self.version}"
+    
+    def activate(self):
+        """Make this the only active version of its model type."""
+        with transaction.atomic():
+            MLModel.objects.filter(
+                model_type=self.model_type,
+                is_active=True
+            ).exclude(pk=self.pk).update(is_active=False)
+            self.is_active = True
+            self.save(update_fields=['is_active'])
@@ -10,10 +10,50 @@ from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_sc
 import joblib
 import os
 from django.conf import settings
+from .registry import model_registry, ModelNotTrainedError
+from .compiled import CompiledForest
 import logging
 
 logger = logging.getLogger(__name__)
 
+FEATURE_NAMES = [
+    'average_quiz_score',
+    'total_study_time',
+    'current_streak',
+    'courses_enrolled',
+    'lessons_completed',
+    'quizzes_taken',
+    'chat_messages_sent',
+    'average_session_duration',
+    'learning_style',
+    'days_since_enrollment',
+]
+
+# Class index -> label
+LABELS = ['at_risk', 'on_track', 'excelling']
+
+LEARNING_STYLE_ENCODING = {
+    'visual': 0,
+    'auditory': 1,
+    'reading_writing': 2,
+    'kinesthetic': 3,
+    'unknown': 4
+}
+
+# Used by ``train`` unless overridden; a hyperparameter search fills in the
+# rest of the forest's parameters
+DEFAULT_HYPERPARAMETERS = {
+    'n_estimators': 100,
+    'max_depth': 10,
+    'random_state': 42,
+    'class_weight': 'balanced',
+    'n_jobs': -1,
+}
+
+# Batches up to this size use the compiled forest; larger cohorts go
+# through sklearn, whose per-call overhead is amortised over many rows
+COMPILED_BATCH_LIMIT = 1000
+
 
 class PerformancePredictor:
     """
@@ -27,9 +67,13 @@ class PerformancePredictor:
     - Course progress
     """
     
+    model_type = 'performance_prediction'
+    
     def __init__(self):
         self.model = None
         self.scaler = StandardScaler()
+        self._file_checked = False
+        self._compiled = (None, None)
         self.model_path = os.path.join(
             settings.ML_MODELS_DIR,
             'performance_predictor.pkl'
@@ -45,15 +89,6 @@ class PerformancePredictor:
         Returns:
             numpy array of features
         """
-        # Encode learning style
-        learning_style_encoding = {
-            'visual': 0,
-            'auditory': 1,
-            'reading_writing': 2,
-            'kinesthetic': 3,
-            'unknown': 4
-        }
-        
         features = [
             student_data.get('average_quiz_score', 0),
             student_data.get('total_study_time', 0),
@@ -63,7 +98,7 @@ class PerformancePredictor:
             student_data.get('quizzes_taken', 0),
             student_data.get('chat_messages_sent', 0),
             student_data.get('average_session_duration', 0),
-            learning_style_encoding.get(
+            LEARNING_STYLE_ENCODING.get(
                 student_data.get('learning_style', 'unknown'),
                 4
             ),
@@ -71,13 +106,18 @@ class PerformancePredictor:
         ]
         return np.array(features).reshape(1, -1)
     
-    def train(self, training_data, labels):
+    def build_model(self, **params):
+        """Unfitted forest with ``DEFAULT_HYPERPARAMETERS`` overridden by ``params``."""
+        return RandomForestClassifier(**{**DEFAULT_HYPERPARAMETERS, **params})
+    
+    def train(self, training_data, labels, **params):
         """
         Train the Random Forest classifier.
         
         Args:
             training_data: DataFrame with student features
             labels: Array of performance labels (0: at-risk, 1: on-track, 2: excelling)
+            **params: Forest hyperparameters overriding the defaults
         """
         logger.info("Training performance predictor...")
         
@@ -95,12 +135,7 @@ class PerformancePredictor:
         X_test_scaled = self.scaler.transform(X_test)
         
         # Train Random Forest
-        self.model = RandomForestClassifier(
-            n_estimators=100,
-            max_depth=10,
-            random_state=42,
-            class_weight='balanced'
-        )
+        self.model = self.build_model(**params)
         self.model.fit(X_train_scaled, y_train)
         
         # Evaluate
@@ -132,54 +167,83 @@ class PerformancePredictor:
         Returns:
             dict: Prediction results
         """
-        if self.model is None:
-            self.load_model()
+        results = self.predict_batch(self.extract_features(student_data))
+        probabilities = results['probabilities'][0]
         
-        # Extract and prepare features
-        features = self.extract_features(student_data)
-        features_scaled = self.scaler.transform(features)
+        return {
+            'prediction': results['predictions'][0],
+            'confidence': float(results['confidence'][0]),
+            'probabilities': {
+                label: float(probability)
+                for label, probability in zip(LABELS, probabilities)
+            }
+        }
+    
+    def predict_batch(self, features):
+        """
+        Predict performance for many students in one vectorised pass.
         
-        # Predict
-        prediction = self.model.predict(features_scaled)[0]
-        probabilities = self.model.predict_proba(features_scaled)[0]
+        Args:
+            features: Array or DataFrame of shape (n_students, 10) in
+                ``FEATURE_NAMES`` order
         
-        # Map prediction to label
-        label_mapping = {
-            0: 'at_risk',
-            1: 'on_track',
-            2: 'excelling'
-        }
+        Returns:
+            dict with ``predictions`` (labels), ``confidence`` and
+            ``probabilities`` (n_students x 3, in ``LABELS`` order)
+        """
+        artefact = self.get_artefact()
+        model = artefact['model']
+        
+        X = np.asarray(features, dtype=float).reshape(-1, len(FEATURE_NAMES))
+        if len(X) <= COMPILED_BATCH_LIMIT:
+            class_probabilities = self.get_compiled(artefact).predict_proba(X)
+        else:
+            class_probabilities = model.predict_proba(artefact['scaler'].transform(X))
+        
+        # Align probability columns with LABELS even if a class was absent
+        # from the training data
+        probabilities = np.zeros((len(X), len(LABELS)))
+        probabilities[:, model.classes_.astype(int)] = class_probabilities
         
         return {
-            'prediction': label_mapping.get(prediction, 'unknown'),
-            'confidence': float(max(probabilities)),
-            'probabilities': {
-                'at_risk': float(probabilities[0]),
-                'on_track': float(probabilities[1]),
-                'excelling': float(probabilities[2])
-            }
+            'predictions': np.asarray(LABELS)[probabilities.argmax(axis=1)],
+            'confidence': probabilities.max(axis=1),
+            'probabilities': probabilities,
         }
     
+    def get_artefact(self):
+        """
+        Return the fitted model and scaler to predict with.
+        
+        The active version in the model registry wins; otherwise the model
+        trained in this process or saved at ``model_path`` is used.
+        """
+        artefact = model_registry.get(self.model_type)
+        if artefact is not None:
+            return artefact
+        
+        if self.model is None and not self._file_checked:
+            self._file_checked = True
+            self.load_model()
+        if self.model is None:
+            raise ModelNotTrainedError("Performance predictor has not been trained")
+        return {'model': self.model, 'scaler': self.scaler}
+    
+    def get_compiled(self, artefact):
+        """Compiled NumPy evaluator for an artefact, built once per model."""
+        model, compiled = self._compiled
+        if model is not artefact['model']:
+            compiled = CompiledForest(artefact['model'], artefact['scaler'])
+            self._compiled = (artefact['model'], compiled)
+        return compiled
+    
     def get_feature_importance(self):
         """Get feature importance scores."""
         if self.model is None:
             return None
         
-        feature_names = [
-            'average_quiz_score',
-            'total_study_time',
-            'current_streak',
-            'courses_enrolled',
-            'lessons_completed',
-            'quizzes_taken',
-            'chat_messages_sent',
-            'average_session_duration',
-            'learning_style',
-            'days_since_enrollment'
-        ]
-        
         importances = self.model.feature_importances_
-        return dict(zip(feature_names, importances))
+        return dict(zip(FEATURE_NAMES, importances))
     
     def save_model(self):
         """Save the trained model to disk."""
@@ -0,0 +1,64 @@
+"""
+Per-user cache of model predictions.
+
+Predictions are keyed by user, model version and a fingerprint of the
+feature vector, so a cached result is reused only while the inputs and the
+serving model are unchanged. Activating a new version or retraining the
+local model file changes the version, and changed inputs change the
+fingerprint; stale entries are never read again and simply expire.
+"""
+from django.core.cache import cache
+import hashlib
+import os
+import numpy as np
+
+from .registry import model_registry
+
+PREDICTION_CACHE_TIMEOUT = 60 * 60 * 24  # 1 day
+
+
+def get_model_version(predictor):
+    """
+    Version of the model a predictor will serve.
+
+    The active registry version wins; otherwise the modification time of
+    the predictor's model file identifies the local model.
+    """
+    active = model_registry.get_active_version(predictor.model_type)
+    if active is not None:
+        return active[0]
+    try:
+        return f"file-{os.path.getmtime(predictor.model_path):.0f}"
+    except OSError:
+        return 'untrained'
+
+
+def get_feature_fingerprint(features):
+    """Stable hash of a feature vector."""
+    return hashlib.sha1(np.asarray(features, dtype=float).tobytes()).hexdigest()
+
+
+def get_prediction_cache_key(predictor, user_id, features):
+    """Cache key for a user's prediction from a feature vector."""
+    return (
+        f"prediction:{predictor.model_type}:{user_id}:"
+        f"{get_model_version(predictor)}:{get_feature_fingerprint(features)}"
+    )
+
+
+def get_cached_prediction(predictor, user_id, data):
+    """
+    Return ``predictor.predict(data)`` for a user, from the cache if the
+    same features were scored by the same model version before.
+
+    Args:
+        predictor: ``LearningStyleDetector`` or ``PerformancePredictor``
+        user_id: ID of the user the prediction is for
+        data: Dict of user metrics accepted by ``predictor.predict``
+    """
+    cache_key = get_prediction_cache_key(predictor, user_id, predictor.extract_features(data))
+    prediction = cache.get(cache_key)
+    if prediction is None:
+        prediction = predictor.predict(data)
+        cache.set(cache_key, prediction, PREDICTION_CACHE_TIMEOUT)
+    return prediction
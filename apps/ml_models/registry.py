@@ -0,0 +1,111 @@
+"""
+Registry of trained model artefacts.
+
+The active version of each model type is the ``MLModel`` row with
+``is_active=True``. Artefacts are loaded once per process with
+``joblib.load(mmap_mode='r')``, so the NumPy arrays inside them are
+memory-mapped and forked Gunicorn/Celery workers share the same pages.
+
+Each lookup checks the active version ID from the cache (kept in step by
+``MLModel`` signals). When another version has been activated, the first
+call to notice loads the new artefact and swaps it in with a single
+reference assignment, so concurrent requests see either the old or the new
+artefact, never a mix.
+"""
+from django.core.cache import cache
+from django.db import DatabaseError
+import joblib
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_VERSION_TIMEOUT = 60 * 5  # 5 minutes
+NO_ACTIVE_VERSION = ''
+
+
+class ModelNotTrainedError(Exception):
+    """Raised when a prediction is requested but no model is available."""
+
+
+def get_active_version_key(model_type):
+    """Cache key holding the active MLModel ID for a model type."""
+    return f"ml_model_active:{model_type}"
+
+
+class ModelRegistry:
+    """Process-wide cache of active model artefacts keyed by model type."""
+
+    def __init__(self):
+        self._loaded = {}  # model_type -> (MLModel id, artefact)
+        self._lock = threading.Lock()
+
+    def get_active_version(self, model_type):
+        """
+        Return ``(id, model_file_path)`` of the active version, or None.
+        """
+        from .models import MLModel
+
+        cache_key = get_active_version_key(model_type)
+        active = cache.get(cache_key)
+        if active is None:
+            row = MLModel.objects.filter(
+                model_type=model_type,
+                is_active=True
+            ).order_by('-trained_at').values_list('id', 'model_file_path').first()
+            active = (str(row[0]), row[1]) if row else NO_ACTIVE_VERSION
+            cache.set(cache_key, active, ACTIVE_VERSION_TIMEOUT)
+        return tuple(active) if active else None
+
+    def load(self, model_type, version_id, path):
+        """Load an artefact and make it the current one for its type."""
+        with self._lock:
+            current = self._loaded.get(model_type)
+            if current and current[0] == version_id:
+                return current[1]
+
+            if not os.path.exists(path):
+                raise ModelNotTrainedError(f"Model file not found: {path}")
+            artefact = joblib.load(path, mmap_mode='r')
+            # Single assignment: readers see the old or new entry, never a mix
+            self._loaded[model_type] = (version_id, artefact)
+            logger.info(f"Loaded {model_type} model {version_id} from {path}")
+            return artefact
+
+    def get(self, model_type):
+        """
+        Return the active artefact for a model type, or None if no version
+        is registered. Hot-swaps when the active version has changed.
+        """
+        active = self.get_active_version(model_type)
+        if active is None:
+            return None
+
+        version_id, path = active
+        current = self._loaded.get(model_type)
+        if current and current[0] == version_id:
+            return current[1]
+        return self.load(model_type, version_id, path)
+
+    def warm(self):
+        """Load every active artefact; called at worker start-up."""
+        from .models import MLModel
+
+        try:
+            model_types = set(
+                MLModel.objects.filter(is_active=True).values_list('model_type', flat=True)
+            )
+            for model_type in model_types:
+                self.get(model_type)
+        except (DatabaseError, ModelNotTrainedError) as e:
+            logger.warning(f"Could not warm ML models: {str(e)}")
+
+    def clear(self):
+        """Drop all loaded artefacts."""
+        with self._lock:
+            self._loaded = {}
+
+
+# Singleton instance
+model_registry = ModelRegistry()
@@ -0,0 +1,195 @@
+"""
+Cross-validated hyperparameter search for the performance predictor.
+
+Every (candidate, fold) pair is an independent fit, so the whole grid is
+spread over a joblib process pool that uses every core. Forests inside the
+workers are single-threaded to avoid oversubscribing the CPUs, and joblib
+memory-maps the feature matrix into the workers instead of copying it for
+each task.
+
+joblib cannot start worker processes from a daemonic process such as a
+Celery prefork worker and silently runs everything in one process there,
+so the search is run from the ``train_performance_model`` management
+command; the Celery task starts that command as a separate process.
+
+Training labels are enrollment outcomes (see ``build_performance_labels``),
+and only students with a finished enrollment are trained on.
+
+The best candidate by mean F1 is refit on all rows, saved under
+``ML_MODELS_DIR`` and registered as a new ``MLModel`` version whose
+hyperparameters record every candidate's cross-validated metrics. It only
+replaces the active version if its F1 is higher, unless activation is
+forced.
+"""
+from django.conf import settings
+from django.utils import timezone
+from joblib import Parallel, delayed
+from sklearn.metrics import accuracy_score, precision_recall_fscore_support
+from sklearn.model_selection import ParameterGrid, StratifiedKFold
+from sklearn.preprocessing import StandardScaler
+import multiprocessing
+import numpy as np
+import os
+import logging
+
+from .performance_predictor import PerformancePredictor
+
+logger = logging.getLogger(__name__)
+
+PARAM_GRID = {
+    'n_estimators': [100, 300],
+    'max_depth': [6, 10, None],
+    'min_samples_leaf': [1, 5],
+    'max_features': ['sqrt', 0.5],
+}
+DEFAULT_CV_FOLDS = 5
+METRICS = ['accuracy', 'precision', 'recall', 'f1_score']
+
+
+def evaluate_fold(params, X, y, train_index, test_index):
+    """Fit one candidate on one fold and score it on the held-out rows."""
+    scaler = StandardScaler()
+    model = PerformancePredictor().build_model(**params, n_jobs=1)
+    model.fit(scaler.fit_transform(X[train_index]), y[train_index])
+
+    y_pred = model.predict(scaler.transform(X[test_index]))
+    precision, recall, f1, _ = precision_recall_fscore_support(
+        y[test_index], y_pred, average='weighted', zero_division=0
+    )
+    return {
+        'accuracy': accuracy_score(y[test_index], y_pred),
+        'precision': precision,
+        'recall': recall,
+        'f1_score': f1,
+    }
+
+
+def run_search(X, y, param_grid=None, cv=DEFAULT_CV_FOLDS, n_jobs=-1):
+    """
+    Cross-validate every candidate in a parameter grid.
+
+    Args:
+        X: Feature array in ``FEATURE_NAMES`` order
+        y: Label indices
+        param_grid: Forest parameters to search; defaults to ``PARAM_GRID``
+        cv: Number of stratified folds
+        n_jobs: Worker processes; -1 uses every core
+
+    Returns:
+        list: ``{'params': ..., <metric>: mean score}`` per candidate,
+        best F1 first
+    """
+    X = np.asarray(X, dtype=float)
+    y = np.asarray(y)
+    if len(np.unique(y)) < 2:
+        raise ValueError("Training data needs at least two performance classes")
+
+    if n_jobs != 1 and multiprocessing.current_process().daemon:
+        logger.warning(
+            "Hyperparameter search is running in a daemonic process and will use a "
+            "single core; run the train_performance_model command instead"
+        )
+
+    candidates = list(ParameterGrid(param_grid or PARAM_GRID))
+    folds = list(StratifiedKFold(n_splits=cv, shuffle=True, random_state=42).split(X, y))
+    logger.info(f"Searching {len(candidates)} candidates over {cv} folds")
+
+    scores = Parallel(n_jobs=n_jobs)(
+        delayed(evaluate_fold)(params, X, y, train_index, test_index)
+        for params in candidates
+        for train_index, test_index in folds
+    )
+
+    results = []
+    for position, params in enumerate(candidates):
+        fold_scores = scores[position * len(folds):(position + 1) * len(folds)]
+        results.append({
+            'params': params,
+            **{
+                metric: float(np.mean([fold[metric] for fold in fold_scores]))
+                for metric in METRICS
+            }
+        })
+
+    return sorted(results, key=lambda result: result['f1_score'], reverse=True)
+
+
+def train_performance_model(users=None, param_grid=None, cv=DEFAULT_CV_FOLDS,
+                            n_jobs=-1, activate=True, force_activate=False):
+    """
+    Search hyperparameters, then train and register the best model.
+
+    Args:
+        users: User queryset to train on; defaults to all students
+        param_grid: Forest parameters to search; defaults to ``PARAM_GRID``
+        cv: Number of stratified folds
+        n_jobs: Worker processes; -1 uses every core
+        activate: Promote the new version if it beats the active model's F1
+        force_activate: Promote the new version whatever its F1
+
+    Returns:
+        MLModel: The registered version
+    """
+    from .features import build_performance_features, build_performance_labels
+    from .models import MLModel
+
+    labels = build_performance_labels(users)
+    features = build_performance_features(users)
+    # Only students with a known outcome are trained on
+    labelled = features.index.intersection(labels.index)
+    X = features.loc[labelled].to_numpy()
+    labels = labels.loc[labelled].to_numpy()
+
+    results = run_search(X, labels, param_grid=param_grid, cv=cv, n_jobs=n_jobs)
+    best = results[0]
+    logger.info(f"Best performance model {best['params']} - F1: {best['f1_score']:.3f}")
+
+    # Refit the winner on every row
+    predictor = PerformancePredictor()
+    predictor.model = predictor.build_model(**best['params'])
+    predictor.model.fit(predictor.scaler.fit_transform(X), labels)
+    version = timezone.now().strftime('%Y%m%dT%H%M%S%f')
+    predictor.model_path = os.path.join(
+        settings.ML_MODELS_DIR,
+        f'performance_predictor-{version}.pkl'
+    )
+    predictor.save_model()
+
+    ml_model = MLModel.objects.create(
+        name='Performance Predictor',
+        model_type=predictor.model_type,
+        version=version,
+        description=(
+            f'Best of {len(results)} candidates by {cv}-fold cross-validated F1, '
+            f'trained on {len(X)} students with finished enrollments'
+        ),
+        algorithm='RandomForestClassifier',
+        hyperparameters={**best['params'], 'cv_folds': cv, 'candidates': results},
+        accuracy=best['accuracy'],
+        precision=best['precision'],
+        recall=best['recall'],
+        f1_score=best['f1_score'],
+        model_file_path=predictor.model_path
+    )
+    if force_activate or (activate and beats_active_model(ml_model)):
+        ml_model.activate()
+    return ml_model
+
+
+def beats_active_model(ml_model):
+    """Whether a new version scores a higher F1 than the active one."""
+    from .models import MLModel
+
+    active = MLModel.objects.filter(
+        model_type=ml_model.model_type,
+        is_active=True
+    ).exclude(pk=ml_model.pk).first()
+    if active is None or active.f1_score is None:
+        return True
+    if ml_model.f1_score > active.f1_score:
+        return True
+    logger.info(
+        f"Keeping active model {active} - F1: {active.f1_score:.3f} "
+        f"(new version: {ml_model.f1_score:.3f})"
+    )
+    return False
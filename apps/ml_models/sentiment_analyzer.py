@@ -1,52 +1,323 @@
 """
 Sentiment analysis for student feedback and chat messages.
 """
-from textblob import TextBlob
+from django.core.cache import cache
+from textblob.en import sentiment as textblob_lexicon
+import hashlib
 import logging
+import re
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
+# Bump when the scoring rules change so cached results are not reused
+SCORER_VERSION = 3
+SENTIMENT_CACHE_TIMEOUT = 60 * 60 * 24 * 7  # 1 week
+
+# Distinct words and tokens memoised by the scorer before it starts over
+TOKEN_CACHE_SIZE = 100000
+
+# Tokenizer rules and emoticons copied from TextBlob 0.17.1
+# (textblob/_text.py), so texts are tokenised as TextBlob does
+NEGATIONS = {'no', 'not', "n't", 'never'}
+PUNCTUATION = ".,;:!?()[]{}`''\"@#$^&*+-|=~_"
+ABBREVIATIONS = {
+    'a.', 'adj.', 'adv.', 'al.', 'a.m.', 'c.', 'cf.', 'comp.', 'conf.', 'def.',
+    'ed.', 'e.g.', 'esp.', 'etc.', 'ex.', 'f.', 'fig.', 'gen.', 'id.', 'i.e.',
+    'int.', 'l.', 'm.', 'Med.', 'Mil.', 'Mr.', 'n.', 'n.q.', 'orig.', 'pl.',
+    'pred.', 'pres.', 'p.m.', 'ref.', 'v.', 'vs.', 'w/',
+}
+RE_ABBR1 = re.compile(r"^[A-Za-z]\.$")
+RE_ABBR2 = re.compile(r"^([A-Za-z]\.)+$")
+RE_ABBR3 = re.compile("^[A-Z][" + "|".join("bcdfghjklmnpqrstvwxz") + "]+.$")
+QUOTES = ['“', '”', '‘', '’', "'", '"']
+END_OF_SENTENCE = 'END-OF-SENTENCE'
+
+# (mood, polarity) -> emoticons
+EMOTICONS = {
+    ('love', +1.00): ('<3', '♥'),
+    ('grin', +1.00): ('>:D', ':-D', ':D', '=-D', '=D', 'X-D', 'x-D', 'XD', 'xD', '8-D'),
+    ('taunt', +0.75): (">:P", ":-P", ":P", ":-p", ":p", ":-b", ":b", ":c)", ":o)", ":^)"),
+    ('smile', +0.50): ('>:)', ':-)', ':)', '=)', '=]', ':]', ':}', ':>', ':3', '8)', '8-)'),
+    ('wink', +0.25): ('>;]', ';-)', ';)', ';-]', ';]', ';D', ';^)', '*-)', '*)'),
+    ('gasp', +0.05): ('>:o', ':-O', ':O', ':o', ':-o', 'o_O', 'o.O', '°O°', '°o°'),
+    ('worry', -0.25): (
+        '>:/', ':-/', ':/', ':\\', '>:\\', ':-.', ':-s', ':s', ':S', ':-S', '>.>'
+    ),
+    ('frown', -0.75): ('>:[', ':-(', ':(', '=(', ':-[', ':[', ':{', ':-<', ':c', ':-c', '=/'),
+    ('cry', -1.00): (":'(", ":'''(", ";'("),
+}
+RE_EMOTICONS = re.compile(r"(%s)($|\s)" % "|".join(
+    r" ?".join(re.escape(char) for char in emoticon)
+    for emoticons in EMOTICONS.values()
+    for emoticon in emoticons
+))
+RE_SARCASM = re.compile(r"\( ?\! ?\)")
+
+# Lowercased emoticon -> polarity of its mood
+EMOTICON_POLARITY = {
+    emoticon.lower(): polarity
+    for (_, polarity), emoticons in reversed(EMOTICONS.items())
+    for emoticon in emoticons
+}
+
+LEADING_PUNCTUATION = tuple(PUNCTUATION.replace('.', ''))
+TRAILING_PUNCTUATION = LEADING_PUNCTUATION + ('.',)
+
+# Flags describing a token that is not in the lexicon
+NEGATION = 1
+KEEPS_NEGATION = 2  # too short to end a pending negation
+KEEPS_MODIFIER = 4  # too short to end a pending modifier
+EXCLAMATION = 8
+IRONY = 16
+EMOTICON = 32
+
+
+def classify_polarity(polarity):
+    """Map a polarity score to a sentiment label."""
+    if polarity > 0.1:
+        return 'positive'
+    if polarity < -0.1:
+        return 'negative'
+    return 'neutral'
+
+
+def split_word(word):
+    """Split leading and trailing punctuation off a word, as TextBlob does."""
+    tokens, tail = [], []
+    while word.startswith(LEADING_PUNCTUATION):
+        tokens.append(word[0])
+        word = word[1:]
+    while word.endswith(TRAILING_PUNCTUATION):
+        if word.endswith(LEADING_PUNCTUATION):
+            tail.append(word[-1])
+            word = word[:-1]
+        if word.endswith('...'):
+            tail.append('...')
+            word = word[:-3].rstrip('.')
+        if word.endswith('.'):
+            if (
+                word in ABBREVIATIONS
+                or RE_ABBR1.match(word) is not None
+                or RE_ABBR2.match(word) is not None
+                or RE_ABBR3.match(word) is not None
+            ):
+                break
+            tail.append(word[-1])
+            word = word[:-1]
+    if word:
+        tokens.append(word)
+    tokens.extend(reversed(tail))
+    return tokens
+
+
+class LexiconScorer:
+    """
+    Precompiled lexicon scorer giving the same scores as TextBlob.
+
+    TextBlob's English sentiment lexicon is compiled once into NumPy arrays
+    of polarity, subjectivity and intensity indexed by token ID. Texts are
+    tokenised with a port of TextBlob's tokenizer, memoised per word, and
+    each distinct token is classified once. One pass over a batch's tokens
+    then applies TextBlob's rules, and the per-text averages are taken for
+    the whole batch at once:
+
+    - a known adverb followed by a known word multiplies that word's
+      polarity and subjectivity by its intensity; it carries across words
+      of up to two characters ("really is a good")
+    - a negation ("no", "not", "never") before a known word flips and
+      halves its polarity, and inverts the intensity it passes on ("not
+      very good" is milder than "not good"); it carries across
+      one-character tokens ("not a good"), and after an "-ly" adverb it
+      negates that adverb's assessment ("really not good")
+    - contractions are split into separate tokens ("isn't" becomes "is",
+      "n", "'", "t"), so they never negate
+    - each "!" multiplies the polarity of the last assessment by 1.25
+    - emoticons are scored on their own with their mood's polarity and
+      full subjectivity, and "(!)" adds a neutral, fully subjective score
+    """
+
+    def __init__(self, lexicon=None):
+        lexicon = lexicon if lexicon is not None else textblob_lexicon
+        lexicon.load()
+
+        self.words = sorted(lexicon)
+        self.vocabulary = {word: index for index, word in enumerate(self.words)}
+        scores = np.array([lexicon[word][None] for word in self.words], dtype=float)
+        self.polarity = scores[:, 0]
+        self.subjectivity = scores[:, 1]
+        self.intensity = scores[:, 2]
+        self.is_modifier = np.array(['RB' in lexicon[word] for word in self.words])
+        self._split_words = {}
+        self._token_codes = {}
+
+    def tokenize(self, text):
+        """Lowercased tokens of a text, as TextBlob's sentiment sees them."""
+        text = (text or '').replace("n't", " n't")
+        for quote in QUOTES:
+            text = text.replace(quote, f' {quote} ')
+        text = re.sub(r'\n{2,}', ' ', text.replace('\r\n', '\n'))
+
+        split_words = self._split_words
+        if len(split_words) >= TOKEN_CACHE_SIZE:
+            split_words.clear()
+        tokens = []
+        for word in text.split():
+            if word not in split_words:
+                split_words[word] = split_word(word)
+            tokens.extend(split_words[word])
+
+        text = RE_SARCASM.sub('(!)', ' '.join(
+            token for token in tokens if token != END_OF_SENTENCE
+        ))
+        text = RE_EMOTICONS.sub(lambda match: match.group(1).replace(' ', '') + match.group(2), text)
+        return text.lower().split()
+
+    def get_token_code(self, token):
+        """
+        Lexicon ID of a known token, or ``-1 - flags`` for an unknown one.
+        """
+        code = self._token_codes.get(token)
+        if code is None:
+            if len(self._token_codes) >= TOKEN_CACHE_SIZE:
+                self._token_codes.clear()
+            code = self._token_codes[token] = self._classify(token)
+        return code
+
+    def _classify(self, token):
+        if token in self.vocabulary:
+            return self.vocabulary[token]
+
+        flags = 0
+        if token in NEGATIONS:
+            flags |= NEGATION
+        if len(token.strip("'")) <= 1:
+            flags |= KEEPS_NEGATION
+        if len(token) <= 2:
+            flags |= KEEPS_MODIFIER
+        if token == '!':
+            flags |= EXCLAMATION
+        if token == '(!)':
+            flags |= IRONY
+        # TextBlob tests PUNCTUATION as a string, so any run of it is excluded
+        if (
+            not token.isalpha() and len(token) <= 5 and token not in PUNCTUATION
+            and token in EMOTICON_POLARITY
+        ):
+            flags |= EMOTICON
+        return -1 - flags
+
+    def assess(self, tokens):
+        """
+        Apply TextBlob's assessment rules to one text's tokens.
+
+        Returns:
+            list: [polarity, subjectivity, intensity, negated] per assessment
+        """
+        assessments = []
+        modifier = None  # Lexicon ID of the preceding adverb
+        negated = False  # Whether a negation precedes
+
+        for token in tokens:
+            code = self.get_token_code(token)
+
+            if code >= 0:
+                polarity, subjectivity = self.polarity[code], self.subjectivity[code]
+                if modifier is None:
+                    assessments.append([polarity, subjectivity, self.intensity[code], False])
+                else:
+                    last = assessments[-1]
+                    last[0] = max(-1.0, min(polarity * last[2], 1.0))
+                    last[1] = max(-1.0, min(subjectivity * last[2], 1.0))
+                    last[2] = self.intensity[code]
+                if negated:
+                    assessments[-1][2] = 1.0 / assessments[-1][2]
+                    assessments[-1][3] = True
+                modifier = code if self.is_modifier[code] else None
+                negated = False
+                continue
+
+            flags = -1 - code
+            if flags & NEGATION:
+                negated = True
+            elif not flags & KEEPS_NEGATION:
+                negated = False
+            if negated and modifier is not None and self.words[modifier].endswith('ly'):
+                assessments[-1][3] = True
+                negated = False
+            elif not flags & KEEPS_MODIFIER:
+                modifier = None
+            if flags & EXCLAMATION and assessments:
+                assessments[-1][0] = max(-1.0, min(assessments[-1][0] * 1.25, 1.0))
+            if flags & IRONY:
+                assessments.append([0.0, 1.0, 1.0, False])
+            if flags & EMOTICON:
+                assessments.append([EMOTICON_POLARITY[token], 1.0, 1.0, False])
+
+        return assessments
+
+    def score(self, texts):
+        """
+        Score a batch of texts.
+
+        Returns:
+            tuple: (polarity, subjectivity) arrays with one entry per text
+        """
+        texts = list(texts)
+        polarities, subjectivities, text_index = [], [], []
+        for position, text in enumerate(texts):
+            for polarity, subjectivity, _, negated in self.assess(self.tokenize(text)):
+                # "not good" is slightly bad, "not bad" slightly good
+                polarities.append(polarity * -0.5 if negated else polarity)
+                subjectivities.append(subjectivity)
+                text_index.append(position)
+
+        counts = np.bincount(text_index, minlength=len(texts))
+        polarity_sums = np.bincount(text_index, weights=polarities, minlength=len(texts))
+        subjectivity_sums = np.bincount(text_index, weights=subjectivities, minlength=len(texts))
+        denominator = np.maximum(counts, 1)
+        return polarity_sums / denominator, subjectivity_sums / denominator
+
 
 class SentimentAnalyzer:
     """
-    Analyze sentiment of text using TextBlob.
-    
+    Analyze sentiment of text with a precompiled lexicon scorer.
+
+    Results are cached by a hash of the text content, so repeated texts
+    are never rescored.
+
     Used for:
     - Course reviews
     - Student feedback
     - Chat messages
     """
-    
+
+    def __init__(self):
+        self._scorer = None
+
+    @property
+    def scorer(self):
+        if self._scorer is None:
+            self._scorer = LexiconScorer()
+        return self._scorer
+
+    def get_cache_key(self, text):
+        """Cache key for the sentiment of a text."""
+        digest = hashlib.sha1((text or '').encode('utf-8')).hexdigest()
+        return f"sentiment:{SCORER_VERSION}:{digest}"
+
     def analyze(self, text):
         """
         Analyze sentiment of text.
-        
+
         Args:
             text: String to analyze
-        
+
         Returns:
             dict: Sentiment analysis results
         """
         try:
-            blob = TextBlob(text)
-            polarity = blob.sentiment.polarity  # -1 to 1
-            subjectivity = blob.sentiment.subjectivity  # 0 to 1
-            
-            # Classify sentiment
-            if polarity > 0.1:
-                label = 'positive'
-            elif polarity < -0.1:
-                label = 'negative'
-            else:
-                label = 'neutral'
-            
-            return {
-                'polarity': polarity,
-                'subjectivity': subjectivity,
-                'label': label,
-                'confidence': abs(polarity)
-            }
-        
+            return self.analyze_batch([text])[0]
         except Exception as e:
             logger.error(f"Sentiment analysis error: {str(e)}")
             return {
@@ -55,56 +326,83 @@ class SentimentAnalyzer:
                 'label': 'neutral',
                 'confidence': 0.0
             }
-    
+
     def analyze_batch(self, texts):
         """
         Analyze sentiment for multiple texts.
-        
+
+        Cached results are fetched in one round trip; only the misses are
+        scored, in a single vectorised pass.
+
         Args:
             texts: List of strings
-        
+
         Returns:
             list: List of sentiment analysis results
         """
-        return [self.analyze(text) for text in texts]
-    
-    def get_overall_sentiment(self, texts):
+        texts = list(texts)
+        keys = [self.get_cache_key(text) for text in texts]
+        cached = cache.get_many(keys)
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in cached:
+                missing.setdefault(key, text)
+
+        if missing:
+            polarities, subjectivities = self.scorer.score(missing.values())
+            scored = {}
+            for key, polarity, subjectivity in zip(missing, polarities, subjectivities):
+                scored[key] = {
+                    'polarity': float(polarity),
+                    'subjectivity': float(subjectivity),
+                    'label': classify_polarity(polarity),
+                    'confidence': abs(float(polarity))
+                }
+            cache.set_many(scored, SENTIMENT_CACHE_TIMEOUT)
+            cached.update(scored)
+
+        return [cached[key] for key in keys]
+
+    def summarize(self, results):
         """
-        Get overall sentiment from multiple texts.
-        
+        Aggregate already computed sentiment results.
+
         Args:
-            texts: List of strings
-        
+            results: Output of ``analyze_batch``
+
         Returns:
             dict: Aggregated sentiment
         """
-        results = self.analyze_batch(texts)
-        
         if not results:
             return {
                 'average_polarity': 0.0,
                 'average_subjectivity': 0.0,
                 'overall_label': 'neutral'
             }
-        
+
         avg_polarity = sum(r['polarity'] for r in results) / len(results)
         avg_subjectivity = sum(r['subjectivity'] for r in results) / len(results)
-        
-        # Classify overall sentiment
-        if avg_polarity > 0.1:
-            overall_label = 'positive'
-        elif avg_polarity < -0.1:
-            overall_label = 'negative'
-        else:
-            overall_label = 'neutral'
-        
+
         return {
             'average_polarity': avg_polarity,
             'average_subjectivity': avg_subjectivity,
-            'overall_label': overall_label,
+            'overall_label': classify_polarity(avg_polarity),
             'sample_count': len(results)
         }
 
+    def get_overall_sentiment(self, texts):
+        """
+        Get overall sentiment from multiple texts.
+
+        Args:
+            texts: List of strings
+
+        Returns:
+            dict: Aggregated sentiment
+        """
+        return self.summarize(self.analyze_batch(texts))
+
 
 # Singleton instance
-sentiment_analyzer = SentimentAnalyzer()
\ No newline at end of file
+sentiment_analyzer = SentimentAnalyzer()
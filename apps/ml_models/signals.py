@@ -0,0 +1,21 @@
+"""
+Signal handlers that keep the model registry in step with MLModel rows.
+"""
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.core.cache import cache
+from .models import MLModel
+from .registry import get_active_version_key
+
+
+@receiver([post_save, post_delete], sender=MLModel)
+def refresh_active_version(sender, instance, **kwargs):
+    """
+    Drop the cached active version so workers pick up the change.
+
+    The key is dropped once the transaction commits, so a concurrent read
+    cannot cache the old version again before the change is visible.
+    """
+    key = get_active_version_key(instance.model_type)
+    transaction.on_commit(lambda: cache.delete(key))
@@ -0,0 +1,236 @@
+"""
+Celery tasks for batch ML scoring and training.
+"""
+try:
+    from celery import shared_task
+except ImportError:
+    # Celery not installed, create dummy decorator
+    def shared_task(func):
+        return func
+
+from django.conf import settings
+from django.utils import timezone
+from .performance_predictor import performance_predictor
+from .learning_style_detector import LearningStyleDetector
+from .sentiment_analyzer import sentiment_analyzer
+import json
+import logging
+import subprocess
+import sys
+
+logger = logging.getLogger(__name__)
+
+COHORT_CHUNK_SIZE = 10000
+LEARNING_STYLE_SAMPLE_SIZE = 200000
+SENTIMENT_BATCH_SIZE = 5000
+SEARCH_TIMEOUT = 60 * 60 * 6  # 6 hours
+
+
+def score_cohort(user_ids, predictor=None):
+    """
+    Score a chunk of students and store the results on LearningAnalytics.
+    
+    Features are built with grouped queries, scored in one vectorised
+    call and written back with a single ``bulk_update``.
+    
+    Returns:
+        int: Number of analytics rows updated
+    """
+    from apps.users.models import User
+    from apps.analytics.models import LearningAnalytics
+    from .features import build_performance_features
+    
+    predictor = predictor or performance_predictor
+    features = build_performance_features(User.objects.filter(id__in=user_ids))
+    if features.empty:
+        return 0
+    
+    results = predictor.predict_batch(features.to_numpy())
+    at_risk = dict(zip(features.index, results['predictions'] == 'at_risk'))
+    # Probability of not being at risk, as a percentage
+    success_rates = dict(zip(features.index, (1 - results['probabilities'][:, 0]) * 100))
+    
+    now = timezone.now()
+    rows = list(LearningAnalytics.objects.filter(user_id__in=user_ids).only(
+        'id', 'user_id', 'at_risk', 'predicted_success_rate'
+    ))
+    for analytics in rows:
+        analytics.at_risk = bool(at_risk[analytics.user_id])
+        analytics.predicted_success_rate = float(success_rates[analytics.user_id])
+        analytics.last_updated = now
+    
+    LearningAnalytics.objects.bulk_update(
+        rows,
+        ['at_risk', 'predicted_success_rate', 'last_updated'],
+        batch_size=1000
+    )
+    return len(rows)
+
+
+@shared_task
+def score_students(chunk_size=COHORT_CHUNK_SIZE):
+    """Nightly at-risk scoring for every student with analytics."""
+    from apps.analytics.models import LearningAnalytics
+    
+    try:
+        user_ids = list(
+            LearningAnalytics.objects.filter(user__role='student').values_list('user_id', flat=True)
+        )
+        scored = 0
+        for start in range(0, len(user_ids), chunk_size):
+            scored += score_cohort(user_ids[start:start + chunk_size])
+        
+        logger.info(f"Scored {scored} students for performance risk")
+        return {'success': True, 'scored': scored}
+    except Exception as e:
+        logger.error(f"Cohort scoring failed: {str(e)}")
+        return {'success': False, 'error': str(e)}
+
+
+def backfill_model_sentiment(queryset, text_of, batch_size=SENTIMENT_BATCH_SIZE, rescore=False):
+    """
+    Score rows without a sentiment in batches and store the results.
+    
+    Args:
+        queryset: Rows with ``sentiment_score``/``sentiment_label`` fields
+        text_of: Callable returning the text to score for a row
+        batch_size: Rows scored and written per batch
+        rescore: Also rescore rows that already have a sentiment, e.g.
+            after ``SCORER_VERSION`` changes
+    
+    Returns:
+        int: Number of rows updated
+    """
+    model = queryset.model
+    updated = 0
+    last_pk = None
+    
+    while True:
+        batch = queryset.order_by('pk')
+        if not rescore:
+            batch = batch.filter(sentiment_score__isnull=True)
+        if last_pk is not None:
+            batch = batch.filter(pk__gt=last_pk)
+        rows = list(batch[:batch_size])
+        if not rows:
+            break
+        
+        results = sentiment_analyzer.analyze_batch([text_of(row) for row in rows])
+        for row, result in zip(rows, results):
+            row.sentiment_score = result['polarity']
+            row.sentiment_label = result['label']
+        model.objects.bulk_update(rows, ['sentiment_score', 'sentiment_label'], batch_size=1000)
+        
+        updated += len(rows)
+        last_pk = rows[-1].pk
+    
+    return updated
+
+
+@shared_task
+def backfill_sentiment(batch_size=SENTIMENT_BATCH_SIZE, rescore=False):
+    """
+    Populate sentiment for course reviews and student chat messages.
+    
+    With ``rescore``, rows already scored are refreshed too, e.g. after the
+    scorer changed.
+    """
+    from apps.courses.models import CourseReview
+    from apps.ai_tutor.models import ChatMessage
+    
+    try:
+        reviews = backfill_model_sentiment(
+            CourseReview.objects.only('id', 'title', 'comment'),
+            lambda review: f"{review.title}. {review.comment}",
+            batch_size,
+            rescore
+        )
+        messages = backfill_model_sentiment(
+            ChatMessage.objects.filter(role='user').only('id', 'content'),
+            lambda message: message.content,
+            batch_size,
+            rescore
+        )
+        logger.info(f"Sentiment backfilled for {reviews} reviews and {messages} messages")
+        return {'success': True, 'reviews': reviews, 'messages': messages}
+    except Exception as e:
+        logger.error(f"Sentiment backfill failed: {str(e)}")
+        return {'success': False, 'error': str(e)}
+
+
+@shared_task
+def train_learning_style_incremental(chunk_size=COHORT_CHUNK_SIZE, activate=True,
+                                     sample_size=LEARNING_STYLE_SAMPLE_SIZE):
+    """
+    Update the learning style model with students active since the last
+    checkpoint, then checkpoint and register it as a new version.
+    
+    The latest checkpoint is resumed and only its clusters are updated, so
+    the cost follows the number of active students and cluster indices
+    (and the learning styles mapped to them) are stable between versions.
+    Without a checkpoint, fresh estimators are fit on a sample of at most
+    ``sample_size`` students.
+    """
+    from .features import (
+        build_learning_style_features, get_users_active_since, iter_feature_chunks
+    )
+    
+    try:
+        detector = LearningStyleDetector()
+        watermark = detector.load_checkpoint()
+        today = timezone.localdate()
+        
+        if watermark is None:
+            chunks = iter_feature_chunks(
+                build_learning_style_features, chunk_size=chunk_size, sample_size=sample_size
+            )
+        else:
+            users = get_users_active_since(watermark)
+            if not users.exists():
+                return {'success': True, 'trained': 0}
+            chunks = iter_feature_chunks(
+                build_learning_style_features, users=users, chunk_size=chunk_size
+            )
+        trained = detector.train_incremental(chunks, resume=watermark is not None)
+        if not trained:
+            return {'success': True, 'trained': 0}
+        
+        checkpoint = detector.save_checkpoint(today, trained)
+        if activate:
+            checkpoint.activate()
+        return {'success': True, 'trained': trained, 'model_id': str(checkpoint.id)}
+    except Exception as e:
+        logger.error(f"Incremental learning style training failed: {str(e)}")
+        return {'success': False, 'error': str(e)}
+
+
+@shared_task
+def search_performance_hyperparameters(cv=None, activate=True):
+    """
+    Cross-validated hyperparameter search; registers the best model.
+    
+    Prefork workers are daemonic and joblib would run the whole search on
+    one core inside them, so the ``train_performance_model`` command runs
+    it in a separate process.
+    """
+    from .search import DEFAULT_CV_FOLDS
+    
+    command = [
+        sys.executable, str(settings.BASE_DIR / 'manage.py'), 'train_performance_model',
+        '--cv', str(cv or DEFAULT_CV_FOLDS), '--json',
+    ]
+    if not activate:
+        command.append('--no-activate')
+    
+    try:
+        completed = subprocess.run(
+            command, capture_output=True, text=True, check=True, timeout=SEARCH_TIMEOUT
+        )
+        return {'success': True, **json.loads(completed.stdout.strip().splitlines()[-1])}
+    except subprocess.CalledProcessError as e:
+        error = e.stderr.strip().splitlines()[-1] if e.stderr.strip() else str(e)
+        logger.error(f"Performance hyperparameter search failed: {error}")
+        return {'success': False, 'error': error}
+    except Exception as e:
+        logger.error(f"Performance hyperparameter search failed: {str(e)}")
+        return {'success': False, 'error': str(e)}
@@ -8,6 +8,8 @@ from backend.utils import success_response, error_response
 from .learning_style_detector import learning_style_detector
 from .performance_predictor import performance_predictor
 from .sentiment_analyzer import sentiment_analyzer
+from .registry import ModelNotTrainedError
+from .prediction_cache import get_cached_prediction
 import logging
 
 logger = logging.getLogger(__name__)
@@ -28,12 +30,13 @@ def predict_learning_style(request):
             )
         
         # Predict learning style
-        predicted_style = learning_style_detector.predict(user_data)
-        
-        # Update user's learning style
         user = request.user
-        user.learning_style = predicted_style
-        user.save()
+        predicted_style = get_cached_prediction(learning_style_detector, user.id, user_data)
+        
+        # Update user's learning style only when it changed
+        if user.learning_style != predicted_style:
+            user.learning_style = predicted_style
+            user.save(update_fields=['learning_style'])
         
         return success_response(
             data={
@@ -43,6 +46,12 @@ def predict_learning_style(request):
             message="Learning style predicted successfully"
         )
     
+    except ModelNotTrainedError as e:
+        return error_response(
+            message="Learning style model is not available",
+            details=str(e),
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE
+        )
     except Exception as e:
         logger.error(f"Learning style prediction error: {str(e)}")
         return error_response(
@@ -57,20 +66,25 @@ def predict_learning_style(request):
 def predict_performance(request):
     """Predict student performance and identify at-risk students."""
     try:
-        student_data = request.data
-        
         # Add user's current data
         user = request.user
+        student_data = dict(request.data.items())
         student_data['learning_style'] = user.learning_style
         
         # Predict performance
-        prediction = performance_predictor.predict(student_data)
+        prediction = get_cached_prediction(performance_predictor, user.id, student_data)
         
         return success_response(
             data=prediction,
             message="Performance predicted successfully"
         )
     
+    except ModelNotTrainedError as e:
+        return error_response(
+            message="Performance model is not available",
+            details=str(e),
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE
+        )
     except Exception as e:
         logger.error(f"Performance prediction error: {str(e)}")
         return error_response(
@@ -130,7 +144,7 @@ def get_model_info(request):
             },
             'sentiment_analyzer': {
                 'name': 'Sentiment Analyzer',
-                'algorithm': 'TextBlob NLP',
+                'algorithm': 'Lexicon scorer (TextBlob lexicon)',
                 'output': 'polarity and subjectivity scores'
             }
         }
@@ -3,6 +3,7 @@ Celery configuration for AI Tutor project.
 """
 import os
 from celery import Celery
+from celery.signals import worker_process_init
 
 # Set the default Django settings module for the 'celery' program.
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
@@ -17,6 +18,13 @@ app.config_from_object('django.conf:settings', namespace='CELERY')
 app.autodiscover_tasks()
 
 
+@worker_process_init.connect
+def warm_ml_models(**kwargs):
+    """Load active ML model artefacts when a worker process starts."""
+    from apps.ml_models.registry import model_registry
+    model_registry.warm()
+
+
 @app.task(bind=True, ignore_result=True)
 def debug_task(self):
     """Debug task for testing Celery configuration."""
@@ -249,6 +249,8 @@ if os.getenv("PYTEST_CURRENT_TEST") or config("DJONGO_DISABLED", default=False,
             "TIMEOUT": 300,
         }
     }
+    # No Redis buffers available: fold analytics events inline
+    ANALYTICS_EVENTS_EAGER = True
 else:
     CACHES = {
         "default": {
@@ -270,6 +272,7 @@ else:
             "TIMEOUT": 300,  # Default timeout: 5 minutes
         }
     }
+    ANALYTICS_EVENTS_EAGER = config("ANALYTICS_EVENTS_EAGER", default=False, cast=bool)
 
 # Session cache
 SESSION_ENGINE = "django.contrib.sessions.backends.cache"
@@ -287,6 +290,63 @@ CELERY_TASK_TIME_LIMIT = 30 * 60  # 30 minutes
 CELERY_WORKER_PREFETCH_MULTIPLIER = 4
 CELERY_WORKER_MAX_TASKS_PER_CHILD = 1000
 
+# Periodic tasks (run with: celery -A backend beat)
+CELERY_BEAT_SCHEDULE = {
+    "process-analytics-events": {
+        "task": "apps.analytics.tasks.process_analytics_events",
+        "schedule": 5.0,  # seconds
+    },
+    "ingest-activities": {
+        "task": "apps.analytics.tasks.ingest_activities",
+        "schedule": 2.0,  # seconds
+    },
+    "refresh-course-analytics": {
+        "task": "apps.analytics.tasks.refresh_course_analytics",
+        "schedule": 60.0 * 15,  # every 15 minutes
+    },
+    "purge-activities": {
+        "task": "apps.analytics.tasks.purge_activities",
+        "schedule": 60.0 * 60 * 24,  # daily
+    },
+    "export-analytics-parquet": {
+        "task": "apps.analytics.tasks.export_analytics_parquet",
+        "schedule": 60.0 * 60 * 24,  # daily
+    },
+    "score-students": {
+        "task": "apps.ml_models.tasks.score_students",
+        "schedule": 60.0 * 60 * 24,  # nightly
+    },
+    "backfill-sentiment": {
+        "task": "apps.ml_models.tasks.backfill_sentiment",
+        "schedule": 60.0 * 60,  # hourly
+    },
+    "snapshot-leaderboards": {
+        "task": "apps.gamification.tasks.snapshot_leaderboards",
+        "schedule": 60.0 * 5,  # every 5 minutes
+    },
+    "reconcile-point-balances": {
+        "task": "apps.gamification.tasks.reconcile_point_balances",
+        "schedule": 60.0 * 60 * 24,  # daily
+    },
+    "recompute-user-levels": {
+        "task": "apps.gamification.tasks.recompute_user_levels",
+        "schedule": 60.0 * 60 * 24,  # daily
+    },
+    "train-learning-style": {
+        "task": "apps.ml_models.tasks.train_learning_style_incremental",
+        "schedule": 60.0 * 60 * 24,  # daily
+    },
+}
+
+# Raw UserActivity rows older than this are purged; daily rollups are kept
+ACTIVITY_RETENTION_DAYS = config("ACTIVITY_RETENTION_DAYS", default=90, cast=int)
+
+# Root directory for incremental Parquet exports of analytics tables
+ANALYTICS_EXPORT_DIR = config("ANALYTICS_EXPORT_DIR", default=str(BASE_DIR / "exports"))
+# Exports stop this many seconds before now so rows saved by transactions
+# still in flight are picked up by the next run instead of being skipped
+ANALYTICS_EXPORT_LAG = config("ANALYTICS_EXPORT_LAG", default=300, cast=int)
+
 # Email Configuration
 EMAIL_BACKEND = config(
     "EMAIL_BACKEND", default="django.core.mail.backends.console.EmailBackend"
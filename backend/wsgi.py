@@ -9,3 +9,20 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
 
 application = get_wsgi_application()
+
+# Load active ML model artefacts before the first request. With
+# ``gunicorn --preload`` this happens once in the master and the
+# memory-mapped arrays are shared by every forked worker.
+from apps.ml_models.registry import model_registry  # noqa: E402
+from django.core.cache import cache  # noqa: E402
+from django.db import connections  # noqa: E402
+
+model_registry.warm()
+
+# Warming opened a database and a cache connection. Close them so forked
+# workers open their own instead of sharing the master's sockets.
+connections.close_all()
+cache.close()
+# django-redis only drops its pools on close() with CLOSE_CONNECTION set
+if hasattr(getattr(cache, 'client', None), 'do_close_clients'):
+    cache.client.do_close_clients()
@@ -3,6 +3,7 @@ Pytest configuration and fixtures for testing.
 """
 import pytest
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from rest_framework.test import APIClient
 from apps.courses.models import Course, Lesson
 from apps.assessments.models import Quiz, Question
@@ -12,6 +13,12 @@ import random
 User = get_user_model()
 
 
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Start every test with an empty cache (rule indexes, open leaderboards)."""
+    cache.clear()
+
+
 @pytest.fixture
 def api_client():
     """Return API client for testing."""
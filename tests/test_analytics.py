@@ -0,0 +1,698 @@
+"""
+Tests for analytics dashboards and activity tracking.
+"""
+import json
+import pandas as pd
+import pytest
+import uuid
+from datetime import timedelta
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import OperationalError, connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+from apps.users.models import User
+from apps.courses.models import Enrollment, LessonProgress
+from apps.assessments.models import Quiz, QuizAttempt
+from apps.analytics.models import (
+    UserActivity, DailyActivityRollup, LearningAnalytics, CourseAnalytics
+)
+from apps.analytics import dashboard, ingestion, pipeline
+from apps.analytics.course_analytics import materialize_course_analytics
+from apps.analytics.rollups import increment_rollups, purge_expired_activities
+from apps.analytics.export import export_analytics
+from apps.ai_tutor.models import ChatMessage
+
+
+class FakeListRedis:
+    """In-memory stand-in for the Redis list and sorted set commands the buffers use."""
+    
+    def __init__(self):
+        self.lists = {}
+        self.zsets = {}
+    
+    def rpush(self, key, *values):
+        self.lists.setdefault(key, []).extend(
+            value.encode() if isinstance(value, str) else value for value in values
+        )
+        return len(self.lists[key])
+    
+    def lmove(self, source, destination, src='LEFT', dest='RIGHT'):
+        values = self.lists.get(source)
+        if not values:
+            return None
+        value = values.pop(0)
+        if not values:
+            # Redis deletes emptied lists
+            del self.lists[source]
+        self.lists.setdefault(destination, []).append(value)
+        return value
+    
+    def lrange(self, key, start, stop):
+        values = self.lists.get(key, [])
+        return values[start:] if stop == -1 else values[start:stop + 1]
+    
+    def llen(self, key):
+        return len(self.lists.get(key, []))
+    
+    def delete(self, key):
+        return int(self.lists.pop(key, None) is not None)
+    
+    def zadd(self, key, mapping):
+        self.zsets.setdefault(key, {}).update(mapping)
+    
+    def zrem(self, key, member):
+        member = member.decode() if isinstance(member, bytes) else member
+        return int(self.zsets.get(key, {}).pop(member, None) is not None)
+    
+    def zrangebyscore(self, key, low, high):
+        return [
+            member.encode() for member, score in sorted(self.zsets.get(key, {}).items())
+            if low <= score <= high
+        ]
+    
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.calls = []
+    
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self.calls.append((name, args, kwargs))
+        return queue
+    
+    def execute(self):
+        calls, self.calls = self.calls, []
+        return [getattr(self.client, name)(*args, **kwargs) for name, args, kwargs in calls]
+
+
+@pytest.fixture
+def fake_buffer(settings, monkeypatch):
+    """Buffer events in an in-memory Redis instead of folding them inline."""
+    settings.ANALYTICS_EVENTS_EAGER = False
+    client = FakeListRedis()
+    monkeypatch.setattr(pipeline, '_redis_client', client)
+    return client
+
+
+@pytest.mark.django_db
+class TestStudentDashboard:
+    """Test the materialised student dashboard."""
+    
+    def test_dashboard_served_from_cache(self, authenticated_client):
+        """Test repeated dashboard reads do not touch the database."""
+        authenticated_client.get('/api/analytics/dashboard/student/')
+        
+        with CaptureQueriesContext(connection) as queries:
+            response = authenticated_client.get('/api/analytics/dashboard/student/')
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert 'user_info' in response.data['data']
+        assert len(queries) == 0
+    
+    def test_dashboard_patched_by_events(self, authenticated_client, student_user, course):
+        """Test enrollments and activity update the cached dashboard."""
+        authenticated_client.get('/api/analytics/dashboard/student/')
+        
+        Enrollment.objects.create(student=student_user, course=course)
+        UserActivity.objects.create(user=student_user, activity_type='course_view')
+        
+        data = authenticated_client.get('/api/analytics/dashboard/student/').data['data']
+        assert data['enrollments']['total'] == 1
+        assert data['enrollments']['active'] == 1
+        assert data['weekly_activity'] == [{'activity_type': 'course_view', 'count': 1}]
+    
+    def test_concurrent_updates_not_lost(self, authenticated_client, student_user, course):
+        """Test counters survive a concurrent writer replacing the document."""
+        authenticated_client.get('/api/analytics/dashboard/student/')
+        stale = cache.get(dashboard.get_dashboard_key(student_user.id))
+        
+        UserActivity.objects.create(user=student_user, activity_type='course_view')
+        Enrollment.objects.create(student=student_user, course=course)
+        cache.set(dashboard.get_dashboard_key(student_user.id), stale)
+        
+        with CaptureQueriesContext(connection) as queries:
+            data = authenticated_client.get('/api/analytics/dashboard/student/').data['data']
+        assert data['enrollments']['total'] == 1
+        assert data['weekly_activity'] == [{'activity_type': 'course_view', 'count': 1}]
+        assert len(queries) == 0
+    
+    def test_evicted_counter_rebuilds(self, authenticated_client, student_user, course):
+        """Test a missing counter makes the dashboard rebuild from the database."""
+        authenticated_client.get('/api/analytics/dashboard/student/')
+        Enrollment.objects.create(student=student_user, course=course)
+        cache.delete(dashboard.get_enrollment_count_key(student_user.id, 'total'))
+        
+        data = authenticated_client.get('/api/analytics/dashboard/student/').data['data']
+        assert data['enrollments']['total'] == 1
+
+
+@pytest.mark.django_db
+class TestAnalyticsPipeline:
+    """Test the event-driven LearningAnalytics pipeline."""
+    
+    def test_quiz_events_keep_running_average(self, student_user):
+        """Test quiz completions fold into a running average."""
+        pipeline.record_event(student_user.id, 'quiz_completed', score=80, passed=True)
+        pipeline.record_event(student_user.id, 'quiz_completed', score=50, passed=False)
+        
+        analytics = LearningAnalytics.objects.get(user=student_user)
+        assert analytics.quizzes_taken == 2
+        assert analytics.quizzes_passed == 1
+        assert analytics.average_quiz_score == pytest.approx(65.0)
+        assert analytics.current_streak == 1
+        assert analytics.active_days == 1
+    
+    def test_fold_events_advances_streak(self, student_user):
+        """Test events on consecutive days extend the streak."""
+        today = timezone.now()
+        events = [
+            {
+                'user_id': str(student_user.id),
+                'type': 'lesson_progress',
+                'timestamp': (today - timedelta(days=offset)).isoformat(),
+                'time_spent': 90,
+                'lessons_completed': 1,
+            }
+            for offset in (2, 1, 0)
+        ]
+        
+        pipeline.fold_events(events)
+        
+        analytics = LearningAnalytics.objects.get(user=student_user)
+        assert analytics.current_streak == 3
+        assert analytics.longest_streak == 3
+        assert analytics.total_study_seconds == 270
+        assert analytics.total_study_time == 4
+        assert analytics.lessons_completed == 3
+    
+    def test_enrollment_and_activity_emit_events(self, student_user, course):
+        """Test domain writes feed the pipeline."""
+        Enrollment.objects.create(student=student_user, course=course)
+        UserActivity.objects.create(user=student_user, activity_type='content_generation')
+        
+        analytics = LearningAnalytics.objects.get(user=student_user)
+        assert analytics.courses_enrolled == 1
+        assert analytics.ai_content_generated == 1
+
+    
+    def test_course_completion_counted(self, student_user, course):
+        """Test completing, reopening and removing enrollments adjust the counters."""
+        enrollment = Enrollment.objects.create(student=student_user, course=course)
+        enrollment.status = 'completed'
+        enrollment.save()
+        
+        analytics = LearningAnalytics.objects.get(user=student_user)
+        assert (analytics.courses_enrolled, analytics.courses_completed) == (1, 1)
+        
+        enrollment.save()
+        enrollment.status = 'active'
+        enrollment.save()
+        assert LearningAnalytics.objects.get(user=student_user).courses_completed == 0
+        
+        enrollment.status = 'completed'
+        enrollment.save()
+        enrollment.delete()
+        analytics = LearningAnalytics.objects.get(user=student_user)
+        assert (analytics.courses_enrolled, analytics.courses_completed) == (0, 0)
+    
+    def test_events_folded_once(self, student_user):
+        """Test an event delivered twice is only counted once."""
+        event = {
+            'id': str(uuid.uuid4()),
+            'user_id': str(student_user.id),
+            'type': 'chat_message',
+            'timestamp': timezone.now().isoformat(),
+        }
+        
+        pipeline.fold_events([event, event])
+        pipeline.fold_events([event])
+        
+        assert LearningAnalytics.objects.get(user=student_user).chat_messages_sent == 1
+
+@pytest.mark.django_db
+class TestEventBuffer:
+    """Test buffered events are only removed once folded."""
+    
+    def fail_for(self, monkeypatch, user):
+        apply_event = pipeline.apply_event
+        
+        def failing(analytics, event):
+            if event['user_id'] == str(user.id):
+                raise RuntimeError('boom')
+            apply_event(analytics, event)
+        
+        monkeypatch.setattr(pipeline, 'apply_event', failing)
+    
+    def test_batches_acknowledged_after_fold(self, fake_buffer, student_user):
+        """Test folded batches leave nothing in the buffer or in flight."""
+        pipeline.record_event(student_user.id, 'chat_message')
+        pipeline.record_event(student_user.id, 'chat_message')
+        assert not LearningAnalytics.objects.filter(user=student_user, chat_messages_sent__gt=0).exists()
+        
+        assert pipeline.process_buffered_events(batch_size=1) == 2
+        
+        assert LearningAnalytics.objects.get(user=student_user).chat_messages_sent == 2
+        assert fake_buffer.lists == {}
+        assert fake_buffer.zsets[pipeline.get_inflight_key(pipeline.EVENTS_KEY)] == {}
+    
+    def test_failed_users_retried_then_dead_lettered(self, fake_buffer, monkeypatch,
+                                                     student_user, teacher_user):
+        """Test a failing user's events are retried, not dropped."""
+        self.fail_for(monkeypatch, teacher_user)
+        pipeline.record_event(student_user.id, 'chat_message')
+        pipeline.record_event(teacher_user.id, 'chat_message')
+        
+        assert pipeline.process_buffered_events(max_batches=1) == 1
+        
+        assert LearningAnalytics.objects.get(user=student_user).chat_messages_sent == 1
+        assert fake_buffer.llen(pipeline.EVENTS_KEY) == 1
+        
+        for _ in range(pipeline.MAX_EVENT_ATTEMPTS - 1):
+            pipeline.process_buffered_events()
+        
+        assert fake_buffer.llen(pipeline.EVENTS_KEY) == 0
+        assert fake_buffer.llen(pipeline.get_dead_letter_key(pipeline.EVENTS_KEY)) == 1
+    
+    def test_stale_batches_requeued(self, fake_buffer, student_user):
+        """Test a batch claimed by a worker that died is folded later."""
+        pipeline.record_event(student_user.id, 'chat_message')
+        pipeline.claim_events(pipeline.EVENTS_KEY, 10)
+        
+        assert pipeline.process_buffered_events() == 0
+        assert pipeline.requeue_stale_batches(pipeline.EVENTS_KEY, timeout=0) == 1
+        assert pipeline.process_buffered_events() == 1
+        assert LearningAnalytics.objects.get(user=student_user).chat_messages_sent == 1
+    
+    def test_batch_folded_before_crash_not_recounted(self, fake_buffer, student_user):
+        """Test a requeued batch that was already folded is not counted again."""
+        pipeline.record_event(student_user.id, 'chat_message')
+        batch_key, events = pipeline.claim_events(pipeline.EVENTS_KEY, 10)
+        # The worker folds the batch, then dies before acknowledging it
+        pipeline.fold_events(events)
+        
+        assert pipeline.requeue_stale_batches(pipeline.EVENTS_KEY, timeout=0) == 1
+        assert pipeline.process_buffered_events() == 1
+        assert LearningAnalytics.objects.get(user=student_user).chat_messages_sent == 1
+    
+    def test_fold_keeps_risk_scores(self, monkeypatch, student_user):
+        """Test folding only writes the fields it maintains."""
+        LearningAnalytics.objects.get_or_create(user=student_user)
+        apply_event = pipeline.apply_event
+        
+        def score_meanwhile(analytics, event):
+            LearningAnalytics.objects.filter(user=student_user).update(
+                at_risk=True, predicted_success_rate=0.2
+            )
+            apply_event(analytics, event)
+        
+        monkeypatch.setattr(pipeline, 'apply_event', score_meanwhile)
+        pipeline.record_event(student_user.id, 'chat_message')
+        
+        analytics = LearningAnalytics.objects.get(user=student_user)
+        assert (analytics.at_risk, analytics.predicted_success_rate) == (True, 0.2)
+        assert analytics.chat_messages_sent == 1
+    
+    def test_chat_message_does_not_refetch_session(self, chat_session):
+        """Test counting a message reuses its loaded session."""
+        with CaptureQueriesContext(connection) as queries:
+            ChatMessage.objects.create(session=chat_session, role='user', content='Hi')
+        
+        assert not [query for query in queries if 'FROM "chat_sessions"' in query['sql']]
+        assert LearningAnalytics.objects.get(user=chat_session.user).chat_messages_sent == 1
+
+
+@pytest.mark.django_db
+class TestTeacherDashboard:
+    """Test the aggregated teacher dashboard."""
+    
+    def test_query_count_independent_of_courses(self, teacher_client, bulk_courses, student_user):
+        """Test the dashboard is built with a constant number of queries."""
+        for course in bulk_courses[:10]:
+            Enrollment.objects.create(student=student_user, course=course, progress_percentage=40)
+        cache.clear()
+        
+        with CaptureQueriesContext(connection) as queries:
+            response = teacher_client.get('/api/analytics/dashboard/teacher/')
+        
+        assert response.status_code == status.HTTP_200_OK
+        data = response.data['data']
+        assert data['summary'] == {
+            'total_courses': 50,
+            'total_students': 1,
+            'total_enrollments': 10,
+        }
+        assert sum(course['active_students'] for course in data['courses']) == 10
+        assert len(queries) <= 6
+    
+    def test_enrollment_invalidates_dashboard(self, teacher_client, course, student_user):
+        """Test new enrollments show up on the cached dashboard."""
+        teacher_client.get('/api/analytics/dashboard/teacher/')
+        
+        Enrollment.objects.create(student=student_user, course=course)
+        
+        data = teacher_client.get('/api/analytics/dashboard/teacher/').data['data']
+        assert data['summary']['total_enrollments'] == 1
+        assert data['courses'][0]['total_students'] == 1
+    
+    def test_lesson_completion_invalidates_dashboard(self, teacher_client, course, lesson,
+                                                     student_user):
+        """Test completed lessons update the cached average progress."""
+        Enrollment.objects.create(student=student_user, course=course)
+        teacher_client.get('/api/analytics/dashboard/teacher/')
+        
+        student_client = APIClient()
+        student_client.force_authenticate(user=student_user)
+        student_client.post(
+            f'/api/courses/lessons/{lesson.id}/progress/',
+            {'time_spent': 60, 'completion_percentage': 100}
+        )
+        
+        data = teacher_client.get('/api/analytics/dashboard/teacher/').data['data']
+        assert data['courses'][0]['average_progress'] == 100.0
+    
+    def test_enrollment_signal_reads_only_instructor(self, course, student_user):
+        """Test the instructor lookup never loads the whole course."""
+        with CaptureQueriesContext(connection) as queries:
+            enrollment = Enrollment.objects.create(student=student_user, course=course)
+        assert not any('FROM "courses"' in query['sql'] for query in queries)
+        
+        enrollment = Enrollment.objects.get(pk=enrollment.pk)
+        enrollment.status = 'dropped'
+        with CaptureQueriesContext(connection) as queries:
+            enrollment.save()
+        course_queries = [query['sql'] for query in queries if 'FROM "courses"' in query['sql']]
+        assert len(course_queries) == 1
+        assert '"courses"."title"' not in course_queries[0]
+
+
+@pytest.fixture
+def graded_course(course, teacher_user):
+    """A course with enrollments across the progress range and quiz attempts."""
+    quiz = Quiz.objects.create(
+        title='Stats Quiz',
+        description='Quiz with attempts',
+        course=course,
+        created_by=teacher_user,
+        difficulty='beginner',
+        is_published=True
+    )
+    for index, progress in enumerate([0, 10, 30, 55, 100]):
+        student = User.objects.create_user(
+            email=f'stats{index}@test.com',
+            password='testpass123',
+            full_name=f'Stats {index}',
+            role='student'
+        )
+        Enrollment.objects.create(
+            student=student,
+            course=course,
+            progress_percentage=progress,
+            status='completed' if progress == 100 else 'active'
+        )
+        QuizAttempt.objects.create(
+            quiz=quiz,
+            student=student,
+            status='completed',
+            score=progress,
+            passed=progress >= 50
+        )
+    return course
+
+
+@pytest.mark.django_db
+class TestCourseAnalytics:
+    """Test the course analytics engine."""
+    
+    def test_course_analytics_histogram(self, teacher_client, graded_course):
+        """Test the default histogram and quiz stats."""
+        response = teacher_client.get(f'/api/analytics/course/{graded_course.id}/')
+        
+        assert response.status_code == status.HTTP_200_OK
+        data = response.data['data']
+        assert data['progress_distribution'] == {
+            '0-25%': 2, '25-50%': 1, '50-75%': 1, '75-100%': 1,
+        }
+        assert data['enrollment_stats']['completion_rate'] == 20
+        assert data['quiz_performance'] == [{
+            'quiz_title': 'Stats Quiz',
+            'total_attempts': 5,
+            'average_score': 39,
+            'pass_rate': 40,
+        }]
+    
+    def test_custom_bucket_size(self, teacher_client, graded_course):
+        """Test arbitrary bucket sizes, with the last bucket clipped."""
+        response = teacher_client.get(
+            f'/api/analytics/course/{graded_course.id}/', {'bucket_size': 30}
+        )
+        
+        assert response.data['data']['progress_distribution'] == {
+            '0-30%': 2, '30-60%': 2, '60-90%': 0, '90-100%': 1,
+        }
+    
+    def test_invalid_bucket_size(self, teacher_client, graded_course):
+        """Test bucket sizes outside 1-100 are rejected."""
+        response = teacher_client.get(
+            f'/api/analytics/course/{graded_course.id}/', {'bucket_size': 0}
+        )
+        
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+    
+    def test_materialize_course_analytics(self, graded_course):
+        """Test scheduled materialisation into CourseAnalytics."""
+        assert materialize_course_analytics() == 1
+        
+        analytics = CourseAnalytics.objects.get(course=graded_course)
+        assert analytics.total_enrollments == 5
+        assert analytics.active_students == 4
+        assert analytics.completion_rate == 20
+        assert analytics.average_progress == pytest.approx(39)
+        assert analytics.pass_rate == 40
+
+
+@pytest.mark.django_db
+class TestActivityIngestion:
+    """Test buffered activity logging."""
+    
+    def test_log_activity_batch(self, authenticated_client, student_user):
+        """Test a batch of events is written in bulk and fanned out."""
+        events = [
+            {'activity_type': 'lesson_view', 'metadata': {'lesson': index}}
+            for index in range(3)
+        ] + [{'activity_type': 'content_generation'}]
+        
+        response = authenticated_client.post(
+            '/api/analytics/activity/log/', {'events': events}, format='json'
+        )
+        
+        assert response.status_code == status.HTTP_200_OK
+        activity_ids = response.data['data']['activity_ids']
+        assert len(activity_ids) == 4
+        assert UserActivity.objects.filter(id__in=activity_ids).count() == 4
+        analytics = LearningAnalytics.objects.get(user=student_user)
+        assert analytics.ai_content_generated == 1
+    
+    def test_log_activity_rejects_unknown_type(self, authenticated_client):
+        """Test events are validated before they are buffered."""
+        response = authenticated_client.post(
+            '/api/analytics/activity/log/',
+            {'events': [{'activity_type': 'not_a_type'}]},
+            format='json'
+        )
+        
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert UserActivity.objects.count() == 0
+    
+    def buffer(self, user, count, **fields):
+        return ingestion.enqueue_activities(user.id, [
+            {'activity_type': 'lesson_view', **fields} for _ in range(count)
+        ])
+    
+    def test_bad_records_isolated(self, fake_buffer, student_user):
+        """Test deleted users and duplicate IDs do not block their batch."""
+        good = self.buffer(student_user, 3)
+        ghost = User(id=uuid.uuid4())
+        orphan = self.buffer(ghost, 1)
+        record = json.loads(fake_buffer.lists[ingestion.ACTIVITIES_KEY][0])
+        fake_buffer.rpush(ingestion.ACTIVITIES_KEY, json.dumps({**record, 'description': 'dup'}))
+        
+        assert ingestion.drain_activity_buffer() == 3
+        
+        assert set(map(str, UserActivity.objects.values_list('id', flat=True))) == set(good)
+        dead = fake_buffer.lrange(pipeline.get_dead_letter_key(ingestion.ACTIVITIES_KEY), 0, -1)
+        assert [json.loads(raw)['id'] for raw in dead] == orphan
+        # The duplicate is skipped as already written on the retry
+        assert ingestion.drain_activity_buffer() == 0
+        assert fake_buffer.llen(ingestion.ACTIVITIES_KEY) == 0
+    
+    def test_fan_out_failure_not_replayed(self, fake_buffer, monkeypatch, student_user):
+        """Test committed rows are acknowledged even if fanning out fails."""
+        self.buffer(student_user, 2)
+        
+        def fail(*args, **kwargs):
+            raise RuntimeError('cache down')
+        
+        monkeypatch.setattr('apps.analytics.dashboard.record_activities', fail)
+        
+        assert ingestion.drain_activity_buffer() == 2
+        assert UserActivity.objects.count() == 2
+        assert fake_buffer.llen(ingestion.ACTIVITIES_KEY) == 0
+    
+    def test_stale_batches_requeued(self, fake_buffer, student_user):
+        """Test a batch claimed by a worker that died is written by a later drain."""
+        ids = self.buffer(student_user, 2)
+        batch_key, _ = pipeline.claim_events(ingestion.ACTIVITIES_KEY, 10)
+        
+        assert ingestion.drain_activity_buffer() == 0
+        # Age the claim past the processing timeout
+        fake_buffer.zsets[pipeline.get_inflight_key(ingestion.ACTIVITIES_KEY)][batch_key] = 0
+        
+        assert ingestion.drain_activity_buffer() == 2
+        assert set(map(str, UserActivity.objects.values_list('id', flat=True))) == set(ids)
+        assert fake_buffer.llen(batch_key) == 0
+    
+    def test_failed_fold_retried(self, fake_buffer, monkeypatch, student_user):
+        """Test analytics events whose fold failed go to the event buffer."""
+        self.buffer(student_user, 1, activity_type='content_generation')
+        apply_event = pipeline.apply_event
+        
+        def fail(analytics, event):
+            raise RuntimeError('boom')
+        
+        monkeypatch.setattr(pipeline, 'apply_event', fail)
+        assert ingestion.drain_activity_buffer() == 1
+        assert fake_buffer.llen(pipeline.EVENTS_KEY) == 1
+        
+        monkeypatch.setattr(pipeline, 'apply_event', apply_event)
+        assert pipeline.process_buffered_events() == 1
+        assert LearningAnalytics.objects.get(user=student_user).ai_content_generated == 1
+    
+    def test_failed_insert_retried(self, fake_buffer, monkeypatch, student_user):
+        """Test a batch whose insert rolls back is handed back to the buffer."""
+        self.buffer(student_user, 2)
+        
+        def fail(*args, **kwargs):
+            raise OperationalError('database is down')
+        
+        monkeypatch.setattr('apps.analytics.rollups.increment_rollups', fail)
+        
+        with pytest.raises(OperationalError):
+            ingestion.drain_activity_buffer()
+        assert UserActivity.objects.count() == 0
+        assert fake_buffer.llen(ingestion.ACTIVITIES_KEY) == 2
+
+
+@pytest.mark.django_db
+class TestActivityRollups:
+    """Test daily activity rollups and raw activity retention."""
+    
+    def test_activity_rolled_up_per_day_and_type(self, student_user):
+        """Test activities increment a single counter per day and type."""
+        for _ in range(3):
+            UserActivity.objects.create(user=student_user, activity_type='lesson_view')
+        UserActivity.objects.create(user=student_user, activity_type='login')
+        
+        counts = dict(
+            DailyActivityRollup.objects.filter(user=student_user).values_list('activity_type', 'count')
+        )
+        assert counts == {'lesson_view': 3, 'login': 1}
+    
+    def test_batch_query_count_independent_of_size(self, student_user, teacher_user):
+        """Test a batch of activities is rolled up with a constant number of queries."""
+        now = timezone.now()
+        
+        def batch(activity_types):
+            return [
+                UserActivity(user=user, activity_type=activity_type, created_at=now)
+                for user in (student_user, teacher_user)
+                for activity_type in activity_types
+            ]
+        
+        with CaptureQueriesContext(connection) as small:
+            increment_rollups(batch(['login']))
+        with CaptureQueriesContext(connection) as large:
+            increment_rollups(batch(['login', 'course_view', 'lesson_view', 'quiz_attempt']))
+        
+        assert len(large) == len(small)
+        counts = dict(
+            DailyActivityRollup.objects.filter(user=teacher_user).values_list('activity_type', 'count')
+        )
+        assert counts == {'login': 2, 'course_view': 1, 'lesson_view': 1, 'quiz_attempt': 1}
+    
+    def test_purge_keeps_rollups_for_dashboard(self, authenticated_client, student_user):
+        """Test expired raw rows are deleted while the dashboard still counts them."""
+        UserActivity.objects.create(user=student_user, activity_type='course_view')
+        
+        assert purge_expired_activities(retention_days=0) == 1
+        assert UserActivity.objects.count() == 0
+        
+        cache.clear()
+        data = authenticated_client.get('/api/analytics/dashboard/student/').data['data']
+        assert data['weekly_activity'] == [{'activity_type': 'course_view', 'count': 1}]
+
+
+@pytest.mark.django_db
+class TestAnalyticsExport:
+    """Test incremental Parquet exports."""
+    
+    def test_export_is_incremental(self, student_user, tmp_path):
+        """Test a second run only exports rows newer than the watermark."""
+        UserActivity.objects.create(user=student_user, activity_type='login')
+        
+        assert export_analytics(
+            ['user_activities'], output_dir=tmp_path, lag=timedelta(0)
+        ) == {'user_activities': 1}
+        
+        UserActivity.objects.create(user=student_user, activity_type='course_view')
+        assert export_analytics(
+            ['user_activities'], output_dir=tmp_path, lag=timedelta(0)
+        ) == {'user_activities': 1}
+        
+        frame = pd.read_parquet(tmp_path / 'user_activities')
+        assert sorted(frame['activity_type']) == ['course_view', 'login']
+    
+    def test_modified_rows_exported_again(self, student_user, course, lesson, tmp_path):
+        """Test changed rows are re-exported with a newer modification time."""
+        enrollment = Enrollment.objects.create(student=student_user, course=course)
+        assert export_analytics(
+            ['enrollments'], output_dir=tmp_path, lag=timedelta(0)
+        ) == {'enrollments': 1}
+        
+        enrollment.progress_percentage = 50
+        enrollment.save()
+        assert export_analytics(
+            ['enrollments'], output_dir=tmp_path, lag=timedelta(0)
+        ) == {'enrollments': 1}
+        
+        # Progress advanced with a queryset update is exported too
+        LessonProgress.objects.create(enrollment=enrollment, lesson=lesson)
+        assert enrollment.complete_lessons([lesson.id]) == 1
+        assert export_analytics(
+            ['enrollments'], output_dir=tmp_path, lag=timedelta(0)
+        ) == {'enrollments': 1}
+        
+        frame = pd.read_parquet(tmp_path / 'enrollments')
+        latest = frame.sort_values('modified_at').drop_duplicates('id', keep='last')
+        assert list(latest['completed_lessons_count']) == [1]
+    
+    def test_recent_rows_held_back(self, student_user, tmp_path):
+        """Test rows inside the export lag wait for the next run."""
+        UserActivity.objects.create(user=student_user, activity_type='login')
+        
+        assert export_analytics(['user_activities'], output_dir=tmp_path) == {'user_activities': 0}
+        assert export_analytics(
+            ['user_activities'], output_dir=tmp_path, lag=timedelta(0)
+        ) == {'user_activities': 1}
+    
+    def test_unknown_dataset_rejected(self, tmp_path):
+        """Test the command validates dataset names."""
+        with pytest.raises(CommandError):
+            call_command('export_analytics', 'not_a_table', output_dir=str(tmp_path))
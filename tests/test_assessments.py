@@ -0,0 +1,174 @@
+"""
+Tests for quizzes and quiz attempts.
+"""
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from apps.assessments.models import Quiz, Question, Answer, QuizAttempt, QuizAttemptCounter
+from apps.assessments.snapshots import get_quiz_snapshot
+
+
+@pytest.fixture
+def published_quiz(course, teacher_user):
+    """Create a published quiz with two questions."""
+    quiz = Quiz.objects.create(
+        title='Snapshot Quiz',
+        description='Quiz served from a snapshot',
+        course=course,
+        created_by=teacher_user,
+        difficulty='beginner',
+        passing_score=50,
+        max_attempts=3,
+        is_published=True
+    )
+    for order in (1, 2):
+        question = Question.objects.create(
+            quiz=quiz,
+            question_text=f'Question {order}?',
+            question_type='multiple_choice',
+            points=5,
+            order=order
+        )
+        Answer.objects.create(question=question, answer_text='Right', is_correct=True, order=1)
+        Answer.objects.create(question=question, answer_text='Wrong', is_correct=False, order=2)
+    return quiz
+
+
+@pytest.mark.django_db
+class TestQuizSnapshot:
+    """Test compiled quiz snapshots."""
+    
+    def test_quiz_detail_served_from_snapshot(self, authenticated_client, published_quiz):
+        """Test quiz details are complete and cheap once compiled."""
+        authenticated_client.get(f'/api/assessments/quizzes/{published_quiz.id}/')
+        
+        with CaptureQueriesContext(connection) as queries:
+            response = authenticated_client.get(f'/api/assessments/quizzes/{published_quiz.id}/')
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['total_questions'] == 2
+        assert len(response.data['questions'][0]['answers']) == 2
+        assert len(queries) == 1
+    
+    def test_snapshot_recompiled_after_edit(self, published_quiz):
+        """Test editing a question produces a new snapshot version."""
+        published_quiz.refresh_from_db()
+        before = get_quiz_snapshot(published_quiz)
+        
+        question = published_quiz.questions.first()
+        question.points = 20
+        question.save()
+        
+        published_quiz.refresh_from_db()
+        after = get_quiz_snapshot(published_quiz)
+        assert after['answer_key'][str(question.id)]['points'] == 20
+        assert after['total_points'] == before['total_points'] + 15
+    
+    def test_submit_answer_rejects_foreign_answer(self, authenticated_client, published_quiz):
+        """Test answers from other questions are not accepted."""
+        first, second = published_quiz.questions.all()
+        attempt = authenticated_client.post(
+            f'/api/assessments/quizzes/{published_quiz.id}/start/'
+        ).data['data']
+        
+        response = authenticated_client.post(
+            f'/api/assessments/attempts/{attempt["id"]}/answer/',
+            {
+                'question_id': str(first.id),
+                'selected_answer_id': str(second.answers.first().id)
+            }
+        )
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.django_db
+class TestQuizSubmission:
+    """Test whole-attempt submission and grading."""
+    
+    def test_submit_all_answers(self, authenticated_client, published_quiz):
+        """Test a whole attempt is graded and completed in one request."""
+        first, second = published_quiz.questions.all()
+        attempt = authenticated_client.post(
+            f'/api/assessments/quizzes/{published_quiz.id}/start/'
+        ).data['data']
+        
+        answers = [
+            {
+                'question_id': str(first.id),
+                'selected_answer_id': str(first.answers.get(is_correct=True).id)
+            },
+            {
+                'question_id': str(second.id),
+                'selected_answer_id': str(second.answers.get(is_correct=False).id)
+            },
+        ]
+        response = authenticated_client.post(
+            f'/api/assessments/attempts/{attempt["id"]}/submit/',
+            {'answers': answers},
+            format='json'
+        )
+        assert response.status_code == status.HTTP_200_OK
+        data = response.data['data']
+        assert data['status'] == 'completed'
+        assert data['total_points'] == 10
+        assert data['earned_points'] == 5
+        assert data['score'] == 50.0
+        assert data['passed'] is True
+        assert len(data['responses']) == 2
+    
+    def test_submit_rejects_unknown_question(self, authenticated_client, published_quiz):
+        """Test submissions referencing other quizzes are rejected."""
+        import uuid
+        attempt = authenticated_client.post(
+            f'/api/assessments/quizzes/{published_quiz.id}/start/'
+        ).data['data']
+        
+        response = authenticated_client.post(
+            f'/api/assessments/attempts/{attempt["id"]}/submit/',
+            {'answers': [{'question_id': str(uuid.uuid4())}]},
+            format='json'
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+    
+    def test_concurrent_submit_rejected(self, authenticated_client, published_quiz, monkeypatch):
+        """Test an attempt completed by another submit mid-request is not graded again."""
+        from apps.assessments import views
+        from apps.assessments.models import QuestionResponse
+        first = published_quiz.questions.first()
+        attempt = authenticated_client.post(
+            f'/api/assessments/quizzes/{published_quiz.id}/start/'
+        ).data['data']
+        
+        def complete_then_snapshot(quiz):
+            # Another request completes the attempt after this one loaded it
+            QuizAttempt.objects.filter(id=attempt['id']).update(status='completed')
+            return get_quiz_snapshot(quiz)
+        
+        monkeypatch.setattr(views, 'get_quiz_snapshot', complete_then_snapshot)
+        response = authenticated_client.post(
+            f'/api/assessments/attempts/{attempt["id"]}/submit/',
+            {'answers': [{'question_id': str(first.id)}]},
+            format='json'
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert not QuestionResponse.objects.filter(attempt_id=attempt['id']).exists()
+
+
+@pytest.mark.django_db
+class TestAttemptAllocation:
+    """Test attempt number allocation."""
+    
+    def test_allocation_respects_max_attempts(self, student_user, published_quiz):
+        """Test numbers are sequential and stop at the attempt limit."""
+        numbers = [
+            QuizAttemptCounter.allocate(published_quiz, student_user)
+            for _ in range(published_quiz.max_attempts + 1)
+        ]
+        assert numbers == [1, 2, 3, None]
+    
+    def test_counter_seeded_from_existing_attempts(self, student_user, published_quiz):
+        """Test attempts created before the counter existed are accounted for."""
+        QuizAttempt.objects.create(quiz=published_quiz, student=student_user, attempt_number=1)
+        
+        assert QuizAttemptCounter.allocate(published_quiz, student_user) == 2
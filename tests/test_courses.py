@@ -3,7 +3,7 @@ Tests for course management.
 """
 import pytest
 from rest_framework import status
-from apps.courses.models import Course, Enrollment
+from apps.courses.models import Course, Lesson, Enrollment, LessonProgress
 
 
 @pytest.mark.django_db
@@ -136,4 +136,83 @@ class TestLessonProgress:
         )
         
         # Get progress - endpoint doesn't exist for GET, skip
-        pytest.skip("GET lesson progress endpoint not implemented yet")
\ No newline at end of file
+        pytest.skip("GET lesson progress endpoint not implemented yet")
+    
+    def test_batch_lesson_progress(self, authenticated_client, student_user, course, lesson):
+        """Test applying several progress events in one request."""
+        enrollment = Enrollment.objects.create(student=student_user, course=course)
+        second_lesson = Lesson.objects.create(
+            course=course,
+            title='Second Lesson',
+            content='More content',
+            order=2,
+            duration=20
+        )
+        
+        events = [
+            {'lesson_id': str(lesson.id), 'time_spent': 120, 'completion_percentage': 40},
+            {'lesson_id': str(lesson.id), 'time_spent': 300, 'completion_percentage': 100},
+            {'lesson_id': str(second_lesson.id), 'time_spent': 60, 'completion_percentage': 10},
+        ]
+        response = authenticated_client.post(
+            '/api/courses/lessons/progress/batch/',
+            {'events': events},
+            format='json'
+        )
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['data']['created'] == 2
+        assert response.data['data']['completed'] == 1
+        
+        progress = LessonProgress.objects.get(enrollment=enrollment, lesson=lesson)
+        assert progress.is_completed
+        assert progress.time_spent == 300
+        
+        enrollment.refresh_from_db()
+        assert enrollment.progress_percentage == 50.0
+    
+    def test_batch_lesson_progress_updates_existing_row(self, authenticated_client, student_user,
+                                                        course, lesson):
+        """Test a row inserted by another request is updated, not duplicated."""
+        enrollment = Enrollment.objects.create(student=student_user, course=course)
+        LessonProgress.objects.create(enrollment=enrollment, lesson=lesson, time_spent=100)
+        
+        response = authenticated_client.post(
+            '/api/courses/lessons/progress/batch/',
+            {'events': [{'lesson_id': str(lesson.id), 'time_spent': 250}]},
+            format='json'
+        )
+        assert response.status_code == status.HTTP_200_OK
+        assert (response.data['data']['created'], response.data['data']['updated']) == (0, 1)
+        
+        progress = LessonProgress.objects.get(enrollment=enrollment, lesson=lesson)
+        assert progress.time_spent == 250
+    
+    def test_batch_lesson_progress_skips_unenrolled(self, authenticated_client, lesson):
+        """Test events for courses the user is not enrolled in are skipped."""
+        response = authenticated_client.post(
+            '/api/courses/lessons/progress/batch/',
+            {'events': [{'lesson_id': str(lesson.id), 'completion_percentage': 50}]},
+            format='json'
+        )
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['data']['skipped'] == [str(lesson.id)]
+    
+    def test_lesson_completion_is_counted_once(self, student_user, course, lesson):
+        """Test repeated completions of a lesson only advance progress once."""
+        enrollment = Enrollment.objects.create(student=student_user, course=course)
+        course.refresh_from_db()
+        LessonProgress.objects.create(enrollment=enrollment, lesson=lesson)
+        
+        assert enrollment.complete_lessons([lesson.id]) == 1
+        assert enrollment.complete_lessons([lesson.id]) == 0
+        assert enrollment.completed_lessons_count == 1
+        assert enrollment.progress_percentage == 100.0
+    
+    def test_lessons_count_tracks_lessons(self, course, lesson):
+        """Test the cached lesson total follows lesson creation and deletion."""
+        course.refresh_from_db()
+        assert course.total_lessons == 1
+        
+        lesson.delete()
+        course.refresh_from_db()
+        assert course.total_lessons == 0
@@ -0,0 +1,672 @@
+"""
+Tests for gamification leaderboards, points, rules and levels.
+"""
+import pytest
+from datetime import timedelta
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import status
+from apps.users.models import User
+from apps.analytics.models import LearningAnalytics
+from apps.analytics import pipeline
+from apps.courses.models import Enrollment
+from apps.gamification.models import (
+    Badge, Challenge, Leaderboard, LeaderboardEntry, Level, PointBalance, PointTransaction,
+    Reward, UserBadge, UserChallenge, UserLevel, UserReward
+)
+from apps.gamification.leaderboards import leaderboard_engine
+from apps.gamification.levels import level_for_points
+from apps.gamification.points import (
+    InsufficientPointsError, get_balance, record_transaction, reconcile_balances, spend_points
+)
+from apps.gamification.rules import METRIC_TRIGGERS, build_rule_index, evaluate_events
+from apps.gamification.user_state import REDEEMED_REWARDS, get_user_state_key
+from apps.gamification.tasks import (
+    snapshot_leaderboards, reconcile_point_balances, recompute_user_levels
+)
+
+
+class FakeSortedSetRedis:
+    """In-memory stand-in for the Redis sorted set commands the engine uses."""
+    
+    def __init__(self):
+        self.data = {}
+    
+    def _members(self, key):
+        return self.data.setdefault(key, {})
+    
+    def _ordered(self, key):
+        # Redis breaks score ties by member, in reverse for ZREVRANGE
+        return sorted(self._members(key).items(), key=lambda item: (item[1], item[0]), reverse=True)
+    
+    def zadd(self, key, mapping, nx=False):
+        members = self._members(key)
+        added = 0
+        for member, score in mapping.items():
+            if member not in members:
+                added += 1
+            elif nx:
+                continue
+            members[member] = float(score)
+        return added
+    
+    def zincrby(self, key, amount, member):
+        members = self._members(key)
+        members[member] = members.get(member, 0.0) + amount
+        return members[member]
+    
+    def zrem(self, key, member):
+        return int(self._members(key).pop(member, None) is not None)
+    
+    def zscore(self, key, member):
+        return self._members(key).get(member)
+    
+    def zrevrank(self, key, member):
+        members = [item[0] for item in self._ordered(key)]
+        return members.index(member) if member in members else None
+    
+    def zcard(self, key):
+        return len(self._members(key))
+    
+    def zcount(self, key, low, high):
+        assert (low, high) == ('(-inf', '+inf')
+        return len([score for score in self._members(key).values() if score > float('-inf')])
+    
+    def zunionstore(self, destination, keys, aggregate='SUM'):
+        assert aggregate == 'SUM'
+        union = {}
+        for key in keys:
+            for member, score in self._members(key).items():
+                union[member] = union.get(member, 0.0) + score
+        self.data[destination] = union
+        return len(union)
+    
+    def delete(self, key):
+        return int(self.data.pop(key, None) is not None)
+    
+    def zrevrange(self, key, start, stop, withscores=False):
+        items = self._ordered(key)[start:stop + 1]
+        return [(member.encode(), score) for member, score in items]
+    
+    def flushall(self):
+        self.data = {}
+    
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.calls = []
+    
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self.calls.append((name, args, kwargs))
+        return queue
+    
+    def execute(self):
+        calls, self.calls = self.calls, []
+        return [getattr(self.client, name)(*args, **kwargs) for name, args, kwargs in calls]
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    """Point the leaderboard engine at an in-memory sorted set store."""
+    client = FakeSortedSetRedis()
+    monkeypatch.setattr(leaderboard_engine, '_client', client)
+    return client
+
+
+def make_leaderboard(metric='points', **kwargs):
+    now = timezone.now()
+    return Leaderboard.objects.create(**{
+        'name': f'{metric} leaderboard',
+        'category': 'global',
+        'metric': metric,
+        'start_date': now - timedelta(days=1),
+        'end_date': now + timedelta(days=7),
+        **kwargs
+    })
+
+
+def make_students(count):
+    return [
+        User.objects.create_user(
+            email=f'player{i}@test.com',
+            password='testpass123',
+            full_name=f'Player {i}',
+            role='student'
+        )
+        for i in range(count)
+    ]
+
+
+def make_badge(criteria_type, criteria_value, points_reward=0):
+    return Badge.objects.create(
+        name=f'{criteria_type} {criteria_value}',
+        description='Test badge',
+        criteria_type=criteria_type,
+        criteria_value=criteria_value,
+        points_reward=points_reward
+    )
+
+
+def make_challenge(criteria_type, criteria_value, **kwargs):
+    now = timezone.now()
+    return Challenge.objects.create(**{
+        'title': f'{criteria_type} challenge',
+        'description': 'Test challenge',
+        'challenge_type': 'weekly',
+        'criteria_type': criteria_type,
+        'criteria_value': criteria_value,
+        'points_reward': 25,
+        'start_date': now - timedelta(days=1),
+        'end_date': now + timedelta(days=6),
+        **kwargs
+    })
+
+
+def award(user, points, transaction_type='earned'):
+    PointTransaction.objects.create(
+        user=user, points=points, transaction_type=transaction_type, reason='Test'
+    )
+
+
+@pytest.mark.django_db
+class TestLeaderboardEngine:
+    """Test the Redis sorted set leaderboards."""
+    
+    def test_points_update_sorted_set(self, fake_redis, django_capture_on_commit_callbacks):
+        """Test point transactions move users on points leaderboards."""
+        leaderboard = make_leaderboard()
+        first, second, third = make_students(3)
+        with django_capture_on_commit_callbacks(execute=True):
+            award(first, 50)
+            award(second, 80)
+            award(third, 30)
+            award(second, 40, 'penalty')
+            award(first, 20, 'spent')
+        
+        top = leaderboard_engine.get_top(leaderboard.id, 10)
+        
+        assert [entry['user_id'] for entry in top] == [str(first.id), str(second.id), str(third.id)]
+        assert [entry['score'] for entry in top] == [50, 40, 30]
+        assert [entry['rank'] for entry in top] == [1, 2, 3]
+        assert leaderboard_engine.get_rank(leaderboard.id, third.id)['rank'] == 3
+    
+    def test_closed_leaderboards_not_updated(self, fake_redis, django_capture_on_commit_callbacks):
+        """Test leaderboards outside their window ignore new points."""
+        leaderboard = make_leaderboard(end_date=timezone.now() - timedelta(hours=1))
+        with django_capture_on_commit_callbacks(execute=True):
+            award(make_students(1)[0], 50)
+        
+        assert leaderboard_engine.get_size(leaderboard.id) == 0
+    
+    def test_rolled_back_points_not_scored(self, fake_redis, django_capture_on_commit_callbacks):
+        """Test Redis is only updated once the points are committed."""
+        leaderboard = make_leaderboard()
+        user = make_students(1)[0]
+        
+        with django_capture_on_commit_callbacks(execute=True):
+            with pytest.raises(RuntimeError):
+                with transaction.atomic():
+                    record_transaction(user, 50, 'earned', 'Quiz')
+                    raise RuntimeError('request failed')
+            award(user, 10)
+        
+        assert leaderboard_engine.get_rank(leaderboard.id, user.id)['score'] == 10
+    
+    def test_analytics_metrics_update_scores(self, fake_redis, student_user,
+                                             django_capture_on_commit_callbacks):
+        """Test analytics saves set scores on metric leaderboards."""
+        leaderboard = make_leaderboard('streak')
+        analytics, _ = LearningAnalytics.objects.get_or_create(user=student_user)
+        analytics.current_streak = 12
+        with django_capture_on_commit_callbacks(execute=True):
+            analytics.save()
+        
+        assert leaderboard_engine.get_rank(leaderboard.id, student_user.id) == {
+            'user_id': str(student_user.id), 'score': 12, 'rank': 1
+        }
+    
+    def test_top_and_around_me_api(self, fake_redis, authenticated_client, student_user,
+                                   django_capture_on_commit_callbacks):
+        """Test range queries through the API respect max_entries."""
+        leaderboard = make_leaderboard(max_entries=3)
+        with django_capture_on_commit_callbacks(execute=True):
+            for points, user in enumerate(make_students(6), start=1):
+                award(user, points * 10)
+            award(student_user, 35)
+        url = f'/api/gamification/leaderboards/{leaderboard.id}'
+        
+        response = authenticated_client.get(f'{url}/')
+        assert [entry['rank'] for entry in response.data['entries']] == [1, 2, 3]
+        assert response.data['entries'][0]['user'] == str(User.objects.get(full_name='Player 5'))
+        
+        response = authenticated_client.get(f'{url}/top/?limit=2')
+        assert [entry['score'] for entry in response.data] == [60, 50]
+        assert authenticated_client.get(f'{url}/top/?limit=4').status_code == status.HTTP_400_BAD_REQUEST
+        
+        response = authenticated_client.get(f'{url}/around_me/?radius=1')
+        assert [entry['score'] for entry in response.data] == [40, 35, 30]
+        assert response.data[1]['rank'] == 4
+        
+        response = authenticated_client.get('/api/gamification/leaderboards/user_rankings/')
+        assert response.data == [{
+            'leaderboard': leaderboard.id,
+            'leaderboard_name': leaderboard.name,
+            'score': 35,
+            'rank': 4,
+        }]
+    
+    def test_course_leaderboards_not_served(self, fake_redis, authenticated_client, course):
+        """Test leaderboards the engine never scores are not listed."""
+        leaderboard = make_leaderboard()
+        make_leaderboard(course=course, category='course')
+        
+        response = authenticated_client.get('/api/gamification/leaderboards/')
+        assert [entry['id'] for entry in response.data['results']] == [leaderboard.id]
+    
+    def test_snapshot_and_restore(self, fake_redis, django_capture_on_commit_callbacks):
+        """Test snapshots persist ranks and rebuild a lost sorted set."""
+        leaderboard = make_leaderboard()
+        first, second = make_students(2)
+        with django_capture_on_commit_callbacks(execute=True):
+            award(first, 10)
+            award(second, 20)
+        
+        assert snapshot_leaderboards() == {'success': True, 'entries': 2}
+        assert list(LeaderboardEntry.objects.values_list('user', 'rank')) == [
+            (second.id, 1), (first.id, 2)
+        ]
+        
+        # Redis loses the set, then new points arrive before the next snapshot
+        fake_redis.flushall()
+        with django_capture_on_commit_callbacks(execute=True):
+            award(first, 30)
+        
+        assert snapshot_leaderboards() == {'success': True, 'entries': 2}
+        assert list(LeaderboardEntry.objects.values_list('user', 'score', 'rank')) == [
+            (first.id, 40, 1), (second.id, 20, 2)
+        ]
+        
+        # An intact set is never merged with its snapshot again
+        assert snapshot_leaderboards() == {'success': True, 'entries': 2}
+        assert leaderboard_engine.get_size(leaderboard.id) == 2
+        assert [entry['score'] for entry in leaderboard_engine.get_top(leaderboard.id, 10)] == [40, 20]
+        # Scratch sets are per restore and removed afterwards
+        assert [key for key in fake_redis.data if ':restore' in key] == []
+
+
+@pytest.mark.django_db
+class TestPointsLedger:
+    """Test the materialised points balance."""
+    
+    def test_balance_follows_transactions(self, authenticated_client, student_user):
+        """Test the summary reads the balance row, not the history."""
+        record_transaction(student_user, 100, 'earned', 'Quiz')
+        record_transaction(student_user, 20, 'bonus', 'Streak')
+        record_transaction(student_user, 15, 'penalty', 'Late')
+        spend_points(student_user, 30, 'Reward')
+        
+        with CaptureQueriesContext(connection) as queries:
+            response = authenticated_client.get('/api/gamification/point-transactions/summary/')
+        
+        assert response.data == {'total_earned': 120, 'total_spent': 30, 'current_balance': 75}
+        assert not [query for query in queries if 'SUM(' in query['sql'].upper()]
+    
+    def test_spend_never_overdraws(self, student_user):
+        """Test a second spend against a stale balance is refused."""
+        record_transaction(student_user, 50, 'earned', 'Quiz')
+        spend_points(student_user, 40, 'First')
+        
+        with pytest.raises(InsufficientPointsError):
+            spend_points(student_user, 40, 'Second')
+        
+        assert PointBalance.objects.get(user=student_user).balance == 10
+        assert PointTransaction.objects.filter(user=student_user, transaction_type='spent').count() == 1
+    
+    def test_redeem(self, authenticated_client, student_user):
+        """Test redemption spends points and claims stock atomically."""
+        reward = Reward.objects.create(
+            name='Certificate', description='A certificate', reward_type='certificate',
+            points_cost=60, stock=1
+        )
+        url = f'/api/gamification/rewards/{reward.id}/redeem/'
+        
+        response = authenticated_client.post(url)
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.data == {'error': 'Insufficient points'}
+        reward.refresh_from_db()
+        assert reward.stock == 1
+        
+        record_transaction(student_user, 100, 'earned', 'Quiz')
+        response = authenticated_client.post(url)
+        
+        assert response.status_code == status.HTTP_200_OK
+        reward.refresh_from_db()
+        assert reward.stock == 0
+        assert UserReward.objects.filter(user=student_user, reward=reward).count() == 1
+        assert get_balance(student_user).balance == 40
+        
+        # A stale cached copy of the user's redemptions does not let it through
+        cache.set(get_user_state_key(REDEEMED_REWARDS, student_user.id), set())
+        response = authenticated_client.post(url)
+        assert response.data == {'error': 'Reward already redeemed'}
+        assert get_balance(student_user).balance == 40
+        
+        other_reward = Reward.objects.create(
+            name='Sold out', description='Gone', reward_type='virtual', points_cost=10, stock=0
+        )
+        response = authenticated_client.post(f'/api/gamification/rewards/{other_reward.id}/redeem/')
+        assert response.data == {'error': 'Reward out of stock'}
+        assert get_balance(student_user).balance == 40
+    
+    def test_reconcile_balances(self, student_user, teacher_user):
+        """Test drifted and missing balances are repaired from the history."""
+        record_transaction(student_user, 100, 'earned', 'Quiz')
+        PointBalance.objects.filter(user=student_user).update(balance=5)
+        PointTransaction.objects.create(
+            user=teacher_user, points=30, transaction_type='earned', reason='Import'
+        )
+        
+        assert reconcile_point_balances() == {
+            'success': True, 'checked': 2, 'corrected': 1, 'created': 1
+        }
+        assert get_balance(student_user).balance == 100
+        assert get_balance(teacher_user).total_earned == 30
+        assert reconcile_balances()['corrected'] == 0
+
+
+@pytest.mark.django_db
+class TestRulesEngine:
+    """Test event driven badge and challenge evaluation."""
+    
+    def test_quiz_badge_awarded_from_event(self, student_user):
+        """Test a quiz event awards a score badge and its points once."""
+        badge = make_badge('quiz_score', 80, points_reward=10)
+        
+        pipeline.record_event(student_user.id, 'quiz_completed', score=70, passed=True)
+        assert not UserBadge.objects.filter(user=student_user).exists()
+        
+        pipeline.record_event(student_user.id, 'quiz_completed', score=90, passed=True)
+        pipeline.record_event(student_user.id, 'quiz_completed', score=95, passed=True)
+        
+        assert list(UserBadge.objects.filter(user=student_user).values_list('badge', flat=True)) == [badge.id]
+        assert get_balance(student_user).total_earned == 10
+    
+    def test_rules_indexed_by_event_type(self):
+        """Test rules are only looked up for events that can change them."""
+        quiz_badge = make_badge('quiz_score', 80)
+        time_badge = make_badge('time_spent', 600)
+        points_badge = make_badge('total_points', 100)
+        challenge = make_challenge('quizzes_completed', 3)
+        
+        index = build_rule_index()
+        
+        assert [rule['id'] for rule in index['badges']['quiz_completed']] == [quiz_badge.id]
+        assert [rule['id'] for rule in index['badges']['lesson_progress']] == [time_badge.id]
+        assert [rule['id'] for rule in index['badges']['points']] == [points_badge.id]
+        assert [rule['id'] for rule in index['challenges']['quiz_completed']] == [challenge.id]
+        assert 'chat_message' not in index['badges']
+    
+    def test_every_badge_criteria_has_trigger(self):
+        """Test no badge criteria choice is silently never evaluated."""
+        criteria_types = [choice for choice, _ in Badge._meta.get_field('criteria_type').choices]
+        
+        assert [
+            criteria_type for criteria_type in criteria_types if not METRIC_TRIGGERS.get(criteria_type)
+        ] == []
+    
+    def test_completion_and_social_badges_awarded(self, student_user, course):
+        """Test course completions and chat messages reach their badges."""
+        completion_badge = make_badge('courses_completed', 1)
+        social_badge = make_badge('social_interactions', 2)
+        
+        Enrollment.objects.create(student=student_user, course=course, status='completed')
+        for _ in range(2):
+            pipeline.record_event(student_user.id, 'chat_message')
+        
+        assert set(UserBadge.objects.filter(user=student_user).values_list('badge', flat=True)) == {
+            completion_badge.id, social_badge.id
+        }
+    
+    def test_counter_challenge_completes(self, student_user):
+        """Test a counter challenge completes and pays out its rewards."""
+        badge = make_badge('social_interactions', 1)
+        challenge = make_challenge('quizzes_completed', 3, badge_reward=badge)
+        
+        for score in (40, 60):
+            pipeline.record_event(student_user.id, 'quiz_completed', score=score, passed=False)
+        user_challenge = UserChallenge.objects.get(user=student_user, challenge=challenge)
+        assert (user_challenge.progress, user_challenge.is_completed) == (2, False)
+        
+        pipeline.record_event(student_user.id, 'quiz_completed', score=80, passed=True)
+        pipeline.record_event(student_user.id, 'quiz_completed', score=85, passed=True)
+        
+        user_challenge.refresh_from_db()
+        assert user_challenge.is_completed
+        assert user_challenge.times_completed == 1
+        assert UserBadge.objects.filter(user=student_user, badge=badge).exists()
+        assert PointTransaction.objects.filter(
+            user=student_user, related_object_type='challenge'
+        ).count() == 1
+        assert get_balance(student_user).balance == 25
+    
+    def test_points_badge_from_transactions(self, student_user, django_capture_on_commit_callbacks):
+        """Test earning points evaluates total points badges once committed."""
+        badge = make_badge('total_points', 100)
+        
+        with django_capture_on_commit_callbacks(execute=True):
+            record_transaction(student_user, 60, 'earned', 'Quiz')
+        assert not UserBadge.objects.filter(user=student_user).exists()
+        
+        with django_capture_on_commit_callbacks(execute=True) as callbacks:
+            record_transaction(student_user, 50, 'bonus', 'Streak')
+            assert not UserBadge.objects.filter(user=student_user).exists()
+        assert callbacks
+        assert UserBadge.objects.filter(user=student_user, badge=badge).exists()
+    
+    def test_badge_paid_once(self, student_user):
+        """Test re-evaluating an earned badge does not pay it again."""
+        badge = make_badge('quiz_score', 80, points_reward=10)
+        event = {'type': 'quiz_completed', 'score': 90}
+        
+        assert evaluate_events(student_user.id, [event])['badges'] == [badge.id]
+        assert evaluate_events(student_user.id, [event])['badges'] == []
+        
+        assert get_balance(student_user).total_earned == 10
+    
+    def test_repeatable_metric_challenge_counts_growth(self, student_user,
+                                                       django_capture_on_commit_callbacks):
+        """Test a repeatable metric challenge needs new growth to complete again."""
+        challenge = make_challenge('total_points', 100, max_completions=3)
+        
+        with django_capture_on_commit_callbacks(execute=True):
+            record_transaction(student_user, 120, 'earned', 'Quiz')
+        user_challenge = UserChallenge.objects.get(user=student_user, challenge=challenge)
+        assert (user_challenge.times_completed, user_challenge.progress_baseline) == (1, 120)
+        
+        # The challenge reward itself and a small earning stay below the target
+        with django_capture_on_commit_callbacks(execute=True):
+            record_transaction(student_user, 10, 'earned', 'Quiz')
+        user_challenge.refresh_from_db()
+        assert (user_challenge.times_completed, user_challenge.progress) == (1, 35)
+        
+        with django_capture_on_commit_callbacks(execute=True):
+            record_transaction(student_user, 70, 'earned', 'Quiz')
+        user_challenge.refresh_from_db()
+        assert user_challenge.times_completed == 2
+        assert PointTransaction.objects.filter(
+            user=student_user, related_object_type='challenge'
+        ).count() == 2
+    
+    def test_failed_evaluation_keeps_outer_transaction(self, student_user, monkeypatch):
+        """Test a failing evaluation only rolls back its own savepoint."""
+        make_badge('quiz_score', 80, points_reward=10)
+        
+        def fail(*args, **kwargs):
+            raise RuntimeError('boom')
+        
+        monkeypatch.setattr('apps.gamification.points.record_transaction', fail)
+        with transaction.atomic():
+            pipeline.record_event(student_user.id, 'quiz_completed', score=90, passed=True)
+            assert not UserBadge.objects.filter(user=student_user).exists()
+            assert User.objects.filter(pk=student_user.pk).exists()
+    
+    def test_complete_requires_criteria(self, authenticated_client, student_user):
+        """Test the complete endpoint only confirms rule engine progress."""
+        challenge = make_challenge('quizzes_completed', 1)
+        url = f'/api/gamification/challenges/{challenge.id}/complete/'
+        
+        response = authenticated_client.post(url)
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.data == {'error': 'Challenge criteria not met', 'progress': 0, 'target': 1}
+        assert not PointTransaction.objects.filter(user=student_user).exists()
+        
+        pipeline.record_event(student_user.id, 'quiz_completed', score=50, passed=False)
+        response = authenticated_client.post(url)
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['times_completed'] == 1
+        assert get_balance(student_user).balance == 25
+
+
+@pytest.mark.django_db
+class TestUserStateQueries:
+    """Test gamification lists do not query per item."""
+    
+    def count_queries(self, client, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        return len(queries), response
+    
+    def test_badge_list_query_count(self, authenticated_client, student_user):
+        """Test badge lists cost the same number of queries for any size."""
+        badges = [make_badge('quiz_score', value) for value in range(5)]
+        UserBadge.objects.create(user=student_user, badge=badges[0])
+        few, _ = self.count_queries(authenticated_client, '/api/gamification/badges/')
+        
+        for value in range(5, 20):
+            make_badge('quiz_score', value)
+        many, response = self.count_queries(authenticated_client, '/api/gamification/badges/')
+        
+        assert many <= few
+        earned = [badge['id'] for badge in response.data['results'] if badge['earned_by_user']]
+        assert earned == [badges[0].id]
+    
+    def test_earned_state_cached_and_invalidated(self, authenticated_client, student_user):
+        """Test the earned badge IDs are cached until a badge is awarded."""
+        badge = make_badge('quiz_score', 80)
+        url = '/api/gamification/badges/'
+        self.count_queries(authenticated_client, url)
+        
+        cached, response = self.count_queries(authenticated_client, url)
+        assert not response.data['results'][0]['earned_by_user']
+        
+        pipeline.record_event(student_user.id, 'quiz_completed', score=85, passed=True)
+        uncached, response = self.count_queries(authenticated_client, url)
+        
+        assert response.data['results'][0]['earned_by_user']
+        assert uncached == cached + 1
+        
+        UserBadge.objects.filter(user=student_user).delete()
+        _, response = self.count_queries(authenticated_client, url)
+        assert not response.data['results'][0]['earned_by_user']
+    
+    def test_challenge_and_reward_list_query_count(self, authenticated_client, student_user):
+        """Test challenge and reward lists preload the user's progress."""
+        badge = make_badge('social_interactions', 1)
+        challenges = [make_challenge('quizzes_completed', 2, badge_reward=badge) for _ in range(3)]
+        rewards = [
+            Reward.objects.create(
+                name=f'Reward {i}', description='Test', reward_type='virtual', points_cost=10
+            )
+            for i in range(3)
+        ]
+        pipeline.record_event(student_user.id, 'quiz_completed', score=50, passed=False)
+        UserReward.objects.create(user=student_user, reward=rewards[1])
+        
+        counts = {}
+        for url in ('challenges', 'user-challenges', 'rewards', 'user-rewards'):
+            counts[url], _ = self.count_queries(authenticated_client, f'/api/gamification/{url}/')
+        
+        for _ in range(10):
+            make_challenge('quizzes_completed', 2, badge_reward=badge)
+            reward = Reward.objects.create(
+                name='Extra', description='Test', reward_type='virtual', points_cost=10
+            )
+            pipeline.record_event(student_user.id, 'quiz_completed', score=50, passed=False)
+            UserReward.objects.create(user=student_user, reward=reward)
+        
+        for url in counts:
+            queries, response = self.count_queries(authenticated_client, f'/api/gamification/{url}/')
+            assert queries <= counts[url], url
+        
+        response = authenticated_client.get(f'/api/gamification/challenges/{challenges[0].id}/')
+        assert response.data['user_progress']['is_completed']
+        response = authenticated_client.get(f'/api/gamification/rewards/{rewards[1].id}/')
+        assert response.data['redeemed_by_user']
+
+
+@pytest.mark.django_db
+class TestLevels:
+    """Test level progression from the points ledger."""
+    
+    @pytest.fixture
+    def levels(self):
+        return [
+            Level.objects.create(name=name, level_number=number, points_required=points)
+            for number, (name, points) in enumerate(
+                [('Novice', 0), ('Learner', 100), ('Scholar', 250)], start=1
+            )
+        ]
+    
+    def test_level_for_points(self, levels):
+        """Test point totals bisect to the highest level reached."""
+        assert level_for_points(0)[0]['name'] == 'Novice'
+        assert level_for_points(99) == (level_for_points(0)[0], 1)
+        assert level_for_points(100)[0]['name'] == 'Learner'
+        assert level_for_points(400) == (level_for_points(250)[0], 0)
+        
+        Level.objects.filter(level_number=1).update(points_required=10)
+        assert level_for_points(5)[0]['name'] == 'Novice'
+        levels[0].refresh_from_db()
+        levels[0].save()
+        assert level_for_points(5)[0] is None
+    
+    def test_ledger_updates_level(self, levels, authenticated_client, student_user):
+        """Test earning points moves the user's level in the same write."""
+        record_transaction(student_user, 80, 'earned', 'Quiz')
+        record_transaction(student_user, 40, 'bonus', 'Streak')
+        spend_points(student_user, 100, 'Reward')
+        
+        user_level = UserLevel.objects.get(user=student_user)
+        assert (user_level.current_level, user_level.total_points, user_level.points_to_next) == (
+            levels[1], 120, 130
+        )
+        
+        authenticated_client.get('/api/gamification/levels/')
+        with CaptureQueriesContext(connection) as queries:
+            response = authenticated_client.get('/api/gamification/user-levels/current/')
+        
+        assert response.data['level']['name'] == 'Learner'
+        assert response.data['progress_percentage'] == 48
+        assert not [query for query in queries if '"gamification_level"' in query['sql']]
+    
+    def test_recompute_after_threshold_change(self, levels, student_user, teacher_user):
+        """Test users are re-levelled when thresholds change."""
+        record_transaction(student_user, 120, 'earned', 'Quiz')
+        record_transaction(teacher_user, 300, 'earned', 'Import')
+        
+        levels[1].points_required = 150
+        levels[1].save()
+        
+        assert recompute_user_levels() == {'success': True, 'checked': 2, 'updated': 1}
+        user_level = UserLevel.objects.get(user=student_user)
+        assert (user_level.current_level, user_level.points_to_next) == (levels[0], 30)
+        assert UserLevel.objects.get(user=teacher_user).current_level == levels[2]
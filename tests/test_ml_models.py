@@ -0,0 +1,727 @@
+"""
+Tests for ML feature engineering and model inference.
+"""
+import pytest
+import subprocess
+import time
+import warnings
+from io import StringIO
+from datetime import timedelta
+import joblib
+import numpy as np
+import pandas as pd
+from textblob import TextBlob
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+from apps.courses.models import Lesson, Enrollment, LessonProgress, CourseReview
+from apps.assessments.models import Quiz, QuizAttempt
+from apps.ai_tutor.models import ChatMessage, ChatSession
+from apps.analytics.models import UserActivity, LearningAnalytics
+from apps.ml_models.features import (
+    build_learning_style_features, build_performance_features, build_performance_labels,
+    iter_feature_chunks, save_feature_snapshot, load_feature_snapshot
+)
+from apps.ml_models.performance_predictor import (
+    PerformancePredictor, FEATURE_NAMES as PERFORMANCE_FEATURES, LABELS
+)
+from apps.ml_models.search import run_search
+from apps.ml_models.prediction_cache import get_prediction_cache_key
+from apps.ml_models.views import predict_learning_style
+from apps.ml_models.learning_style_detector import (
+    LearningStyleDetector, FEATURE_NAMES as LEARNING_STYLE_FEATURES
+)
+from apps.ml_models.compiled import CompiledForest
+from apps.ml_models.tasks import (
+    score_cohort, backfill_sentiment, train_learning_style_incremental,
+    search_performance_hyperparameters
+)
+from apps.ml_models.sentiment_analyzer import LexiconScorer, sentiment_analyzer
+from apps.ml_models.models import MLModel
+from apps.ml_models.registry import model_registry, get_active_version_key, ModelNotTrainedError
+
+User = get_user_model()
+
+
+@pytest.fixture
+def active_student(student_user, course, teacher_user, chat_session):
+    """A student with lesson progress, a quiz attempt and chat messages."""
+    enrollment = Enrollment.objects.create(student=student_user, course=course)
+    for order, (content_type, time_spent, completed) in enumerate([
+        ('video', 600, False),
+        ('video', 300, True),
+        ('interactive', 120, True),
+    ], start=1):
+        lesson = Lesson.objects.create(
+            course=course,
+            title=f'Lesson {order}',
+            description='Lesson',
+            content='Content',
+            content_type=content_type,
+            order=order,
+            duration=10
+        )
+        LessonProgress.objects.create(
+            enrollment=enrollment,
+            lesson=lesson,
+            time_spent=time_spent,
+            is_completed=completed
+        )
+    
+    quiz = Quiz.objects.create(
+        title='Feature Quiz',
+        description='Quiz',
+        course=course,
+        created_by=teacher_user,
+        difficulty='beginner'
+    )
+    QuizAttempt.objects.create(quiz=quiz, student=student_user, status='completed', score=80)
+    
+    ChatMessage.objects.create(session=chat_session, role='user', content='Hi')
+    ChatMessage.objects.create(session=chat_session, role='assistant', content='Hello')
+    UserActivity.objects.create(user=student_user, activity_type='lesson_view')
+    return student_user
+
+
+@pytest.mark.django_db
+class TestFeatureBuilder:
+    """Test the vectorised feature builder."""
+    
+    def test_learning_style_features(self, active_student):
+        """Test features are aggregated per user and content type."""
+        frame = build_learning_style_features()
+        row = frame.loc[active_student.id]
+        
+        assert row['video_time'] == 900
+        assert row['interactive_time'] == 120
+        assert row['visual_content_views'] == 2
+        assert row['practice_exercises_completed'] == 1
+        assert row['quiz_attempts'] == 1
+        assert row['chat_interactions'] == 1
+        assert row['avg_session_duration'] == pytest.approx(17.0)
+    
+    def test_performance_features(self, active_student):
+        """Test performance features combine analytics and enrollments."""
+        frame = build_performance_features()
+        row = frame.loc[active_student.id]
+        
+        assert row['courses_enrolled'] == 1
+        assert row['chat_messages_sent'] == 1
+        assert row['learning_style'] == 4
+        assert row['days_since_enrollment'] == 0
+    
+    def test_query_count_independent_of_users(self, active_student):
+        """Test the builder uses a fixed number of grouped queries."""
+        for index in range(5):
+            User.objects.create_user(
+                email=f'cohort{index}@test.com',
+                password='testpass123',
+                role='student'
+            )
+        
+        with CaptureQueriesContext(connection) as queries:
+            frame = build_learning_style_features()
+        
+        assert len(frame) == 6
+        assert len(queries) <= 6
+    
+    def test_snapshot_round_trip(self, active_student, tmp_path):
+        """Test feature snapshots load back unchanged."""
+        frame = build_performance_features()
+        
+        path = save_feature_snapshot(frame, 'performance', directory=tmp_path)
+        loaded = load_feature_snapshot(path)
+        
+        np.testing.assert_array_equal(loaded.to_numpy(), frame.to_numpy())
+        assert list(loaded.columns) == list(frame.columns)
+        assert list(loaded.index) == [str(user_id) for user_id in frame.index]
+
+
+@pytest.fixture
+def trained_predictor(tmp_path):
+    """A performance predictor trained on synthetic data."""
+    rng = np.random.default_rng(42)
+    X = rng.uniform(0, 100, size=(300, len(PERFORMANCE_FEATURES)))
+    labels = np.digitize(X[:, 0], [40, 75])
+    
+    predictor = PerformancePredictor()
+    predictor.model_path = str(tmp_path / 'performance_predictor.pkl')
+    predictor.train(pd.DataFrame(X, columns=PERFORMANCE_FEATURES), labels)
+    return predictor
+
+
+@pytest.mark.django_db
+class TestBatchPrediction:
+    """Test vectorised performance prediction."""
+    
+    def test_predict_batch_matches_single_predictions(self, trained_predictor):
+        """Test batch results agree with one-at-a-time predictions."""
+        rng = np.random.default_rng(7)
+        X = rng.uniform(0, 100, size=(20, len(PERFORMANCE_FEATURES)))
+        X[:, PERFORMANCE_FEATURES.index('learning_style')] = 0
+        
+        results = trained_predictor.predict_batch(X)
+        
+        for row, label, probabilities in zip(X, results['predictions'], results['probabilities']):
+            student_data = dict(zip(PERFORMANCE_FEATURES, row), learning_style='visual')
+            single = trained_predictor.predict(student_data)
+            assert single['prediction'] == label
+            assert list(single['probabilities'].values()) == pytest.approx(list(probabilities))
+    
+    def test_score_cohort_updates_analytics(self, trained_predictor, active_student):
+        """Test cohort scoring writes risk flags in bulk."""
+        LearningAnalytics.objects.filter(user=active_student).update(average_quiz_score=10)
+        
+        assert score_cohort([active_student.id], predictor=trained_predictor) == 1
+        
+        analytics = LearningAnalytics.objects.get(user=active_student)
+        assert analytics.at_risk is True
+        assert 0 <= analytics.predicted_success_rate < 50
+
+
+def register_version(predictor, version, path):
+    """Save a predictor's artefact and register it as an MLModel version."""
+    joblib.dump({'model': predictor.model, 'scaler': predictor.scaler}, path)
+    return MLModel.objects.create(
+        name='Performance Predictor',
+        model_type='performance_prediction',
+        version=version,
+        description='Test model',
+        algorithm='Random Forest Classifier',
+        model_file_path=str(path)
+    )
+
+
+@pytest.mark.django_db
+class TestModelRegistry:
+    """Test loading and hot-swapping registered model versions."""
+    
+    @pytest.fixture(autouse=True)
+    def clear_registry(self):
+        model_registry.clear()
+        yield
+        model_registry.clear()
+    
+    def test_untrained_model_raises(self, tmp_path):
+        """Test predicting without any model fails cleanly."""
+        predictor = PerformancePredictor()
+        predictor.model_path = str(tmp_path / 'missing.pkl')
+        
+        with pytest.raises(ModelNotTrainedError):
+            predictor.predict({})
+    
+    def test_active_version_memory_mapped(self, trained_predictor, tmp_path):
+        """Test the active artefact is loaded with memory-mapped arrays."""
+        register_version(trained_predictor, '1', tmp_path / 'v1.pkl').activate()
+        
+        artefact = model_registry.get('performance_prediction')
+        
+        assert isinstance(artefact['scaler'].mean_, np.memmap)
+        assert model_registry.get('performance_prediction') is artefact
+    
+    def test_activation_hot_swaps(self, trained_predictor, tmp_path,
+                                  django_capture_on_commit_callbacks):
+        """Test activating a new version swaps the served artefact."""
+        first = register_version(trained_predictor, '1', tmp_path / 'v1.pkl')
+        second = register_version(trained_predictor, '2', tmp_path / 'v2.pkl')
+        with django_capture_on_commit_callbacks(execute=True):
+            first.activate()
+        old_artefact = model_registry.get('performance_prediction')
+        
+        with django_capture_on_commit_callbacks(execute=True):
+            second.activate()
+            # A concurrent reader re-caches the old version before the commit
+            cache.set(
+                get_active_version_key('performance_prediction'),
+                (str(first.id), first.model_file_path)
+            )
+        
+        first.refresh_from_db()
+        assert first.is_active is False
+        new_artefact = model_registry.get('performance_prediction')
+        assert new_artefact is not old_artefact
+        assert model_registry.get_active_version('performance_prediction')[0] == str(second.id)
+        
+        predictor = PerformancePredictor()
+        assert predictor.predict({'average_quiz_score': 90})['prediction'] == 'excelling'
+
+
+@pytest.fixture
+def trained_detector(tmp_path):
+    """A learning style detector trained on synthetic data."""
+    rng = np.random.default_rng(0)
+    X = rng.gamma(2.0, 50.0, size=(400, len(LEARNING_STYLE_FEATURES)))
+    
+    detector = LearningStyleDetector()
+    detector.model_path = str(tmp_path / 'learning_style_detector.pkl')
+    detector.train(pd.DataFrame(X, columns=LEARNING_STYLE_FEATURES))
+    return detector
+
+
+def sklearn_cluster(detector, X):
+    return detector.model.predict(detector.pca.transform(detector.scaler.transform(X)))
+
+
+def best_time(func, repeat=200):
+    """Best-of-n wall time for a call, in seconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+@pytest.mark.django_db
+class TestCompiledInference:
+    """Test compiled NumPy inference against sklearn."""
+    
+    def test_learning_style_parity(self, trained_detector):
+        """Test the folded pipeline picks the same clusters as sklearn."""
+        rng = np.random.default_rng(1)
+        X = rng.gamma(2.0, 50.0, size=(1000, len(LEARNING_STYLE_FEATURES)))
+        
+        compiled = trained_detector.get_compiled(trained_detector.get_artefact())
+        
+        np.testing.assert_array_equal(compiled.predict(X), sklearn_cluster(trained_detector, X))
+    
+    def test_forest_parity(self, trained_predictor):
+        """Test the array-backed forest reproduces predict_proba."""
+        rng = np.random.default_rng(2)
+        X = rng.uniform(0, 100, size=(1000, len(PERFORMANCE_FEATURES)))
+        
+        compiled = CompiledForest(trained_predictor.model, trained_predictor.scaler)
+        expected = trained_predictor.model.predict_proba(trained_predictor.scaler.transform(X))
+        
+        np.testing.assert_allclose(compiled.predict_proba(X), expected)
+        np.testing.assert_array_equal(
+            compiled.predict(X),
+            trained_predictor.model.predict(trained_predictor.scaler.transform(X))
+        )
+    
+    @pytest.mark.slow
+    def test_single_row_latency(self, trained_detector, trained_predictor):
+        """Benchmark single-row inference against sklearn."""
+        style_row = np.full((1, len(LEARNING_STYLE_FEATURES)), 100.0)
+        performance_row = np.full((1, len(PERFORMANCE_FEATURES)), 50.0)
+        detector_compiled = trained_detector.get_compiled(trained_detector.get_artefact())
+        forest_compiled = CompiledForest(trained_predictor.model, trained_predictor.scaler)
+        
+        style_speedup = best_time(
+            lambda: sklearn_cluster(trained_detector, style_row)
+        ) / best_time(lambda: detector_compiled.predict(style_row))
+        forest_speedup = best_time(
+            lambda: trained_predictor.model.predict_proba(
+                trained_predictor.scaler.transform(performance_row)
+            ),
+            repeat=50
+        ) / best_time(lambda: forest_compiled.predict_proba(performance_row), repeat=50)
+        
+        print(f"learning style speedup: {style_speedup:.1f}x, forest speedup: {forest_speedup:.1f}x")
+        assert style_speedup >= 10
+        assert forest_speedup >= 10
+
+
+@pytest.mark.django_db
+class TestIncrementalTraining:
+    """Test chunked training and checkpointing of the learning style model."""
+    
+    @pytest.fixture(autouse=True)
+    def models_dir(self, settings, tmp_path):
+        settings.ML_MODELS_DIR = tmp_path
+        model_registry.clear()
+        yield tmp_path
+        model_registry.clear()
+    
+    def test_train_incremental(self, tmp_path):
+        """Test chunks (including undersized ones) train a usable model."""
+        rng = np.random.default_rng(3)
+        X = rng.gamma(2.0, 50.0, size=(500, len(LEARNING_STYLE_FEATURES)))
+        chunks = [
+            pd.DataFrame(X[start:stop], columns=LEARNING_STYLE_FEATURES)
+            for start, stop in [(0, 200), (200, 202), (202, 500)]
+        ]
+        
+        detector = LearningStyleDetector()
+        detector.model_path = str(tmp_path / 'missing.pkl')
+        
+        assert detector.train_incremental(chunks) == 500
+        assert detector.scaler.n_samples_seen_ == 500
+        np.testing.assert_allclose(detector.scaler.mean_, X.mean(axis=0))
+        compiled = detector.get_compiled(detector.get_artefact())
+        np.testing.assert_array_equal(compiled.predict(X), sklearn_cluster(detector, X))
+    
+    def test_resumes_checkpoint_with_active_students(self, models_dir,
+                                                     django_capture_on_commit_callbacks):
+        """Test later runs update the last checkpoint with active students only."""
+        yesterday = timezone.localdate() - timedelta(days=1)
+        students = []
+        for i in range(6):
+            student = User.objects.create_user(
+                email=f'incremental{i}@test.com',
+                password='testpass123',
+                full_name=f'Incremental {i}',
+                role='student'
+            )
+            session = ChatSession.objects.create(user=student, title='Chat')
+            for _ in range(i + 1):
+                ChatMessage.objects.create(session=session, role='user', content='Hi')
+            LearningAnalytics.objects.update_or_create(
+                user=student,
+                defaults={'last_activity_date': yesterday, 'total_study_time': i}
+            )
+            students.append(student)
+        
+        with django_capture_on_commit_callbacks(execute=True):
+            first = train_learning_style_incremental()
+        
+        assert first['success'] is True
+        assert first['trained'] == 6
+        checkpoint = MLModel.objects.get(id=first['model_id'])
+        assert checkpoint.is_active is True
+        assert checkpoint.hyperparameters['samples_seen'] == 6
+        assert (models_dir / checkpoint.model_file_path).exists()
+        assert model_registry.get('learning_style')['watermark'] == timezone.localdate()
+        
+        assert train_learning_style_incremental() == {'success': True, 'trained': 0}
+        
+        LearningAnalytics.objects.filter(user__in=students[:4]).update(
+            last_activity_date=timezone.localdate()
+        )
+        previous = model_registry.get('learning_style')
+        with django_capture_on_commit_callbacks(execute=True):
+            second = train_learning_style_incremental()
+        
+        assert second['trained'] == 4
+        assert MLModel.objects.get(id=second['model_id']).hyperparameters['samples_seen'] == 10
+        checkpoint.refresh_from_db()
+        assert checkpoint.is_active is False
+        # The projection is kept, so cluster indices mean the same thing
+        resumed = model_registry.get('learning_style')
+        np.testing.assert_array_equal(resumed['scaler'].mean_, previous['scaler'].mean_)
+        np.testing.assert_array_equal(resumed['pca'].components_, previous['pca'].components_)
+        assert resumed['model'].n_steps_ > previous['model'].n_steps_
+    
+    def test_sample_caps_students(self, models_dir):
+        """Test training reads a bounded sample with each student once."""
+        for i in range(8):
+            User.objects.create_user(
+                email=f'sampled{i}@test.com',
+                password='testpass123',
+                full_name=f'Sampled {i}',
+                role='student'
+            )
+        chunks = list(iter_feature_chunks(
+            lambda users: list(users.values_list('id', flat=True)),
+            chunk_size=2, sample_size=5, seed=1
+        ))
+        rows = [user_id for chunk in chunks for user_id in chunk]
+        
+        assert len(rows) == len(set(rows)) == 5
+    
+    def test_identical_rows_skipped(self, tmp_path):
+        """Test rows without variance never reach IncrementalPCA."""
+        detector = LearningStyleDetector()
+        chunks = [pd.DataFrame(
+            np.zeros((10, len(LEARNING_STYLE_FEATURES))), columns=LEARNING_STYLE_FEATURES
+        )]
+        
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', RuntimeWarning)
+            assert detector.train_incremental(chunks) == 0
+
+
+@pytest.mark.django_db
+class TestHyperparameterSearch:
+    """Test the cross-validated search and promotion of the best model."""
+    
+    GRID = {'n_estimators': [10], 'max_depth': [2, None]}
+    
+    @pytest.fixture(autouse=True)
+    def models_dir(self, settings, tmp_path):
+        settings.ML_MODELS_DIR = tmp_path
+        model_registry.clear()
+        yield tmp_path
+        model_registry.clear()
+    
+    def test_run_search_ranks_candidates(self):
+        """Test every candidate is scored in parallel and ranked by F1."""
+        rng = np.random.default_rng(5)
+        X = rng.uniform(0, 100, size=(120, len(PERFORMANCE_FEATURES)))
+        y = np.digitize(X[:, 0], [40, 75])
+        
+        results = run_search(X, y, param_grid=self.GRID, cv=3, n_jobs=2)
+        
+        assert len(results) == 2
+        assert results[0]['f1_score'] >= results[1]['f1_score']
+        for result in results:
+            assert 0 <= result['f1_score'] <= 1
+            assert set(result) == {'params', 'accuracy', 'precision', 'recall', 'f1_score'}
+    
+    def make_students(self, course, count):
+        students = []
+        for i in range(count):
+            student = User.objects.create_user(
+                email=f'search{i}@test.com',
+                password='testpass123',
+                full_name=f'Search {i}',
+                role='student'
+            )
+            Enrollment.objects.create(
+                student=student, course=course, progress_percentage=i * 9,
+                status='completed' if i % 2 else 'dropped'
+            )
+            LearningAnalytics.objects.filter(user=student).update(lessons_completed=i)
+            students.append(student)
+        return students
+    
+    def test_labels_from_enrollment_outcomes(self, course, student_user, teacher_user):
+        """Test labels come from finished enrollments, not progress."""
+        dropped, completed = self.make_students(course, 2)
+        Enrollment.objects.create(student=student_user, course=course, progress_percentage=100)
+        other_course = course.__class__.objects.create(
+            title='Other', description='Other course', instructor=teacher_user,
+            difficulty='beginner', category='programming', estimated_duration=10
+        )
+        Enrollment.objects.create(student=completed, course=other_course, status='dropped')
+        
+        labels = build_performance_labels()
+        
+        # Still-active students have no outcome yet and are not labelled
+        assert student_user.id not in labels.index
+        assert labels[dropped.id] == LABELS.index('at_risk')
+        assert labels[completed.id] == LABELS.index('on_track')
+    
+    def test_train_performance_model(self, course, monkeypatch):
+        """Test the best candidate is registered, activated and served."""
+        monkeypatch.setattr('apps.ml_models.search.PARAM_GRID', self.GRID)
+        self.make_students(course, 12)
+        
+        out = StringIO()
+        call_command('train_performance_model', '--cv', '2', '--jobs', '1', stdout=out)
+        
+        ml_model = MLModel.objects.get(model_type='performance_prediction')
+        assert ml_model.is_active is True
+        assert len(ml_model.hyperparameters['candidates']) == 2
+        assert ml_model.f1_score == ml_model.hyperparameters['candidates'][0]['f1_score']
+        assert 'Registered Performance Predictor' in out.getvalue()
+        assert PerformancePredictor().predict({'lessons_completed': 11})['prediction'] in LABELS
+    
+    def test_worse_model_not_activated(self, course, monkeypatch):
+        """Test a candidate scoring below the active model is only activated when forced."""
+        monkeypatch.setattr('apps.ml_models.search.PARAM_GRID', self.GRID)
+        self.make_students(course, 12)
+        active = MLModel.objects.create(
+            name='Performance Predictor', model_type='performance_prediction',
+            version='perfect', description='Perfect model', algorithm='RandomForestClassifier',
+            f1_score=1.0, model_file_path='perfect.pkl', is_active=True
+        )
+        
+        call_command('train_performance_model', '--cv', '2', '--jobs', '1', stdout=StringIO())
+        
+        candidate = MLModel.objects.exclude(pk=active.pk).get()
+        assert candidate.is_active is False
+        active.refresh_from_db()
+        assert active.is_active is True
+        
+        call_command(
+            'train_performance_model', '--cv', '2', '--jobs', '1', '--activate', stdout=StringIO()
+        )
+        
+        active.refresh_from_db()
+        assert active.is_active is False
+        assert MLModel.objects.get(is_active=True).pk not in (active.pk, candidate.pk)
+    
+    def test_task_runs_search_in_separate_process(self, monkeypatch):
+        """Test the Celery task starts the management command as a process."""
+        calls = []
+        
+        def run(command, **kwargs):
+            calls.append(command)
+            return subprocess.CompletedProcess(
+                command, 0, stdout='{"model_id": "1", "f1_score": 0.8, "candidates": 24}\n'
+            )
+        
+        monkeypatch.setattr('apps.ml_models.tasks.subprocess.run', run)
+        
+        assert search_performance_hyperparameters(cv=3, activate=False) == {
+            'success': True, 'model_id': '1', 'f1_score': 0.8, 'candidates': 24
+        }
+        assert calls[0][2:] == ['train_performance_model', '--cv', '3', '--json', '--no-activate']
+    
+    def test_single_class_rejected(self):
+        """Test the search refuses data with only one label."""
+        with pytest.raises(ValueError):
+            run_search(np.zeros((10, len(PERFORMANCE_FEATURES))), np.zeros(10), cv=2)
+
+
+@pytest.mark.django_db
+class TestPredictionCache:
+    """Test cached predictions and conditional user updates."""
+    
+    DATA = {'video_time': 500, 'text_time': 20, 'interactive_time': 10}
+    
+    @pytest.fixture(autouse=True)
+    def detector(self, trained_detector, monkeypatch):
+        monkeypatch.setattr('apps.ml_models.views.learning_style_detector', trained_detector)
+        model_registry.clear()
+        return trained_detector
+    
+    def post(self, user):
+        request = APIRequestFactory().post('/predict/learning-style/', self.DATA, format='json')
+        force_authenticate(request, user=user)
+        return predict_learning_style(request)
+    
+    def test_repeated_prediction_served_from_cache(self, student_user, detector, monkeypatch):
+        """Test a repeat request neither rescores nor writes the user."""
+        response = self.post(student_user)
+        predicted_style = response.data['data']['predicted_style']
+        student_user.refresh_from_db()
+        assert student_user.learning_style == predicted_style
+        
+        def fail(user_data):
+            raise AssertionError('prediction was recomputed')
+        monkeypatch.setattr(detector, 'predict', fail)
+        
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post(student_user)
+        
+        assert response.data['data']['predicted_style'] == predicted_style
+        assert not [query for query in queries if query['sql'].startswith('UPDATE')]
+    
+    def test_changed_style_updates_only_learning_style(self, student_user, detector):
+        """Test a new style is saved without touching other columns."""
+        student_user.learning_style = 'unknown'
+        
+        with CaptureQueriesContext(connection) as queries:
+            self.post(student_user)
+        
+        updates = [query['sql'] for query in queries if query['sql'].startswith('UPDATE "users"')]
+        assert len(updates) == 1
+        assert 'learning_style' in updates[0]
+        assert 'updated_at' not in updates[0]
+    
+    def test_cache_key_tracks_features_and_version(self, detector, student_user,
+                                                   django_capture_on_commit_callbacks):
+        """Test new features or a new model version miss the cache."""
+        features = detector.extract_features(self.DATA)
+        key = get_prediction_cache_key(detector, student_user.id, features)
+        
+        assert key == get_prediction_cache_key(detector, student_user.id, features.copy())
+        assert key != get_prediction_cache_key(detector, student_user.id, features + 1)
+        
+        with django_capture_on_commit_callbacks(execute=True):
+            MLModel.objects.create(
+                name='Learning Style Detector',
+                model_type='learning_style',
+                version='2',
+                description='Test model',
+                algorithm='K-means Clustering',
+                model_file_path='unused.pkl',
+                is_active=True
+            )
+        assert key != get_prediction_cache_key(detector, student_user.id, features)
+
+
+class TestSentimentAnalyzer:
+    """Test the lexicon sentiment scorer and its cache."""
+    
+    def test_lexicon_scoring(self):
+        """Test modifiers and negations follow TextBlob's rules."""
+        results = sentiment_analyzer.analyze_batch([
+            'This course is very good',
+            'not good at all',
+            'Terrible and boring lessons',
+            '',
+        ])
+        
+        assert results[0]['polarity'] == pytest.approx(0.91)
+        assert results[1]['polarity'] == pytest.approx(-0.35)
+        assert [result['label'] for result in results] == [
+            'positive', 'negative', 'negative', 'neutral'
+        ]
+    
+    @pytest.mark.parametrize('text', [
+        'I love this course!',
+        'This is great :)',
+        'terrible :(',
+        'Amazing!!! Best class ever :D',
+        "I don't like it :/",
+        'Really bad explanations!',
+        'Good. Not bad. Great!',
+        'happy :-) sad :-(',
+        'not :) good',
+        'xdoc is a tool',
+        'It was (!) fun',
+        "It isn't bad",
+        "I don't really understand the quiz",
+        'Not very good',
+        'not a good explanation',
+        'really not good',
+        'It is not, sadly, great',
+        'Never boring. No bad lessons!',
+        "I can't say it's great :)",
+        'Mr. Smith is not bad, e.g. his examples...',
+        '"Not" “good”',
+    ])
+    def test_textblob_parity(self, text):
+        """Test negations, exclamations and emoticons score as they do in TextBlob."""
+        expected = TextBlob(text).sentiment
+        
+        polarity, subjectivity = LexiconScorer().score([text])
+        
+        assert polarity[0] == pytest.approx(expected.polarity)
+        assert subjectivity[0] == pytest.approx(expected.subjectivity)
+    
+    def test_invalid_input_is_neutral(self):
+        """Test analyze falls back to a neutral result instead of raising."""
+        assert sentiment_analyzer.analyze(42) == {
+            'polarity': 0.0, 'subjectivity': 0.0, 'label': 'neutral', 'confidence': 0.0
+        }
+    
+    def test_results_cached_by_content(self, monkeypatch):
+        """Test repeated texts are served from the cache."""
+        text = 'A genuinely excellent unit on recursion'
+        sentiment_analyzer.analyze(text)
+        
+        def fail(texts):
+            raise AssertionError('text was rescored')
+        monkeypatch.setattr(sentiment_analyzer.scorer, 'score', fail)
+        
+        assert sentiment_analyzer.analyze(text)['label'] == 'positive'
+    
+    @pytest.mark.django_db
+    def test_backfill_sentiment(self, student_user, course, chat_session):
+        """Test reviews and student messages are scored in bulk."""
+        review = CourseReview.objects.create(
+            course=course,
+            student=student_user,
+            rating=1,
+            title='Awful',
+            comment='Boring and confusing lessons'
+        )
+        message = ChatMessage.objects.create(
+            session=chat_session, role='user', content='This is great, thanks!'
+        )
+        reply = ChatMessage.objects.create(session=chat_session, role='assistant', content='Good')
+        
+        result = backfill_sentiment(batch_size=1)
+        
+        assert result == {'success': True, 'reviews': 1, 'messages': 1}
+        review.refresh_from_db()
+        message.refresh_from_db()
+        reply.refresh_from_db()
+        assert review.sentiment_label == 'negative'
+        assert message.sentiment_label == 'positive'
+        assert reply.sentiment_score is None
+        
+        # Rows scored by an older scorer are only refreshed on request
+        ChatMessage.objects.filter(pk=message.pk).update(sentiment_score=-0.5, sentiment_label='negative')
+        assert backfill_sentiment()['messages'] == 0
+        assert backfill_sentiment(rescore=True) == {'success': True, 'reviews': 1, 'messages': 1}
+        message.refresh_from_db()
+        assert message.sentiment_label == 'positive'